@@ -37,7 +37,7 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
 class ProfileViewSet(viewsets.ModelViewSet):
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.select_related('user', 'department')
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
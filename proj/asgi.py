@@ -2,6 +2,8 @@
 ASGI config for proj project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it (e.g. ``uvicorn proj.asgi:application``) for the streaming
+``backend/ai-agent/stream/`` endpoint to flush tokens as they are generated.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
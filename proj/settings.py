@@ -17,6 +17,39 @@ DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_HOST = os.getenv('DB_HOST')
 DB_PORT = os.getenv('DB_PORT')
 
+# AI agent LLM: 'openai', 'stub' (offline, deterministic) or a dotted LLMBackend path
+AI_LLM_BACKEND = os.getenv('AI_LLM_BACKEND', 'openai')
+AI_LLM_MODEL = os.getenv('AI_LLM_MODEL', 'gpt-3.5-turbo-instruct')
+AI_LLM_TIMEOUT = int(os.getenv('AI_LLM_TIMEOUT', '60'))
+AI_EXECUTOR_WORKERS = int(os.getenv('AI_EXECUTOR_WORKERS', '4'))
+AI_STUB_LATENCY = float(os.getenv('AI_STUB_LATENCY', '0'))
+# Seconds an AI answer stays cached (0 disables the answer cache)
+AI_ANSWER_CACHE_TTL = int(os.getenv('AI_ANSWER_CACHE_TTL', '900'))
+# Keyword retrieval for the AI agent context: 'ilike', 'fulltext' or 'trigram' (needs pg_trgm).
+# The ranked modes score every match before the LIMIT; compare them with bench_ai_retrieval first.
+AI_RETRIEVAL_MODE = os.getenv('AI_RETRIEVAL_MODE', 'ilike')
+# Vector store ingestion: 'openai', 'hashing' (offline) or a dotted Embeddings path
+AI_EMBEDDING_BACKEND = os.getenv('AI_EMBEDDING_BACKEND', 'openai')
+AI_EMBEDDING_DIMENSIONS = int(os.getenv('AI_EMBEDDING_DIMENSIONS', '1536'))
+AI_EMBEDDING_BATCH_SIZE = int(os.getenv('AI_EMBEDDING_BATCH_SIZE', '100'))
+AI_EMBEDDING_CONCURRENCY = int(os.getenv('AI_EMBEDDING_CONCURRENCY', '4'))
+AI_EMBEDDING_MAX_RETRIES = int(os.getenv('AI_EMBEDDING_MAX_RETRIES', '3'))
+# Work order history keeps every column on each Nth version and only the changes in between
+WORKORDER_HISTORY_CHECKPOINT_INTERVAL = int(os.getenv('WORKORDER_HISTORY_CHECKPOINT_INTERVAL', '10'))
+# Share of requests whose timing breakdown is logged to 'workorders.profiling' (Server-Timing is always sent)
+PROFILING_LOG_SAMPLE_RATE = float(os.getenv('PROFILING_LOG_SAMPLE_RATE', '0.01'))
+# Add a `serialize` stage by wrapping DRF's Serializer.data process-wide (see workorders.profiling)
+PROFILING_SERIALIZER_TIMING = os.getenv('PROFILING_SERIALIZER_TIMING', 'false').lower() == 'true'
+# Requests' queries slower than this are saved as SlowQuery rows (admin); 0 turns capture off
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '0'))
+# Share of captured queries that also get an EXPLAIN plan (ANALYZE, BUFFERS for SELECTs)
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', '0.1'))
+# Requests whose slow queries may wait to be saved; captures beyond it are dropped
+SLOW_QUERY_MAX_PENDING = int(os.getenv('SLOW_QUERY_MAX_PENDING', '100'))
+# Who may scrape /backend/metrics besides staff sessions: REMOTE_ADDR addresses/networks, or a bearer token
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 DEBUG = True
 
 ALLOWED_HOSTS = ['*']
@@ -37,6 +70,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'workorders.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -91,6 +125,28 @@ DATABASES = {
     }
 }
 
+# Shared cache, also holding the per-table change versions (workorders.versioning).
+# Every worker must see the same cache for cross-process invalidation: the
+# default file cache is shared on a host, REDIS_URL shares it between hosts.
+# Never point this at a per-process backend (locmem) when running several workers.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache')),
+        }
+    }
+
+# Runs the tests on a per-process cache, see proj/test_runner.py
+TEST_RUNNER = 'proj.test_runner.TestRunner'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -159,6 +215,21 @@ MEDIA_URL = 'backend/media/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per sampled request, see workorders.profiling
+        'workorders.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Analytics views read the WorkOrderDailyStat rollup; ?source=live or False here uses raw workorders
+ANALYTICS_USE_ROLLUP = True
+
 # DRF Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -3,7 +3,7 @@ from django.urls import path, include
 from rest_framework import routers
 from rest_framework.authtoken.views import obtain_auth_token
 
-from workorders import views as workorder_views
+from workorders import metrics, views as workorder_views
 from accounts import views as account_views
 
 router = routers.DefaultRouter()
@@ -34,11 +34,13 @@ router.register(r'profiles', account_views.ProfileViewSet)
 router.register(r'register', account_views.UserRegistrationViewSet, basename='register')
 
 urlpatterns = [
-    path('backend/api/analytics/equipment-faults/', workorder_views.EquipmentFaultAnalysisView.as_view()),
-    path('backend/api/analytics/status-trend/', workorder_views.StatusTrendView.as_view()),
-    path('backend/api/analytics/equipment-types/', workorder_views.EquipmentTypeAnalyticsView.as_view()),
-    path('backend/api/analytics/locations/', workorder_views.LocationAnalyticsView.as_view()),
+    path('backend/api/analytics/equipment-faults/', workorder_views.EquipmentFaultAnalysisView.as_view(), name='analytics-equipment-faults'),
+    path('backend/api/analytics/status-trend/', workorder_views.StatusTrendView.as_view(), name='analytics-status-trend'),
+    path('backend/api/analytics/equipment-types/', workorder_views.EquipmentTypeAnalyticsView.as_view(), name='analytics-equipment-types'),
+    path('backend/api/analytics/locations/', workorder_views.LocationAnalyticsView.as_view(), name='analytics-locations'),
     path('backend/ai-agent/', workorder_views.AIAgentView.as_view(), name='ai-agent'),
+    path('backend/ai-agent/stream/', workorder_views.AIAgentStreamView.as_view(), name='ai-agent-stream'),
+    path('backend/metrics', metrics.metrics_view, name='metrics'),
     path('backend/admin/', admin.site.urls),
     path('backend/api/', include(router.urls)),
     path('backend/api-auth/', include('rest_framework.urls', namespace='rest_framework')),
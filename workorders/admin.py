@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import workorders, Equipment, Part, Location, Machine_Type, Part_Type, Type_of_Work, Work_Status, Pending, Closed, UserPrompt
+from .models import workorders, Equipment, Part, Location, Machine_Type, Part_Type, Type_of_Work, Work_Status, Pending, Closed, UserPrompt, WorkOrderDailyStat, SlowQuery
 
 admin.site.register(workorders)
 admin.site.register(Equipment)
@@ -11,4 +11,27 @@ admin.site.register(Type_of_Work)
 admin.site.register(Work_Status)
 admin.site.register(Pending)
 admin.site.register(Closed)
-admin.site.register(UserPrompt)
\ No newline at end of file
+admin.site.register(UserPrompt)
+admin.site.register(WorkOrderDailyStat)
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('recorded_at', 'duration_ms', 'view', 'short_sql', 'has_plan', 'seq_scan')
+    list_filter = ('view', 'seq_scan', 'recorded_at')
+    search_fields = ('sql', 'fingerprint')
+    readonly_fields = ('recorded_at', 'view', 'fingerprint', 'sql', 'duration_ms', 'plan', 'seq_scan')
+    date_hierarchy = 'recorded_at'
+
+    @admin.display(description='SQL')
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    @admin.display(boolean=True, description='Plan')
+    def has_plan(self, obj):
+        return bool(obj.plan)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,135 @@
+# workorders/history.py
+"""
+Delta-encoded WorkOrderHistory.
+
+A history row stores only the columns a change touched, keyed by column name
+(`work_status_id`, not `work_status`) with JSON-safe values. Every
+CHECKPOINT_INTERVAL-th version of a workorder, starting with its creation at
+version 0, is a checkpoint holding every column instead, so the state at any
+moment is one checkpoint plus at most CHECKPOINT_INTERVAL - 1 deltas.
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Subquery
+from django.utils import timezone
+
+from .models import WorkOrderHistory, workorders
+
+CHECKPOINT_INTERVAL = getattr(settings, 'WORKORDER_HISTORY_CHECKPOINT_INTERVAL', 10)
+
+# Recorded columns: everything editable, so not the id, equipment_name or search_vector
+FIELDS = {
+    field.attname: field
+    for field in workorders._meta.concrete_fields
+    if field.editable and not field.primary_key
+}
+
+
+def encode(value):
+    if isinstance(value, datetime) and settings.USE_TZ and timezone.is_naive(value):
+        # e.g. a target_date assigned straight from request data: stored as local time
+        value = timezone.make_aware(value)
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def state(instance):
+    """Recorded column values of a workorder instance"""
+    return {name: encode(field.to_python(getattr(instance, name))) for name, field in FIELDS.items()}
+
+
+def state_from_values(row):
+    """Same as state() for a values() row holding FIELDS"""
+    return {name: encode(row[name]) for name in FIELDS}
+
+
+def diff(before, after):
+    return {name: value for name, value in after.items() if before.get(name) != value}
+
+
+def next_versions(workorder_ids, locked=False):
+    """
+    Next history version of each workorder. The workorder rows are locked
+    (FOR UPDATE) until the caller's transaction ends, so concurrent changes to
+    one workorder get distinct versions: call it in a transaction that also
+    inserts the rows. A unique (workorder, version) constraint is not possible,
+    history is partitioned by timestamp. `locked` skips the lock for callers
+    that already hold it, or that created the rows in this transaction.
+    """
+    if not locked:
+        # Its own statement: a read in the locking one would use the snapshot from before the wait
+        list(
+            workorders.objects.select_for_update()
+            .filter(pk__in=workorder_ids)
+            .order_by('pk')  # Same lock order everywhere, no deadlocks between bulk changes
+            .values_list('pk', flat=True)
+        )
+    latest = dict(
+        WorkOrderHistory.objects.filter(workorder_id__in=workorder_ids)
+        .order_by()
+        .values('workorder_id')
+        .annotate(version=Max('version'))
+        .values_list('workorder_id', 'version')
+    )
+    return {pk: latest[pk] + 1 if pk in latest else 0 for pk in workorder_ids}
+
+
+def entry(workorder_id, version, before, after, **kwargs):
+    """Unsaved history row for the change from state `before` (None when created) to `after`"""
+    checkpoint = before is None or version % CHECKPOINT_INTERVAL == 0
+    return WorkOrderHistory(
+        workorder_id=workorder_id,
+        version=version,
+        is_checkpoint=checkpoint,
+        snapshot=dict(after) if checkpoint else diff(before, after),
+        **kwargs,
+    )
+
+
+def record(instance, before, changed_by, action, locked=False):
+    """Save the history row for a single workorder change, `before` is its state() prior to it"""
+    with transaction.atomic(savepoint=False):
+        version = next_versions([instance.pk], locked)[instance.pk]
+        history = entry(instance.pk, version, before, state(instance), changed_by=changed_by, action=action)
+        history.save()
+    return history
+
+
+def record_many(changes, changed_by, action, locked=False):
+    """
+    History rows for many workorders at once: `changes` holds
+    (workorder_id, before, after) states. One version query, one insert.
+    """
+    changes = list(changes)
+    with transaction.atomic(savepoint=False):
+        versions = next_versions([pk for pk, _, _ in changes], locked)
+        return WorkOrderHistory.objects.bulk_create(
+            [
+                entry(pk, versions[pk], before, after, changed_by=changed_by, action=action)
+                for pk, before, after in changes
+            ],
+            batch_size=500,
+        )
+
+
+def state_at(workorder_id, moment):
+    """
+    (state, last history row) of a workorder as of `moment`, or None if it
+    had no history by then. Reads the latest checkpoint and the deltas after
+    it in one query.
+    """
+    recorded = WorkOrderHistory.objects.filter(workorder_id=workorder_id, timestamp__lte=moment)
+    checkpoint = recorded.filter(is_checkpoint=True).order_by('-version', '-id').values('version')[:1]
+    current, last = {}, None
+    for last in recorded.filter(version__gte=Subquery(checkpoint)).order_by('version', 'id'):
+        current.update(last.snapshot)
+    return (current, last) if last is not None else None
+
+
+def instance_from_state(workorder_id, values):
+    """Unsaved workorder carrying a reconstructed state, for serializing"""
+    return workorders(
+        pk=workorder_id,
+        **{name: FIELDS[name].to_python(value) for name, value in values.items() if name in FIELDS},
+    )
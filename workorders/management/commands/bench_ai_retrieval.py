@@ -0,0 +1,70 @@
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+
+from workorders.models import workorders
+from workorders.views import AIAgentView
+
+
+class Command(BaseCommand):
+    help = 'Compare latency and recall of the AI agent keyword retrieval modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keywords', help='Comma separated keywords (default: sampled from recent problems)')
+        parser.add_argument('--modes', default='ilike,fulltext,trigram')
+        parser.add_argument('--limit', type=int, default=75, help='Work orders handed to the LLM')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        keywords = [k.strip() for k in (options['keywords'] or '').split(',') if k.strip()] or self.sample_keywords()
+        if not keywords:
+            raise CommandError('No keywords given and no work orders to sample them from')
+        limit = options['limit']
+
+        self.stdout.write(
+            "Recall: share of the top results that mention every keyword word, "
+            f"out of min({limit}, such orders)"
+        )
+        self.stdout.write(f"{'keyword':<30} {'mode':>9} {'matches':>8} {'p50 ms':>9} {'recall':>7}")
+        for keyword in keywords:
+            # Relevant = the problem text mentions every word of the keyword
+            relevant_filter = Q()
+            for word in keyword.split():
+                relevant_filter &= Q(problem__icontains=word)
+            relevant = set(workorders.objects.filter(relevant_filter).values_list('id', flat=True))
+
+            for mode in options['modes'].split(','):
+                view = AIAgentView(retrieval_mode=mode.strip())
+                try:
+                    with transaction.atomic():
+                        matches = view.execute_sql_query('count', keyword=keyword)
+                        timings = []
+                        for _ in range(options['repeat']):
+                            started = time.perf_counter()
+                            rows = view.execute_sql_query('summary', keyword=keyword, limit=limit)
+                            timings.append((time.perf_counter() - started) * 1000)
+                except DatabaseError as e:
+                    self.stdout.write(self.style.WARNING(f"{keyword[:30]:<30} {mode:>9} unavailable: {str(e).splitlines()[0]}"))
+                    continue
+
+                returned = {row['id'] for row in rows}
+                recall = len(returned & relevant) / min(limit, len(relevant)) if relevant else None
+                self.stdout.write(
+                    f"{keyword[:30]:<30} {mode:>9} {matches:>8} {statistics.median(timings):>9.2f} "
+                    f"{'-' if recall is None else f'{recall:.2f}':>7}"
+                )
+
+    def sample_keywords(self, count=5):
+        keywords = []
+        for problem in workorders.objects.order_by('-initiation_date').values_list('problem', flat=True)[:200]:
+            words = [word for word in re.findall(r'[a-z]+', problem.lower()) if len(word) > 3][:2]
+            keyword = ' '.join(words)
+            if words and keyword not in keywords:
+                keywords.append(keyword)
+            if len(keywords) == count:
+                break
+        return keywords
@@ -0,0 +1,53 @@
+import gc
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workorders.models import workorders
+from workorders.utils.ai_utils import changed_documents, generate_workorder_documents
+
+
+class Command(BaseCommand):
+    help = 'Measure peak Python memory of vector store document generation for growing row counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000', help='Comma separated row counts')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--materialize', action='store_true',
+                            help='Also measure building the full document list, for comparison')
+
+    def handle(self, *args, **options):
+        total = workorders.objects.count()
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        if not total:
+            raise CommandError('No work orders to benchmark (see seed_workorders)')
+
+        modes = ['stream'] + (['list'] if options['materialize'] else [])
+        self.stdout.write(f"{'rows':>8} {'mode':>7} {'peak KiB':>10} {'seconds':>8}")
+        for size in sizes:
+            if size > total:
+                self.stdout.write(self.style.WARNING(f"Only {total} work orders, skipping {size}"))
+                continue
+            for mode in modes:
+                peak, seconds = self.measure(size, mode, options['chunk_size'])
+                self.stdout.write(f"{size:>8} {mode:>7} {peak / 1024:>10.1f} {seconds:>8.2f}")
+
+    def measure(self, size, mode, chunk_size):
+        queryset = workorders.objects.order_by('id')[:size]
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            documents = generate_workorder_documents(queryset, chunk_size=chunk_size)
+            if mode == 'list':
+                documents = list(documents)
+            # Same path sync_vector_store takes, minus the embedding and writes
+            counts = {'embedded': 0, 'skipped': 0}
+            pending = {}
+            for _ in changed_documents(documents, True, counts, pending, chunk_size=chunk_size):
+                pending.clear()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return peak, time.perf_counter() - started
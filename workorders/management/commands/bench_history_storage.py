@@ -0,0 +1,130 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from workorders import history
+from workorders.models import Closed, Work_Status, workorders
+from workorders.reference import reference_data
+from workorders.serializers import WorkOrderSerializer
+from workorders.views import WorkOrderViewSet
+
+
+def legacy_complete_snapshot(workorder):
+    """The full snapshot WorkOrderViewSet stored before history was delta encoded"""
+    return {
+        'id': workorder.id,
+        'initiation_date': str(workorder.initiation_date),
+        'department': workorder.department,
+        'problem': workorder.problem,
+        'initiated_by': {'id': workorder.initiated_by.id, 'username': workorder.initiated_by.username},
+        'equipment': {
+            'id': workorder.equipment.id,
+            'machine': workorder.equipment.machine,
+            'machine_type': str(workorder.equipment.machine_type),
+        },
+        'part': workorder.part.id if workorder.part else None,
+        'type_of_work': workorder.type_of_work.id,
+        'closed': workorder.closed.id if workorder.closed else None,
+        'closing_remarks': workorder.closing_remarks,
+        'accepted': workorder.accepted,
+        'assigned_to': workorder.assigned_to,
+        'target_date': str(workorder.target_date) if workorder.target_date else None,
+        'remarks': workorder.remarks,
+        'replaced_part': workorder.replaced_part,
+        'completion_date': str(workorder.completion_date),
+        'work_status': {
+            'id': workorder.work_status.id if workorder.work_status else None,
+            'work_status': workorder.work_status.work_status if workorder.work_status else None,
+        },
+        'pending': workorder.pending.id if workorder.pending else None,
+        'pr_number': workorder.pr_number,
+        'pr_date': str(workorder.pr_date) if workorder.pr_date else None,
+        'timestamp': str(workorder.timestamp) if workorder.timestamp else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare WorkOrderHistory snapshot storage of the legacy formats and delta encoding with checkpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help='Work orders to replay a lifecycle for')
+        parser.add_argument('--changes', type=int, default=12, help='Changes per work order after creation')
+        parser.add_argument('--interval', type=int, default=history.CHECKPOINT_INTERVAL,
+                            help='Checkpoint interval for the delta format')
+
+    def handle(self, *args, **options):
+        sample = list(
+            workorders.objects.prefetch_related(*WorkOrderViewSet.serializer_prefetch).order_by('-id')[:options['orders']]
+        )
+        if not sample:
+            raise CommandError('No work orders to replay (see seed_workorders)')
+        history.CHECKPOINT_INTERVAL = options['interval']
+
+        formats = {'legacy partial': [], 'legacy serializer': [], 'delta': []}
+        for workorder in sample:
+            created = legacy_complete_snapshot(workorder)
+            formats['legacy partial'].append(created)
+            formats['legacy serializer'].append(created)
+            state = history.state(workorder)
+            formats['delta'].append(history.entry(workorder.pk, 0, None, state).snapshot)
+
+            for version, change in enumerate(self.lifecycle(options['changes']), start=1):
+                before_legacy, before = legacy_complete_snapshot(workorder), state
+                change(workorder)
+                after_legacy, state = legacy_complete_snapshot(workorder), history.state(workorder)
+                # View actions and perform_update: the changed keys of the full snapshot, plus the id
+                formats['legacy partial'].append({
+                    **{key: value for key, value in after_legacy.items() if before_legacy.get(key) != value},
+                    'id': workorder.id,
+                })
+                # WorkOrderUpdateSerializer: the whole nested serializer output on every change
+                formats['legacy serializer'].append(WorkOrderSerializer(workorder).data)
+                formats['delta'].append(history.entry(workorder.pk, version, before, state).snapshot)
+
+        self.stdout.write(
+            f"{len(sample)} work orders x {options['changes'] + 1} history rows, "
+            f"checkpoint interval {options['interval']}"
+        )
+        self.stdout.write(f"{'format':<18} {'rows':>7} {'KiB':>9} {'bytes/row':>10} {'vs delta':>9}")
+        sizes = {name: self.jsonb_size(snapshots) for name, snapshots in formats.items()}
+        for name, size in sizes.items():
+            rows = len(formats[name])
+            self.stdout.write(
+                f"{name:<18} {rows:>7} {size / 1024:>9.1f} {size / rows:>10.1f} {size / sizes['delta']:>8.2f}x"
+            )
+
+    def lifecycle(self, changes):
+        """accept, remark edits, complete, close: the usual life of a work order"""
+        def accept(workorder):
+            workorder.accepted = True
+            workorder.work_status = reference_data.lookup(Work_Status, 'In_Process')
+            workorder.assigned_to = 'Shift A electrician'
+            workorder.target_date = timezone.now()
+
+        def remark(step):
+            def edit(workorder):
+                workorder.remarks = f'Checked wiring, step {step}: waiting on replacement contactor'
+            return edit
+
+        def complete(workorder):
+            workorder.work_status = reference_data.lookup(Work_Status, 'Completed')
+            workorder.completion_date = timezone.now()
+
+        def close(workorder):
+            workorder.closed = reference_data.lookup(Closed, 'Yes')
+            workorder.closing_remarks = 'Verified running'
+
+        middle = [remark(step) for step in range(max(changes - 3, 0))]
+        return ([accept] + middle + [complete, close])[:changes]
+
+    def jsonb_size(self, snapshots):
+        # Stored size as Postgres sees it, compression included
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT sum(pg_column_size(value::jsonb)) FROM unnest(%s::text[]) AS value',
+                [[json.dumps(snapshot, cls=DjangoJSONEncoder) for snapshot in snapshots]],
+            )
+            return cursor.fetchone()[0]
@@ -0,0 +1,48 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from workorders.views import StatusTrendView
+
+
+class Command(BaseCommand):
+    help = 'Benchmark StatusTrendView query count and latency for 30/90/365-day windows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per window/grouping')
+        parser.add_argument('--windows', default='30,90,365', help='Comma separated timeframes in days')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True).first()
+        if user is None:
+            raise CommandError('Need at least one active user to authenticate the requests')
+
+        factory = APIRequestFactory()
+        view = StatusTrendView.as_view()
+        windows = [int(w) for w in options['windows'].split(',') if w.strip()]
+
+        self.stdout.write(f"{'window':>8} {'group_by':>8} {'queries':>8} {'p50 ms':>9} {'max ms':>9}")
+        for timeframe in windows:
+            for group_by in ('day', 'week', 'month'):
+                timings = []
+                for _ in range(options['repeat']):
+                    request = factory.get(
+                        '/backend/api/analytics/status-trend/',
+                        {'timeframe': timeframe, 'group_by': group_by}
+                    )
+                    force_authenticate(request, user=user)
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = view(request)
+                        response.render()
+                        timings.append((time.perf_counter() - started) * 1000)
+
+                self.stdout.write(
+                    f"{timeframe:>8} {group_by:>8} {len(queries):>8} "
+                    f"{statistics.median(timings):>9.2f} {max(timings):>9.2f}"
+                )
@@ -1,10 +1,50 @@
-from django.core.management.base import BaseCommand
-from workorders.utils.ai_utils import initialize_vector_store
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from workorders.utils.ai_utils import get_vector_store, sync_vector_store
+from workorders.utils.embeddings import get_embeddings
 
 class Command(BaseCommand):
-    help = 'Load work order data into AI vector store'
+    help = 'Load work order data into AI vector store (only new or changed work orders by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-embed every work order in the table, changed or not (archived years keep their vectors)')
+        parser.add_argument('--since', help='Only scan work orders initiated on or after this date (YYYY-MM-DD), not with --full')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without embedding')
+        parser.add_argument('--batch-size', type=int, help='Documents per embedding request (AI_EMBEDDING_BATCH_SIZE)')
+        parser.add_argument('--concurrency', type=int, help='Embedding requests in flight (AI_EMBEDDING_CONCURRENCY)')
+        parser.add_argument('--embedder', help="Embedding backend for this run, e.g. 'hashing' to benchmark offline")
 
     def handle(self, *args, **options):
+        if options['full'] and options['since']:
+            raise CommandError("--full re-embeds every work order and cannot be combined with --since")
+
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since expects a date like 2025-06-01")
+            # initiation_date is aware: start of that day in TIME_ZONE
+            since = timezone.make_aware(datetime.combine(since, time.min))
+
         self.stdout.write("Loading work orders into vector store...")
-        initialize_vector_store()
-        self.stdout.write(self.style.SUCCESS("Successfully loaded work orders"))
\ No newline at end of file
+        result = sync_vector_store(
+            full=options['full'],
+            since=since,
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            vector_store=None if options['dry_run'] else get_vector_store(get_embeddings(options['embedder'])),
+        )
+        prefix = "Dry run: would have " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}embedded {result['embedded']}, skipped {result['skipped']}, "
+            f"deleted {result['deleted']} work orders"
+        ))
+        if not options['dry_run']:
+            self.stdout.write(
+                f"Embedded {result['embedded']} documents in {result['seconds']:.2f}s "
+                f"({result['docs_per_second']:.1f} docs/sec)"
+            )
@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from workorders import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the yearly partitions of the workorders and history tables ahead of time, '
+        'and detach closed work order years, with their history, into an archive schema'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=1, help='Years after the current one to create partitions for')
+        parser.add_argument('--archive-before', type=int, metavar='YEAR',
+                            help='Detach the work order partitions of every year before YEAR and '
+                                 'move the history of those orders alongside')
+        parser.add_argument('--archive-schema', default='archive',
+                            help="Schema detached partitions are moved to ('' leaves them in public)")
+        parser.add_argument('--force', action='store_true',
+                            help='Archive years that still hold work orders that are not closed')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        this_year = timezone.localdate().year
+        archive_before = options['archive_before']
+        if archive_before is not None and archive_before > this_year:
+            raise CommandError('Only past years can be archived')
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table, key in partitions.PARTITIONED_TABLES.items():
+                if not partitions.is_partitioned(cursor, table):
+                    raise CommandError(f'{table} is not partitioned, run migrate first')
+                attached = partitions.partitions(cursor, table)
+
+                # Future years, plus any year that has spilled into the default partition
+                wanted = set(range(this_year, this_year + options['ahead'] + 1))
+                if None in attached:
+                    wanted |= partitions.data_years(connection, attached[None], key)
+                for year in sorted(wanted - set(attached)):
+                    if archive_before is not None and year < archive_before:
+                        continue
+                    if not options['dry_run']:
+                        partitions.create_year_partition(cursor, table, key, year)
+                    self.stdout.write(f'Created {partitions.partition_name(table, year)}')
+
+                # History follows its work orders (see archive), whatever year it was written in
+                if archive_before is not None and table == 'workorders_workorders':
+                    for year in sorted(year for year in attached if year is not None and year < archive_before):
+                        self.archive(cursor, table, year, options)
+
+            self.report(cursor)
+            if options['dry_run']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.WARNING('Dry run, nothing changed'))
+
+    def archive(self, cursor, table, year, options):
+        name = partitions.partition_name(table, year)
+        if not options['force']:
+            cursor.execute(
+                f"""
+                SELECT count(*) FROM {name} wo
+                LEFT JOIN workorders_closed c ON c.id = wo.closed_id
+                WHERE c.closed IS DISTINCT FROM 'Yes'
+                """
+            )
+            still_open = cursor.fetchone()[0]
+            if still_open:
+                self.stdout.write(self.style.WARNING(
+                    f'Kept {name}: {still_open} work orders are not closed (--force archives anyway)'
+                ))
+                return
+        # Dry runs move and detach too, then roll back, so the counts are real
+        schema = options['archive_schema'] or None
+        history, moved = partitions.archive_history(cursor, name, year, schema)
+        name = partitions.detach_year_partition(cursor, table, year, schema)
+        self.stdout.write(self.style.SUCCESS(f'Archived {name}, and {moved} history rows into {history}'))
+
+    def report(self, cursor):
+        for table in partitions.PARTITIONED_TABLES:
+            duplicates = partitions.duplicate_ids(cursor, table)
+            if duplicates:
+                self.stdout.write(self.style.ERROR(
+                    f'{table} has ids on more than one row, inserted without the sequence: {duplicates}'
+                ))
+        self.stdout.write(f"{'partition':<42} {'est. rows':>10} {'size':>10}")
+        for table in partitions.PARTITIONED_TABLES:
+            for year, name in sorted(partitions.partitions(cursor, table).items(), key=lambda item: item[0] or 0):
+                cursor.execute(
+                    'SELECT reltuples::bigint, pg_size_pretty(pg_total_relation_size(oid)) FROM pg_class WHERE oid = %s::regclass',
+                    [name],
+                )
+                rows, size = cursor.fetchone()
+                self.stdout.write(f'{name:<42} {max(rows, 0):>10} {size:>10}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from workorders.rollups import rebuild_daily_stats
+
+class Command(BaseCommand):
+    help = 'Rebuild the WorkOrderDailyStat rollup from the workorders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding workorder daily stats...")
+        rows = rebuild_daily_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily stat rows"))
@@ -0,0 +1,462 @@
+import csv
+import io
+import itertools
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import Department, Profile
+from workorders import history, partitions, rollups, versioning
+from workorders.models import (
+    Closed, EmbeddedWorkOrder, Equipment, Location, Machine_Type, Part, Part_Type, Pending, Type_of_Work, WorkOrderHistory,
+    Work_Status, workorders,
+)
+from workorders.reference import REFERENCE_MODELS
+
+USERNAME_PREFIX = 'seed-'
+
+HISTORY_COLUMNS = ['workorder_id', 'snapshot', 'version', 'is_checkpoint', 'timestamp', 'changed_by_id', 'action']
+
+# Production departments and their halls; every hall gets --equipment / len(halls) machines
+PLANT = {
+    'Spinning': ['Blow Room', 'Carding', 'Ring Frame Hall', 'Autocone'],
+    'Weaving': ['Loom Shed A', 'Loom Shed B', 'Warping'],
+    'Dyeing': ['Jet Dyeing', 'Yarn Dyeing'],
+    'Finishing': ['Stenter Hall', 'Inspection'],
+    'Packing': ['Packing Hall', 'Warehouse'],
+    'Utilities': ['Power House', 'Boiler House', 'Compressor Room', 'ETP'],
+}
+
+# Machine type -> (tag code, {maintenance department: problems}, part names)
+MACHINES = {
+    'Motor': ('MOT', {
+        'Electrical': ['Motor tripping on overload', 'Motor running hot', 'Motor not starting', 'Burning smell from motor terminal box'],
+        'Mechanical': ['Abnormal noise from motor bearing', 'Motor coupling broken', 'Excessive vibration on motor base'],
+    }, ['Bearing 6205', 'Bearing 6308', 'Coupling spider', 'Terminal block']),
+    'Pump': ('PMP', {
+        'Electrical': ['Pump motor tripping', 'Pump not starting from panel'],
+        'Mechanical': ['Mechanical seal leaking', 'Pump not building pressure', 'Cavitation noise from pump', 'Gland packing leakage'],
+    }, ['Mechanical seal', 'Impeller', 'Gland packing', 'Bearing 6206']),
+    'Compressor': ('CMP', {
+        'Electrical': ['Compressor tripping on high temperature', 'Star delta starter fault'],
+        'Mechanical': ['Air leakage at discharge line', 'Oil carry over in compressed air', 'Low discharge pressure'],
+    }, ['Air filter', 'Oil separator', 'Unloader valve', 'Contactor']),
+    'Conveyor': ('CNV', {
+        'Electrical': ['Conveyor drive not starting', 'Proximity sensor not detecting'],
+        'Mechanical': ['Conveyor belt slipping', 'Belt running off track', 'Roller jammed', 'Gearbox oil leakage'],
+    }, ['Flat belt', 'Idler roller', 'Gearbox oil seal', 'Proximity sensor']),
+    'Fan': ('FAN', {
+        'Electrical': ['Fan motor humming but not running', 'Fan speed low, VFD fault'],
+        'Mechanical': ['Fan blade imbalance', 'V-belt broken on exhaust fan'],
+    }, ['V-belt B52', 'Fan blade', 'Bearing 6204']),
+    'Panel': ('PNL', {
+        'Electrical': ['MCB tripping frequently', 'Loose connection, burning smell', 'Indicator lamps not working', 'Contactor chattering', 'Earth fault alarm'],
+    }, ['MCB 32A', 'Contactor 25A', 'Overload relay', 'Indicator lamp']),
+    'Boiler': ('BLR', {
+        'Electrical': ['Burner not firing', 'Level controller fault'],
+        'Mechanical': ['Steam leakage at header valve', 'Feed water pump seal leaking', 'Safety valve popping early'],
+    }, ['Gasket', 'Gate valve 2"', 'Level probe', 'Burner nozzle']),
+    'Loom': ('LOM', {
+        'Electrical': ['Loom stopping, sensor fault', 'Weft feeder not working'],
+        'Mechanical': ['Shuttle box worn', 'Heald frame broken', 'Beam not rotating smoothly'],
+    }, ['Weft sensor', 'Heald frame', 'Picking stick', 'Bearing 6203']),
+}
+
+DETAILS = ['', '', '', ' since morning shift', ', urgent', ' after power failure', ', needs inspection', ' (recurring)', ' during night shift']
+
+COMPLETION_REMARKS = [
+    'Replaced faulty part and tested', 'Tightened connections, running normal', 'Cleaned and lubricated',
+    'Aligned and retensioned', 'Rewound and reinstalled', 'Adjusted settings, observed for one hour',
+]
+REJECTION_REMARKS = ['Duplicate request', 'Operational issue, not maintenance', 'Scheduled in next shutdown']
+PENDING_REASONS = ['Spare part not available', 'Shutdown required', 'Vendor support required']
+
+# How a work order ends, before the cut-off at --end drops the steps that have not happened yet
+REJECTED_SHARE = 0.07
+SLOW_ACCEPT_SHARE = 0.05  # sits in the backlog for weeks before anyone picks it up
+WAITING_SHARE = 0.1  # waits on a spare part or a shutdown before completion
+CLOSED_SHARE = 0.85
+REOPENED_SHARE = 0.03
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic plant: departments, locations, equipment, parts, users with '
+        'profiles, and work orders with realistic lifecycles and history, loaded with COPY in chunks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100_000, help='Work orders to generate')
+        parser.add_argument('--years', type=float, default=3, help='Span of initiation dates, ending at --end')
+        parser.add_argument('--end', type=datetime.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Latest moment in the dataset (default: now); pin it to reproduce a dataset exactly')
+        parser.add_argument('--equipment', type=int, default=400, help='Machines across all halls')
+        parser.add_argument('--production-users', type=int, default=60)
+        parser.add_argument('--utilities-users', type=int, default=16, help='Split between Electrical and Mechanical')
+        parser.add_argument('--managers', type=int, default=3)
+        parser.add_argument('--password', default='seed-password', help='Password of every generated user')
+        parser.add_argument('--chunk-size', type=int, default=20_000, help='Work orders per COPY and transaction')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed, the same seed gives the same dataset')
+        parser.add_argument('--no-history', action='store_true', help='Skip WorkOrderHistory rows')
+        parser.add_argument('--flush', action='store_true',
+                            help=f'Delete the work orders of earlier runs (initiated by {USERNAME_PREFIX}* users) first')
+
+    def handle(self, *args, **options):
+        if options['orders'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--orders must be positive and --chunk-size at least 1')
+        end = options['end'] or timezone.now()
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
+        start = end - timedelta(days=365 * options['years'])
+        rng = random.Random(options['seed'])
+
+        if options['flush']:
+            self.flush()
+        with transaction.atomic():
+            catalog = self.create_catalog(options)
+            users = self.create_users(options)
+        self.stdout.write(
+            f"Catalog: {len(catalog['equipment'])} machines, {sum(map(len, catalog['parts'].values()))} parts; users: "
+            + ', '.join(f'{len(people)} {role}' for role, people in users.items())
+        )
+        self.create_partitions(start, end)
+
+        generator = WorkOrderGenerator(rng, catalog, users, start, end)
+        started, loaded, history_rows = time.perf_counter(), 0, 0
+        while loaded < options['orders']:
+            size = min(options['chunk_size'], options['orders'] - loaded)
+            with transaction.atomic():
+                orders, entries = generator.chunk(self.reserve_ids(size), with_history=not options['no_history'])
+                self.copy(workorders, generator.columns, orders)
+                if entries:
+                    self.copy(WorkOrderHistory, HISTORY_COLUMNS, entries)
+            loaded += size
+            history_rows += len(entries)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{loaded:>10} work orders, {history_rows:>10} history rows, {loaded / elapsed:>8.0f} orders/s')
+
+        self.stdout.write('Rebuilding the daily rollup and statistics...')
+        rollups.rebuild_daily_stats()
+        with connection.cursor() as cursor:
+            for model in (workorders, WorkOrderHistory):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        for model in (*REFERENCE_MODELS, Location, Equipment, Part, workorders):
+            versioning.bump(model)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {loaded} work orders and {history_rows} history rows in {time.perf_counter() - started:.0f}s'
+        ))
+
+    def flush(self):
+        seeded = workorders.objects.filter(initiated_by__username__startswith=USERNAME_PREFIX)
+        with transaction.atomic():
+            # Raw deletes: the ORM would load every row to cascade and send signals. What the
+            # signals do is done here instead: vectors are marked for sync_vector_store, and
+            # the rollup is rebuilt once the new orders are in (handle()).
+            EmbeddedWorkOrder.objects.filter(workorder_id__in=seeded.values('id'), deleted_at__isnull=True).update(
+                deleted_at=timezone.now()
+            )
+            removed = WorkOrderHistory.objects.filter(workorder__in=seeded.values('id'))._raw_delete(connection.alias)
+            orders = seeded._raw_delete(connection.alias)
+        self.stdout.write(f'Flushed {orders} work orders and {removed} history rows')
+
+    def create_catalog(self, options):
+        # Reference rows inserted with explicit ids (migration 0004) leave their
+        # sequences behind, so move them past the existing rows first
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(), list(REFERENCE_MODELS)):
+                cursor.execute(statement)
+
+        names = lambda model, field, values: ensure(model, [{field: value} for value in values], [field])
+        departments = names(Department, 'department', ['Electrical', 'Mechanical', *PLANT])
+        machine_types = names(Machine_Type, 'machine_type', MACHINES)
+        part_types = names(Part_Type, 'part_type', ['Bearing', 'Seal', 'Belt', 'Electrical', 'Valve', 'Sensor', 'General'])
+        statuses = names(Work_Status, 'work_status', ['Pending', 'In_Process', 'Completed', 'Rejected'])
+        closed = names(Closed, 'closed', ['Yes', 'No'])
+        pending = names(Pending, 'pending', PENDING_REASONS)
+        work_types = names(Type_of_Work, 'type_of_work', ['Repair', 'Preventive', 'Modification', 'Installation'])
+
+        locations = list(ensure(
+            Location,
+            [{'department_id': departments[department].id, 'area': area} for department, areas in PLANT.items() for area in areas],
+            ['department_id', 'area'],
+        ).values())
+        kinds = list(MACHINES)
+        planned = [(number, kinds[number * 7 % len(kinds)]) for number in range(1, options['equipment'] + 1)]
+        equipment = list(ensure(
+            Equipment,
+            [
+                {
+                    'machine': f'{MACHINES[kind][0]}-{number:04d}',
+                    'machine_type_id': machine_types[kind].id,
+                    'location_id': locations[number % len(locations)].id,
+                }
+                for number, kind in planned
+            ],
+            ['machine'],
+        ).values())
+        types_by_id = {machine_type.id: name for name, machine_type in machine_types.items()}
+        parts = ensure(
+            Part,
+            [
+                {'equipment_id': machine.id, 'name': name, 'part_type_id': part_types[part_type_of(name)].id}
+                for machine in equipment
+                for name in MACHINES[types_by_id[machine.machine_type_id]][2]
+            ],
+            ['equipment_id', 'name'],
+        )
+        parts_by_equipment = {}
+        for part in parts.values():
+            parts_by_equipment.setdefault(part.equipment_id, []).append(part)
+
+        return {
+            'departments': departments, 'statuses': statuses, 'closed': closed, 'pending': pending,
+            'work_types': work_types, 'equipment': equipment, 'parts': parts_by_equipment,
+            'machine_types': types_by_id,
+        }
+
+    def create_users(self, options):
+        departments = {department.department: department for department in Department.objects.all()}
+        password = make_password(options['password'])
+        planned = {
+            'production': [
+                (f'{USERNAME_PREFIX}prod-{number:03d}', list(PLANT)[number % len(PLANT)], {'is_production': True})
+                for number in range(1, options['production_users'] + 1)
+            ],
+            'Electrical': [
+                (f'{USERNAME_PREFIX}elec-{number:03d}', 'Electrical', {'is_utilities': True})
+                for number in range(1, (options['utilities_users'] + 1) // 2 + 1)
+            ],
+            'Mechanical': [
+                (f'{USERNAME_PREFIX}mech-{number:03d}', 'Mechanical', {'is_utilities': True})
+                for number in range(1, options['utilities_users'] // 2 + 1)
+            ],
+            'manager': [
+                (f'{USERNAME_PREFIX}mgr-{number:03d}', 'Utilities', {'is_manager': True})
+                for number in range(1, options['managers'] + 1)
+            ],
+        }
+        usernames = [username for people in planned.values() for username, _, _ in people]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(
+                username=username, password=password,
+                first_name=username.removeprefix(USERNAME_PREFIX).split('-')[0].title(),
+                last_name=username.rsplit('-', 1)[1],
+            )
+            for username in usernames if username not in existing
+        ])
+        by_name = User.objects.in_bulk(usernames, field_name='username')
+        with_profile = set(Profile.objects.filter(user__in=by_name.values()).values_list('user_id', flat=True))
+        # bulk_create skips Profile.save, which opens the profile image
+        Profile.objects.bulk_create([
+            Profile(user=by_name[username], department=departments[department], **flags)
+            for people in planned.values()
+            for username, department, flags in people
+            if by_name[username].id not in with_profile
+        ])
+        return {role: [by_name[username] for username, _, _ in people] for role, people in planned.items()}
+
+    def create_partitions(self, start, end):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table, key in partitions.PARTITIONED_TABLES.items():
+                if not partitions.is_partitioned(cursor, table):
+                    continue
+                attached = partitions.partitions(cursor, table)
+                for year in range(timezone.localtime(start).year, timezone.localtime(end).year + 1):
+                    if year not in attached:
+                        partitions.create_year_partition(cursor, table, key, year)
+
+    def reserve_ids(self, count):
+        # Ids up front, so history rows can point at work orders in the same COPY batch
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                [workorders._meta.db_table, count],
+            )
+            return [pk for pk, in cursor.fetchall()]
+
+    def copy(self, model, columns, rows):
+        buffer = io.StringIO()
+        # None is written as an empty field, which COPY reads as NULL (so would '': never generate it)
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+
+
+def ensure(model, rows, key):
+    """{key value(s): instance} in the order of `rows`, inserting the ones not there yet"""
+    identify = lambda values: tuple(values[field] for field in key) if len(key) > 1 else values[key[0]]
+
+    def existing():
+        found = {}
+        for instance in model.objects.filter(**{f'{key[0]}__in': {row[key[0]] for row in rows}}).order_by('pk'):
+            found.setdefault(identify(instance.__dict__), instance)
+        return found
+
+    found = existing()
+    missing = [model(**row) for row in rows if identify(row) not in found]
+    if missing:
+        model.objects.bulk_create(missing)
+        found = existing()
+    return {identify(row): found[identify(row)] for row in rows}
+
+
+def part_type_of(name):
+    for word, part_type in (('Bearing', 'Bearing'), ('seal', 'Seal'), ('Seal', 'Seal'), ('belt', 'Belt'),
+                            ('Contactor', 'Electrical'), ('MCB', 'Electrical'), ('relay', 'Electrical'),
+                            ('lamp', 'Electrical'), ('valve', 'Valve'), ('sensor', 'Sensor'), ('probe', 'Sensor')):
+        if word in name:
+            return part_type
+    return 'General'
+
+
+class WorkOrderGenerator:
+    """
+    Work orders as COPY rows. Each one gets a planned lifecycle (created,
+    accepted or rejected, maybe held for a spare part, completed, closed);
+    steps planned after `end` are dropped, so recent orders are still open
+    and old ones mostly closed, like the real backlog.
+    """
+
+    def __init__(self, rng, catalog, users, start, end):
+        self.rng, self.catalog, self.users = rng, catalog, users
+        self.start, self.end = start, end
+        self.span = (end - start).total_seconds()
+        self.statuses, self.closed = catalog['statuses'], catalog['closed']
+        # Everything but search_vector, which Postgres generates
+        self.fields = [field for field in workorders._meta.concrete_fields if not getattr(field, 'generated', False)]
+        self.columns = [field.column for field in self.fields]
+        # A few machines break down far more often than the rest
+        self.equipment = rng.sample(catalog['equipment'], len(catalog['equipment']))
+        self.equipment_weights = list(itertools.accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(self.equipment))))
+        self.work_types = [catalog['work_types'][name] for name in ('Repair', 'Preventive', 'Modification', 'Installation')]
+
+    def chunk(self, ids, with_history=True):
+        orders, entries = [], []
+        for pk in ids:
+            row, steps = self.lifecycle(pk)
+            orders.append([self.value(row[field.attname]) for field in self.fields])
+            if not with_history:
+                continue
+            # Same rows history.entry() builds, without a model instance and a
+            # full state() encode per step
+            state = None
+            for version, (moment, user, action, changes) in enumerate(steps):
+                if state is None:
+                    state = history.state_from_values(changes)
+                    snapshot = state
+                else:
+                    snapshot = {name: history.encode(value) for name, value in changes.items()}
+                    snapshot = {name: value for name, value in snapshot.items() if state[name] != value}
+                    state = {**state, **snapshot}
+                checkpoint = version % history.CHECKPOINT_INTERVAL == 0
+                entries.append([
+                    pk, json.dumps(state if checkpoint else snapshot), version, checkpoint,
+                    moment.isoformat(), user.id, action,
+                ])
+        return orders, entries
+
+    def lifecycle(self, pk):
+        rng = self.rng
+        # Volume grows over the span: density rises linearly towards `end`
+        initiated = self.start + timedelta(seconds=self.span * math.sqrt(rng.random()))
+        machine = rng.choices(self.equipment, cum_weights=self.equipment_weights)[0]
+        machine_type = self.catalog['machine_types'][machine.machine_type_id]
+        problems = MACHINES[machine_type][1]
+        department = rng.choices(list(problems), weights=[3 if name == 'Electrical' else 2 for name in problems])[0]
+        if rng.random() < 0.03:
+            department = 'Miscellaneous'
+        problem = rng.choice(problems.get(department) or problems['Electrical']) + rng.choice(DETAILS)
+        initiator = rng.choice(self.users['production'])
+        crew = self.users.get(department) or self.users['Electrical'] + self.users['Mechanical']
+        technician = rng.choice(crew)
+        parts = self.catalog['parts'].get(machine.id, [])
+        part = rng.choice(parts) if parts and rng.random() < 0.3 else None
+
+        row = {
+            'id': pk,
+            'initiation_date': initiated,
+            'department': department,
+            'problem': problem,
+            'initiated_by_id': initiator.id,
+            'equipment_id': machine.id,
+            'part_id': part.id if part else None,
+            'type_of_work_id': rng.choices(self.work_types, weights=[80, 12, 5, 3])[0].id,
+            'closed_id': None,
+            'closing_remarks': None,
+            'accepted': None,
+            'assigned_to': None,
+            'target_date': None,
+            'remarks': None,
+            'replaced_part': 'none',
+            'completion_date': initiated,  # the column defaults to creation time until completed
+            'work_status_id': self.statuses['Pending'].id,
+            'pending_id': None,
+            'pr_number': 'none',
+            'pr_date': None,
+            'timestamp': None,
+            'equipment_name': machine.machine,
+        }
+        steps = [(initiated, initiator, 'created', dict(row))]
+
+        def step(moment, user, action, **changes):
+            if moment > self.end:
+                return False
+            row.update(changes)
+            steps.append((moment, user, action, changes))
+            return True
+
+        if rng.random() < SLOW_ACCEPT_SHARE:
+            moment = initiated + timedelta(days=rng.lognormvariate(3, 1))  # ~20 days median, months at the tail
+        else:
+            moment = initiated + timedelta(hours=rng.expovariate(1 / 3))
+        if rng.random() < REJECTED_SHARE:
+            step(moment, technician, 'rejected', accepted=False, assigned_to=None,
+                 work_status_id=self.statuses['Rejected'].id, remarks=rng.choice(REJECTION_REMARKS))
+            return row, steps
+
+        name = f'{technician.first_name} {technician.last_name}'
+        if not step(moment, technician, 'accepted', accepted=True, assigned_to=name,
+                    work_status_id=self.statuses['In_Process'].id,
+                    target_date=moment + timedelta(days=rng.randint(1, 3))):
+            return row, steps
+
+        if rng.random() < WAITING_SHARE:
+            moment += timedelta(hours=rng.uniform(1, 8))
+            reason = rng.choice(PENDING_REASONS)
+            if not step(moment, technician, 'updated', pending_id=self.catalog['pending'][reason].id,
+                        remarks=reason, pr_number=f'PR-{rng.randint(10000, 99999)}', pr_date=moment):
+                return row, steps
+            moment += timedelta(days=rng.lognormvariate(2.5, 0.6))  # ~12 days median
+        else:
+            moment += timedelta(hours=rng.lognormvariate(1.8, 1.0))  # ~6 hours median
+        if not step(moment, technician, 'completed', work_status_id=self.statuses['Completed'].id,
+                    completion_date=moment, remarks=rng.choice(COMPLETION_REMARKS),
+                    replaced_part=part.name if part else 'none'):
+            return row, steps
+
+        outcome = rng.random()
+        moment += timedelta(hours=rng.expovariate(1 / 30))
+        if outcome < CLOSED_SHARE:
+            step(moment, initiator, 'closed', closed_id=self.closed['Yes'].id, closing_remarks='Verified running')
+        elif outcome < CLOSED_SHARE + REOPENED_SHARE:
+            step(moment, initiator, 'reopened', closed_id=self.closed['No'].id, closing_remarks='Problem persists')
+        return row, steps
+
+    @staticmethod
+    def value(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
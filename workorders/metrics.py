@@ -0,0 +1,131 @@
+# workorders/metrics.py
+"""
+Prometheus metrics, scraped from /backend/metrics.
+
+Request latency comes from ProfilingMiddleware (workorders.profiling), one
+series per URL name, with the per-stage breakdown (db, serialize, render,
+llm) next to it. The AI agent, vector store ingest and the caches record
+their own metrics below.
+
+Each worker process keeps its own samples. To aggregate the workers on a
+host, point PROMETHEUS_MULTIPROC_DIR at an empty directory writable by all
+of them before they start and clear it on every deploy: each process then
+writes its samples there and the endpoint merges them, whichever worker
+answers the scrape. Under gunicorn, also call
+`metrics.mark_process_dead(worker.pid)` from the child_exit hook.
+Without PROMETHEUS_MULTIPROC_DIR the endpoint reports only the process that
+answered.
+
+Scrapes are let in from METRICS_ALLOWED_IPS (addresses or networks, by
+REMOTE_ADDR, so list the proxy when there is one), with
+`Authorization: Bearer <METRICS_TOKEN>`, or from a staff session.
+Everything else gets 401 when a token is configured, 403 otherwise.
+"""
+import hmac
+import ipaddress
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+# Seconds; the top buckets are for LLM calls and ingest batches
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram(
+    'workorders_request_duration_seconds', 'Request latency, streamed bodies excluded',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter('workorders_responses_total', 'Responses by status code', ['view', 'method', 'status'])
+STAGE_SECONDS = Histogram(
+    'workorders_request_stage_seconds', 'Time a request spent in a stage (db, serialize, render, llm)',
+    ['view', 'stage'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter('workorders_db_queries_total', 'SQL queries run by requests', ['view'])
+
+AI_PHASE_SECONDS = Histogram(
+    'workorders_ai_phase_seconds', 'AI agent time in the SQL phase and the LLM phase',
+    ['phase', 'mode'], buckets=LATENCY_BUCKETS,
+)
+
+INGEST_SECONDS = Histogram(
+    'workorders_vector_ingest_seconds', 'Vector store ingest time per batch: embedding requests and writes',
+    ['step'], buckets=LATENCY_BUCKETS,
+)
+INGEST_DOCUMENTS = Counter(
+    'workorders_vector_documents_total', 'Documents seen by vector store syncs', ['result'],
+)
+EMBEDDING_RETRIES = Counter('workorders_embedding_retries_total', 'Embedding batches retried after a failure')
+
+CACHE_REQUESTS = Counter('workorders_cache_requests_total', 'Cache lookups', ['cache', 'result'])
+
+
+def view_label(request):
+    """Bounded label for the view that served `request`: its URL name, else its route"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+def observe_request(request, response, profile):
+    """Record a finished request from its RequestProfile"""
+    view = view_label(request)
+    REQUEST_SECONDS.labels(view, request.method).observe(profile.elapsed())
+    RESPONSES.labels(view, request.method, str(response.status_code)).inc()
+    DB_QUERIES.labels(view).inc(profile.queries)
+    for stage, seconds in profile.durations.items():
+        # A stage the request never entered is not a fast sample of it
+        if seconds or stage == 'db':
+            STAGE_SECONDS.labels(view, stage).observe(seconds)
+
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live samples (gunicorn child_exit hook)"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+def registry(path=None):
+    """Registry to expose: the merged per-process files in multiprocess mode, else this process"""
+    path = path or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return REGISTRY
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged, path=path)
+    return merged
+
+
+def allowed_networks():
+    return [ipaddress.ip_network(entry.strip(), strict=False)
+            for entry in getattr(settings, 'METRICS_ALLOWED_IPS', ()) if entry.strip()]
+
+
+def is_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        return True
+    if getattr(request, 'user', None) is not None and request.user.is_staff:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in network for network in allowed_networks())
+
+
+def metrics_view(request):
+    if not is_allowed(request):
+        if getattr(settings, 'METRICS_TOKEN', ''):
+            response = HttpResponse('Authentication required', status=401, content_type='text/plain')
+            response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+            return response
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 15:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0005_userprompt_alter_workorders_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workorders',
+            index=models.Index(fields=['-initiation_date', '-id'], name='workorders_init_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2 on 2026-10-18 15:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_stats(apps, schema_editor):
+    WorkOrder = apps.get_model('workorders', 'workorders')
+    WorkOrderDailyStat = apps.get_model('workorders', 'WorkOrderDailyStat')
+
+    grouped = (
+        WorkOrder.objects
+        .annotate(day=TruncDate('initiation_date'))
+        .values(
+            'day', 'work_status_id',
+            'equipment__location__department_id',
+            'equipment__location_id',
+            'equipment__machine_type_id',
+        )
+        .annotate(
+            total=Count('id'),
+            repair_time=Sum(F('completion_date') - F('initiation_date')),
+        )
+        .order_by()
+    )
+    WorkOrderDailyStat.objects.bulk_create(
+        (
+            WorkOrderDailyStat(
+                day=row['day'],
+                department_id=row['equipment__location__department_id'],
+                location_id=row['equipment__location_id'],
+                machine_type_id=row['equipment__machine_type_id'],
+                work_status_id=row['work_status_id'],
+                count=row['total'],
+                repair_seconds=row['repair_time'].total_seconds() if row['repair_time'] else 0.0,
+            )
+            for row in grouped
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('workorders', '0006_workorders_init_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkOrderDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('repair_seconds', models.FloatField(default=0)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.department')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workorders.location')),
+                ('machine_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workorders.machine_type')),
+                ('work_status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='workorders.work_status')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'department', 'location', 'machine_type', 'work_status'), name='workorder_daily_stat_key', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0007_workorderdailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddedWorkOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workorder_id', models.BigIntegerField(unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('embedded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
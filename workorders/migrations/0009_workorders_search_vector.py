@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 15:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0008_embeddedworkorder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # pg_trgm ships with the contrib package, which not every server has;
+        # the trigram retrieval mode needs it, full-text search does not
+        migrations.RunSQL(
+            """
+            DO $$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+                    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                    CREATE INDEX IF NOT EXISTS workorders_problem_gin_idx
+                        ON workorders_workorders USING gin (problem gin_trgm_ops);
+                END IF;
+            END
+            $$;
+            """,
+            "DROP INDEX IF EXISTS workorders_problem_gin_idx;",
+        ),
+        migrations.AddField(
+            model_name='workorders',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('problem', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('remarks', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), '||', django.contrib.postgres.search.SearchVector('closing_remarks', config='english', weight='C'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='workorders',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='workorders_search_idx'),
+        ),
+    ]
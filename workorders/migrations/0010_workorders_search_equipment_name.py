@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 15:32
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0009_workorders_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workorders',
+            name='equipment_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE workorders_workorders wo
+            SET equipment_name = e.machine
+            FROM workorders_equipment e
+            WHERE wo.equipment_id = e.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        # Generated columns cannot be altered in place: drop and re-add with the new expression
+        migrations.RemoveIndex(
+            model_name='workorders',
+            name='workorders_search_idx',
+        ),
+        migrations.RemoveField(
+            model_name='workorders',
+            name='search_vector',
+        ),
+        migrations.AddField(
+            model_name='workorders',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('problem', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('equipment_name', config='english', weight='A'), django.contrib.postgres.search.SearchConfig('english')), '||', django.contrib.postgres.search.SearchVector('remarks', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), '||', django.contrib.postgres.search.SearchVector('closing_remarks', config='english', weight='C'), django.contrib.postgres.search.SearchConfig('english')), '||', django.contrib.postgres.search.SearchVector('assigned_to', config='english', weight='D'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='workorders',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='workorders_search_idx'),
+        ),
+    ]
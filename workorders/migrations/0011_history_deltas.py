@@ -0,0 +1,100 @@
+# Generated by Django 5.2 on 2026-10-18 15:44
+
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import migrations, models
+from django.utils import timezone
+
+# workorders.history.CHECKPOINT_INTERVAL when this was written
+CHECKPOINT_INTERVAL = 10
+
+
+def encode(value):
+    if hasattr(value, 'isoformat'):
+        if hasattr(value, 'tzinfo') and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value.isoformat()
+    return value
+
+
+def legacy_values(fields, snapshot):
+    """
+    Column values from any of the old snapshot shapes: full and partial view
+    snapshots, nested {'id': ...} relations, WorkOrderSerializer data and
+    str(datetime) dates.
+    """
+    values = {}
+    for field in fields:
+        if field.name not in snapshot:
+            continue
+        value = snapshot[field.name]
+        if field.is_relation and isinstance(value, dict):
+            value = value.get('id')
+        try:
+            values[field.attname] = encode(field.to_python(value))
+        except ValidationError:
+            continue
+    return values
+
+
+def encode_history_as_deltas(apps, schema_editor):
+    WorkOrder = apps.get_model('workorders', 'workorders')
+    WorkOrderHistory = apps.get_model('workorders', 'WorkOrderHistory')
+    fields = [field for field in WorkOrder._meta.concrete_fields if field.editable and not field.primary_key]
+    columns = [field.attname for field in fields]
+
+    pending = []
+    rows = WorkOrderHistory.objects.order_by('workorder_id', 'timestamp', 'id').iterator(chunk_size=2000)
+    for workorder_id, chain in groupby(rows, key=attrgetter('workorder_id')):
+        state = None
+        for version, row in enumerate(chain):
+            values = legacy_values(fields, row.snapshot)
+            if state is None:
+                # Chains that start with a partial snapshot are completed from the row as it is now
+                if len(values) < len(columns):
+                    current = WorkOrder.objects.filter(pk=workorder_id).values(*columns).first() or {}
+                    values = {**{name: encode(value) for name, value in current.items()}, **values}
+                row.is_checkpoint, row.snapshot = True, values
+            else:
+                after = {**state, **values}
+                row.is_checkpoint = version % CHECKPOINT_INTERVAL == 0
+                row.snapshot = after if row.is_checkpoint else {
+                    name: value for name, value in after.items() if state.get(name) != value
+                }
+                values = after
+            row.version, state = version, values
+            pending.append(row)
+
+        if len(pending) >= 1000:
+            WorkOrderHistory.objects.bulk_update(pending, ['snapshot', 'version', 'is_checkpoint'])
+            pending = []
+    WorkOrderHistory.objects.bulk_update(pending, ['snapshot', 'version', 'is_checkpoint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0010_workorders_search_equipment_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workorderhistory',
+            name='is_checkpoint',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='workorderhistory',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='workorderhistory',
+            index=models.Index(fields=['workorder', 'version'], name='workorders_history_version_idx'),
+        ),
+        migrations.RunPython(encode_history_as_deltas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,196 @@
+# Generated by Django 5.2 on 2026-10-18 15:50
+
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# The partitioning code as of this migration, frozen here so replaying it
+# always builds the same schema; workorders.partitions keeps what the
+# manage_partitions command needs at runtime.
+
+# table -> partition key
+PARTITIONED_TABLES = {
+    'workorders_workorders': 'initiation_date',
+    'workorders_workorderhistory': 'timestamp',
+}
+
+YEAR_PARTITION = re.compile(r'_y(\d{4})$')
+
+
+def partition_name(table, year):
+    return f'{table}_y{year}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def year_bounds(year):
+    """Partition bound literals for a calendar year in TIME_ZONE"""
+    zone = ZoneInfo(settings.TIME_ZONE)
+    return (
+        datetime(year, 1, 1, tzinfo=zone).isoformat(sep=' '),
+        datetime(year + 1, 1, 1, tzinfo=zone).isoformat(sep=' '),
+    )
+
+
+def partitions(cursor, table):
+    """{year (None for the default partition): partition name} currently attached to `table`"""
+    cursor.execute(
+        """
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) = 'DEFAULT'
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = %s::regclass
+        """,
+        [table],
+    )
+    attached = {}
+    for name, is_default in cursor.fetchall():
+        match = YEAR_PARTITION.search(name)
+        if is_default or match:
+            attached[None if is_default else int(match.group(1))] = name
+    return attached
+
+
+def insertable_columns(cursor, table):
+    """Columns of `table` in order, without generated ones (search_vector)"""
+    cursor.execute(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+        """,
+        [table],
+    )
+    return ', '.join(f'"{name}"' for name, in cursor.fetchall())
+
+
+def create_year_partition(cursor, table, key, year):
+    """
+    Create the partition for `year`. Rows that landed in the default
+    partition for that year are moved into it, Postgres refuses to create
+    it over them otherwise. Run inside a transaction.
+    """
+    name = partition_name(table, year)
+    lower, upper = year_bounds(year)
+    default = partitions(cursor, table).get(None)
+    columns = insertable_columns(cursor, table)
+    moved = f'{name}_moving' if default else None
+    if moved:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {moved} AS SELECT {columns} FROM {default} WHERE {key} >= %s AND {key} < %s',
+            [lower, upper],
+        )
+        cursor.execute(f'DELETE FROM {default} WHERE {key} >= %s AND {key} < %s', [lower, upper])
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    if moved:
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {moved}')
+        cursor.execute(f'DROP TABLE {moved}')
+    return name
+
+
+def rebuild_table(connection, table, key=None, years=()):
+    """
+    Recreate `table` with the same columns, data, indexes and foreign keys,
+    range partitioned by `key` with one partition per year in `years` plus
+    a default one, or as a plain table when `key` is None.
+    """
+    old = f'{table}_unpartitioned' if key else f'{table}_partitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        # Indexes on the parent only; partitions get theirs from the parent's
+        cursor.execute(
+            """
+            SELECT pg_get_indexdef(indexrelid) FROM pg_index
+            WHERE indrelid = %s::regclass AND NOT indisprimary
+            """,
+            [table],
+        )
+        # A partitioned parent's definitions read ON ONLY, which would not cascade to the partitions
+        indexes = [definition.replace(' ON ONLY ', ' ON ', 1) for definition, in cursor.fetchall()]
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute("SELECT attidentity <> '' FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [table])
+        identity = cursor.fetchone()[0]
+        columns = insertable_columns(cursor, table)
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        if identity:
+            # Partitioned tables cannot have identity columns: use a plain owned sequence
+            cursor.execute(f'ALTER TABLE {old} ALTER COLUMN id DROP IDENTITY')
+            sequence = f'{table}_id_seq'
+            cursor.execute(f'CREATE SEQUENCE {sequence}')
+        else:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING GENERATED '
+            f'INCLUDING CONSTRAINTS INCLUDING STORAGE)'
+            + (f' PARTITION BY RANGE ({key})' if key else '')
+        )
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        if key:
+            cursor.execute(f'CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT')
+            for year in sorted(years):
+                create_year_partition(cursor, table, key, year)
+
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {old}')
+        cursor.execute(f"SELECT setval('{sequence}', COALESCE((SELECT max(id) FROM {table}), 0) + 1, false)")
+        cursor.execute(f'DROP TABLE {old}')
+
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY ({"id, " + key if key else "id"})')
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+        for definition in indexes:
+            cursor.execute(definition)
+        cursor.execute(f'ANALYZE {table}')
+
+
+def data_years(connection, table, key):
+    """Calendar years (in TIME_ZONE) that hold rows of `table`"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT extract(year FROM {key} AT TIME ZONE %s)::int FROM {table}',
+            [settings.TIME_ZONE],
+        )
+        return {year for year, in cursor.fetchall()}
+
+
+def partition_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    this_year = timezone.localdate().year
+    for table, key in PARTITIONED_TABLES.items():
+        years = data_years(connection, table, key) | {this_year, this_year + 1}
+        rebuild_table(connection, table, key, years)
+
+
+def unpartition_tables(apps, schema_editor):
+    for table in PARTITIONED_TABLES:
+        rebuild_table(schema_editor.connection, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0011_history_deltas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='workorderhistory',
+            name='workorder',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='history', to='workorders.workorders'),
+        ),
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
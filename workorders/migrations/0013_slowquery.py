@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 16:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0012_partition_by_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('view', models.CharField(max_length=200)),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('sql', models.TextField()),
+                ('duration_ms', models.FloatField()),
+                ('plan', models.TextField(blank=True)),
+                ('seq_scan', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['fingerprint', '-recorded_at'], name='workorders_slowquery_fp_idx')],
+            },
+        ),
+    ]
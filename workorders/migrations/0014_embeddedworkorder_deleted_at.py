@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workorders', '0013_slowquery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='embeddedworkorder',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.contrib.auth.models import User
 from accounts.models import Profile, Department
 from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db.models.functions import Upper
 
 
@@ -101,15 +102,32 @@ class workorders(models.Model):
 	pr_number = models.CharField(max_length=50, default='none')
 	pr_date = models.DateTimeField(null=True, blank=True)
 	timestamp = models.DateTimeField(null=True, blank=True)
-
+	# Copy of equipment.machine kept in step by signals, so it can feed search_vector
+	equipment_name = models.CharField(max_length=50, blank=True, default='', editable=False)
+	# Maintained by Postgres: problem and equipment rank above remarks, remarks above the rest
+	search_vector = models.GeneratedField(
+		expression=(
+			SearchVector('problem', weight='A', config='english')
+			+ SearchVector('equipment_name', weight='A', config='english')
+			+ SearchVector('remarks', weight='B', config='english')
+			+ SearchVector('closing_remarks', weight='C', config='english')
+			+ SearchVector('assigned_to', weight='D', config='english')
+		),
+		output_field=SearchVectorField(),
+		db_persist=True,
+	)
+
+	# Range partitioned by year of initiation_date in the database, see workorders.partitions
 	class Meta:
 		indexes = [
 			models.Index(fields=['initiation_date'], name='workorders_init_date_idx'),
+			models.Index(fields=['-initiation_date', '-id'], name='workorders_init_date_id_idx'),
 			models.Index(fields=['department'], name='workorders_dept_idx'),
 			models.Index(fields=['equipment'], name='workorders_equip_idx'),
 			models.Index(fields=['part'], name='workorders_part_idx'),
 			models.Index(fields=['type_of_work'], name='workorders_work_type_idx'),
 			models.Index(fields=['work_status'], name='workorders_status_idx'),
+			GinIndex(fields=['search_vector'], name='workorders_search_idx'),
 		]
 		ordering = ['-initiation_date']
 
@@ -119,14 +137,21 @@ class workorders(models.Model):
 
 
 class WorkOrderHistory(models.Model):
-    workorder = models.ForeignKey('workorders', on_delete=models.CASCADE, related_name='history')
-    snapshot = models.JSONField()  # Stores the complete workorder state at this point
+    # No database constraint: workorders is partitioned (see workorders.partitions)
+    workorder = models.ForeignKey('workorders', on_delete=models.CASCADE, related_name='history', db_constraint=False)
+    # Changed columns only, or every column on checkpoints (see workorders.history)
+    snapshot = models.JSONField()
+    version = models.PositiveIntegerField(default=0)  # 0 for the creation, +1 per change
+    is_checkpoint = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
     changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=100)  # e.g., "created", "accepted", "completed"
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['workorder', 'version'], name='workorders_history_version_idx'),
+        ]
 
 
 class UserPrompt(models.Model):
@@ -140,4 +165,63 @@ class UserPrompt(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"Prompt by {self.user.username if self.user else 'Anonymous'} at {self.created_at}"
\ No newline at end of file
+        return f"Prompt by {self.user.username if self.user else 'Anonymous'} at {self.created_at}"
+
+
+class WorkOrderDailyStat(models.Model):
+    """Per-day workorder counts, maintained incrementally by workorders.rollups"""
+    day = models.DateField()
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    machine_type = models.ForeignKey(Machine_Type, on_delete=models.CASCADE)
+    work_status = models.ForeignKey(Work_Status, on_delete=models.CASCADE, null=True, blank=True)
+    count = models.IntegerField(default=0)
+    repair_seconds = models.FloatField(default=0)  # Sum of completion_date - initiation_date
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'department', 'location', 'machine_type', 'work_status'],
+                name='workorder_daily_stat_key',
+                nulls_distinct=False,
+            ),
+        ]
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day} {self.location} {self.machine_type} {self.work_status}: {self.count}"
+
+
+class EmbeddedWorkOrder(models.Model):
+    """What the vector store currently holds for a workorder (see utils.ai_utils.sync_vector_store)"""
+    # Not a foreign key: the row must outlive a deleted workorder so its vector can be removed
+    workorder_id = models.BigIntegerField(unique=True)
+    content_hash = models.CharField(max_length=64)
+    embedded_at = models.DateTimeField(default=timezone.now)
+    # Set when the workorder is deleted through the ORM; the next sync removes its vector.
+    # Archived partitions are detached without it, so their vectors stay.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"WO#{self.workorder_id} {self.content_hash[:12]}"
+
+
+class SlowQuery(models.Model):
+    """A query that ran over SLOW_QUERY_THRESHOLD_MS, recorded by workorders.slow_queries"""
+    recorded_at = models.DateTimeField(default=timezone.now)
+    view = models.CharField(max_length=200)  # URL name of the view that ran it
+    fingerprint = models.CharField(max_length=32)  # Hash of the normalized SQL, the same for every run of a query
+    sql = models.TextField()  # Normalized: literals and parameters replaced by ?
+    duration_ms = models.FloatField()
+    plan = models.TextField(blank=True)  # EXPLAIN output, only on a sample
+    seq_scan = models.BooleanField(default=False)  # The plan scans a whole table
+
+    class Meta:
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['fingerprint', '-recorded_at'], name='workorders_slowquery_fp_idx'),
+        ]
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return f"{self.view} {self.duration_ms:.0f} ms: {self.sql[:80]}"
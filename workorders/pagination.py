@@ -0,0 +1,165 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class WorkOrderCursorPagination(BasePagination):
+    """
+    Keyset pagination over (initiation_date, id), newest first.
+
+    Each page is fetched with a `WHERE (initiation_date, id) < (cursor)` seek
+    instead of OFFSET, so page 500 costs the same as page 1. The total is only
+    counted when the client asks for it with ?include_count=true.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'include_count'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    ordering_field = 'initiation_date'
+
+    @classmethod
+    def is_requested(cls, request):
+        """Cursor mode is opt-in so existing ?page=N clients keep working"""
+        params = request.query_params
+        return cls.cursor_query_param in params or params.get(cls.mode_query_param) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = queryset.count() if self.wants_count(request) else None
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            reverse, position = False, None
+        else:
+            reverse, position = cursor
+
+        if position is not None:
+            queryset = self.seek(queryset, position, reverse)
+
+        ordering = (self.ordering_field, 'id') if reverse else ('-' + self.ordering_field, '-id')
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Moving backwards always leaves a page behind us and vice versa
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def seek(self, queryset, position, reverse):
+        value, pk = position
+        field = self.ordering_field
+        if reverse:
+            return queryset.filter(**{field + '__gte': value}).filter(
+                Q(**{field + '__gt': value}) | Q(**{field: value, 'id__gt': pk})
+            )
+        return queryset.filter(**{field + '__lte': value}).filter(
+            Q(**{field + '__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            position = (self.parse_position_value(payload['d']), int(payload['i']))
+            return bool(payload.get('r')), position
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        payload = {'d': self.format_position_value(getattr(obj, self.ordering_field)), 'i': obj.pk}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def parse_position_value(self, value):
+        return datetime.fromisoformat(value)
+
+    def format_position_value(self, value):
+        return value.isoformat()
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class WorkOrderSearchPagination(WorkOrderCursorPagination):
+    """
+    Keyset pagination over (rank, id), best match first, for search results.
+
+    The queryset must annotate `rank` as double precision so the value read
+    back into the cursor compares exactly on the next request.
+    """
+    ordering_field = 'rank'
+
+    def parse_position_value(self, value):
+        return float(value)
+
+    def format_position_value(self, value):
+        return value
@@ -0,0 +1,23 @@
+# workorders/parsers.py
+import csv
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """text/csv body with a header row -> list of dicts, blank cells dropped"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            text = stream.read().decode(encoding).lstrip('\ufeff')
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for row in csv.DictReader(io.StringIO(text))
+            ]
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f'CSV parse error - {exc}')
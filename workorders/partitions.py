@@ -0,0 +1,178 @@
+# workorders/partitions.py
+"""
+Yearly range partitions for the two tables that grow forever.
+
+workorders_workorders is partitioned by initiation_date and
+workorders_workorderhistory by timestamp: one partition per calendar year in
+TIME_ZONE (`<table>_y2026`) plus a `<table>_default` catch-all. Queries
+filtered on those columns only scan the matching years.
+
+Postgres wants the partition key in the primary key, so both tables are keyed
+on (id, <key>) in the database. Django keeps treating `id` as the primary
+key, but no foreign key constraint can point at them: WorkOrderHistory.
+workorder is db_constraint=False, deletes still cascade through the ORM.
+
+The database no longer enforces that `id` alone is unique: two rows with the
+same id in different years would both be accepted. Ids are unique because
+they only come from the table's sequence, so rows must be inserted without
+an explicit id (the column default, or nextval() as seed_workorders does).
+manage_partitions reports any duplicate ids it finds.
+
+The manage_partitions command creates future years and archives old ones. A
+work order year is archived together with the history of those orders,
+whenever that history was written: the history partitions, keyed by
+timestamp, are never detached themselves.
+"""
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+# table -> partition key
+PARTITIONED_TABLES = {
+    'workorders_workorders': 'initiation_date',
+    'workorders_workorderhistory': 'timestamp',
+}
+
+YEAR_PARTITION = re.compile(r'_y(\d{4})$')
+
+
+def partition_name(table, year):
+    return f'{table}_y{year}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def year_bounds(year):
+    """Partition bound literals for a calendar year in TIME_ZONE"""
+    zone = ZoneInfo(settings.TIME_ZONE)
+    return (
+        datetime(year, 1, 1, tzinfo=zone).isoformat(sep=' '),
+        datetime(year + 1, 1, 1, tzinfo=zone).isoformat(sep=' '),
+    )
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [table])
+    return cursor.fetchone()[0]
+
+
+def partitions(cursor, table):
+    """{year (None for the default partition): partition name} currently attached to `table`"""
+    cursor.execute(
+        """
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) = 'DEFAULT'
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = %s::regclass
+        """,
+        [table],
+    )
+    attached = {}
+    for name, is_default in cursor.fetchall():
+        match = YEAR_PARTITION.search(name)
+        if is_default or match:
+            attached[None if is_default else int(match.group(1))] = name
+    return attached
+
+
+def insertable_columns(cursor, table):
+    """Columns of `table` in order, without generated ones (search_vector)"""
+    cursor.execute(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+        """,
+        [table],
+    )
+    return ', '.join(f'"{name}"' for name, in cursor.fetchall())
+
+
+def create_year_partition(cursor, table, key, year):
+    """
+    Create the partition for `year`. Rows that landed in the default
+    partition for that year are moved into it, Postgres refuses to create
+    it over them otherwise. Run inside a transaction.
+    """
+    name = partition_name(table, year)
+    lower, upper = year_bounds(year)
+    default = partitions(cursor, table).get(None)
+    columns = insertable_columns(cursor, table)
+    moved = f'{name}_moving' if default else None
+    if moved:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {moved} AS SELECT {columns} FROM {default} WHERE {key} >= %s AND {key} < %s',
+            [lower, upper],
+        )
+        cursor.execute(f'DELETE FROM {default} WHERE {key} >= %s AND {key} < %s', [lower, upper])
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    if moved:
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {moved}')
+        cursor.execute(f'DROP TABLE {moved}')
+    return name
+
+
+def detach_year_partition(cursor, table, year, schema=None):
+    """
+    Detach the partition for `year`, moving it to `schema` when given. The
+    table and its rows stay around; ALTER TABLE ... ATTACH PARTITION brings
+    them back.
+    """
+    name = partition_name(table, year)
+    cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+    if schema:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+        cursor.execute(f'ALTER TABLE {name} SET SCHEMA {schema}')
+    return f'{schema}.{name}' if schema else name
+
+
+def archived_history_name(year):
+    """Archive table holding the history of the work orders initiated in `year`"""
+    return f'workorders_workorderhistory_orders_y{year}'
+
+
+def archive_history(cursor, workorders_partition, year, schema=None):
+    """
+    Move every history row of the work orders in `workorders_partition` out
+    of the live history table into archived_history_name(year), in `schema`
+    when given. INSERT INTO workorders_workorderhistory SELECT * FROM it
+    brings them back. Run inside a transaction, before the work order
+    partition is detached.
+    """
+    history = 'workorders_workorderhistory'
+    name = f'{schema}.{archived_history_name(year)}' if schema else archived_history_name(year)
+    if schema:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+    columns = insertable_columns(cursor, history)
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {name} (LIKE {history} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {history} h USING {workorders_partition} wo
+            WHERE h.workorder_id = wo.id
+            RETURNING {', '.join('h.' + column for column in columns.split(', '))}
+        )
+        INSERT INTO {name} ({columns}) SELECT * FROM moved
+        """
+    )
+    return name, cursor.rowcount
+
+
+def duplicate_ids(cursor, table, limit=10):
+    """Ids held by more than one row of `table`, which only (id, key) keeps apart"""
+    cursor.execute(f'SELECT id FROM {table} GROUP BY id HAVING count(*) > 1 ORDER BY id LIMIT %s', [limit])
+    return [id for id, in cursor.fetchall()]
+
+
+def data_years(connection, table, key):
+    """Calendar years (in TIME_ZONE) that hold rows of `table`"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT extract(year FROM {key} AT TIME ZONE %s)::int FROM {table}',
+            [settings.TIME_ZONE],
+        )
+        return {year for year, in cursor.fetchall()}
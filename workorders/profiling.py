@@ -0,0 +1,189 @@
+# workorders/profiling.py
+"""
+Per-request latency breakdown, on in production without DEBUG.
+
+ProfilingMiddleware times every request: SQL query count and time (through
+a database execute wrapper), the view, response rendering and LLM calls.
+DRF serialization is timed too with PROFILING_SERIALIZER_TIMING, see
+instrument_serializers(). The numbers go out in a Server-Timing header, which
+browser dev tools chart per request, and a sampled JSON line is logged to
+'workorders.profiling' (PROFILING_LOG_SAMPLE_RATE). Every request also
+feeds the Prometheus histograms in workorders.metrics, and queries over
+SLOW_QUERY_THRESHOLD_MS are handed to workorders.slow_queries.
+
+Stages overlap: `view` includes the SQL and serialization it triggered.
+Other code adds to the current request with `with profiling.timed('llm'):`,
+outside a request that is a no-op. Streamed bodies are produced after the
+middleware returns and are not included.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, slow_queries
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_profile', default=None)
+
+# Server-Timing metric names, in header order
+STAGES = ('db', 'view', 'serialize', 'render', 'llm')
+
+
+class RequestProfile:
+    def __init__(self, slow_query_threshold=None):
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(STAGES, 0.0)  # seconds
+        self.queries = 0
+        self.active = set()
+        self.view_started = None
+        self.slow_query_threshold = slow_query_threshold  # seconds, None to keep none
+        self.slow_queries = []  # (alias, sql, params, many, seconds)
+
+    def record_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            self.queries += 1
+            self.durations['db'] += seconds
+            if self.slow_query_threshold is not None and seconds >= self.slow_query_threshold:
+                self.slow_queries.append((context['connection'].alias, sql, params, many, seconds))
+
+    def add(self, stage, seconds):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        metrics = [f'db;dur={self.durations["db"] * 1000:.1f};desc="{self.queries} queries"']
+        metrics += [
+            f'{stage};dur={self.durations[stage] * 1000:.1f}'
+            for stage in STAGES[1:] if self.durations[stage]
+        ]
+        metrics.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            **{f'{stage}_ms': round(seconds * 1000, 2) for stage, seconds in self.durations.items()},
+            'total_ms': round(self.elapsed() * 1000, 2),
+        }
+
+
+@contextmanager
+def timed(stage):
+    """Add the block's wall time to `stage` of the current request, once per nesting level"""
+    profile = _current.get()
+    if profile is None or stage in profile.active:
+        yield
+        return
+    profile.active.add(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.active.discard(stage)
+        profile.add(stage, time.perf_counter() - started)
+
+
+_original_data = {}  # serializer class -> its own `data` property, while instrumented
+
+
+def instrument_serializers():
+    """
+    Time serializer `.data`, where DRF calls to_representation(). DRF has no
+    hook around serialization, so this replaces the property on DRF's
+    Serializer and ListSerializer for the whole process: the middleware only
+    does it with PROFILING_SERIALIZER_TIMING, uninstrument_serializers()
+    puts the originals back.
+    """
+    if _original_data:
+        return
+    from rest_framework import serializers
+
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        data = _original_data[serializer_class] = serializer_class.__dict__['data']
+
+        def timed_data(self, data=data):
+            with timed('serialize'):
+                return data.fget(self)
+        serializer_class.data = property(timed_data)
+
+
+def uninstrument_serializers():
+    while _original_data:
+        serializer_class, data = _original_data.popitem()
+        serializer_class.data = data
+
+
+class ProfilingMiddleware:
+    """
+    Goes first in MIDDLEWARE, so `total` covers the rest of the stack.
+    Adds Server-Timing to every response, records its metrics and logs a
+    sampled line.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_LOG_SAMPLE_RATE', 0.01)
+        self.slow_query_threshold = slow_queries.threshold()
+        if getattr(settings, 'PROFILING_SERIALIZER_TIMING', False):
+            instrument_serializers()
+
+    def __call__(self, request):
+        profile = RequestProfile(self.slow_query_threshold)
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if profile.view_started is not None and not profile.durations['view']:
+            profile.add('view', time.perf_counter() - profile.view_started)
+        response['Server-Timing'] = profile.server_timing()
+        metrics.observe_request(request, response, profile)
+        if self.sample_rate and random.random() < self.sample_rate:
+            self.log(request, response, profile)
+        if profile.slow_queries:
+            # Saved and explained on a background thread, the response does not wait
+            slow_queries.submit(profile.slow_queries, metrics.view_label(request))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _current.get().view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook: the view is done, rendering starts
+        profile = _current.get()
+        profile.add('view', time.perf_counter() - profile.view_started)
+        render_started = time.perf_counter()
+
+        def rendered(response):
+            profile.add('render', time.perf_counter() - render_started)
+        response.add_post_render_callback(rendered)
+        return response
+
+    def log(self, request, response, profile):
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'route': match.route if match else None,
+            'path': request.path,
+            'status': response.status_code,
+            'user': getattr(request.user, 'pk', None) if hasattr(request, 'user') else None,
+            **profile.as_dict(),
+        }))
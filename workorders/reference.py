@@ -0,0 +1,99 @@
+# workorders/reference.py
+"""
+Process-local cache of the small lookup tables (statuses, work types, ...).
+
+Rows are loaded once per process and resolved by id or name in memory. Each
+table is reloaded when its shared change version (workorders.versioning)
+moves, which happens whenever a row is saved or deleted in any worker.
+Returned instances are shared between requests and must not be mutated.
+"""
+import threading
+from dataclasses import dataclass, field
+
+from django.http import Http404
+
+from accounts.models import Department
+from . import metrics, versioning
+from .models import Closed, Machine_Type, Part_Type, Pending, Type_of_Work, Work_Status
+
+# Model -> column holding the human readable name
+REFERENCE_MODELS = {
+    Work_Status: 'work_status',
+    Closed: 'closed',
+    Pending: 'pending',
+    Type_of_Work: 'type_of_work',
+    Machine_Type: 'machine_type',
+    Part_Type: 'part_type',
+    Department: 'department',
+}
+
+
+@dataclass
+class _Table:
+    version: int
+    by_id: dict = field(default_factory=dict)
+    by_name: dict = field(default_factory=dict)
+
+
+class ReferenceRegistry:
+    def __init__(self, models=REFERENCE_MODELS):
+        self.models = dict(models)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def _table(self, model):
+        if model not in self.models:
+            raise KeyError(f"{model.__name__} is not reference data")
+
+        version = versioning.get_version(model)
+        table = self._tables.get(model)
+        if table is not None and table.version == version:
+            metrics.cache_lookup('reference_data', True)
+            return table
+        metrics.cache_lookup('reference_data', False)
+
+        with self._lock:
+            table = self._tables.get(model)
+            if table is None or table.version != version:
+                table = _Table(version)
+                name_field = self.models[model]
+                for row in model.objects.order_by('pk'):
+                    table.by_id[row.pk] = row
+                    table.by_name.setdefault(getattr(row, name_field), row)
+                self._tables[model] = table
+        return table
+
+    def all(self, model):
+        return list(self._table(model).by_id.values())
+
+    def get(self, model, pk):
+        """Row by primary key, None when missing or not a valid id"""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        return self._table(model).by_id.get(pk)
+
+    def get_by_name(self, model, name):
+        """Row by name, None when missing"""
+        return self._table(model).by_name.get(name)
+
+    def lookup(self, model, name):
+        """Like model.objects.get(<name field>=name)"""
+        row = self.get_by_name(model, name)
+        if row is None:
+            raise model.DoesNotExist(f"{model.__name__} matching '{name}' does not exist.")
+        return row
+
+    def get_object_or_404(self, model, name):
+        row = self.get_by_name(model, name)
+        if row is None:
+            raise Http404(f"No {model._meta.object_name} matches the given query.")
+        return row
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+reference_data = ReferenceRegistry()
@@ -0,0 +1,74 @@
+# workorders/renderers.py
+import csv
+import json
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+def buffered(lines, size=64 * 1024):
+    """Join small lines into ~size chunks: per-line chunks cost more in the WSGI handler than the rows do"""
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+class _EchoBuffer:
+    """csv.writer target that hands each formatted line straight back"""
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Flat rows -> text/csv. stream() is what the export uses; render() only
+    covers the small bodies (errors) DRF renders through the same format.
+
+    stream() takes `columns` as {header: row key}, so rows can come straight
+    from values() with related lookups like 'equipment__machine'.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def stream(self, columns, rows):
+        writer = csv.writer(_EchoBuffer())
+        keys = list(columns.values())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([
+                value.isoformat() if isinstance(value, date) else value
+                for value in (row[key] for key in keys)
+            ])
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return ''
+        rows = data if isinstance(data, list) else [data]
+        rows = [row if isinstance(row, dict) else {'detail': row} for row in rows]
+        return ''.join(self.stream({key: key for key in rows[0]} if rows else {}, rows))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline delimited JSON: one object per line, so clients can parse while downloading"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def stream(self, columns, rows):
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode({header: row[key] for header, key in columns.items()}) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return ''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for row in rows)
@@ -0,0 +1,169 @@
+# workorders/rollups.py
+"""
+Incremental maintenance of the WorkOrderDailyStat rollup.
+
+Every workorder contributes one count and its repair time to the row keyed by
+(local initiation day, department, location, machine type, work status).
+Saving a workorder moves that contribution from its old key to its new one;
+Equipment moved to another location or machine type moves the contributions
+of all its workorders along. rebuild_daily_stats() recomputes the whole
+table from the raw workorders; a location handed to another department is
+only picked up by a rebuild.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Equipment, WorkOrderDailyStat, workorders
+
+# Workorder columns a rollup contribution depends on
+TRACKED_FIELDS = ('initiation_date', 'completion_date', 'equipment_id', 'work_status_id')
+
+
+def snapshot(instance):
+    """Tracked column values of a workorder instance"""
+    return {
+        field: workorders._meta.get_field(field.removesuffix('_id')).to_python(getattr(instance, field))
+        for field in TRACKED_FIELDS
+    }
+
+
+def load_snapshot(pk):
+    """Tracked column values as currently stored in the database"""
+    return workorders.objects.filter(pk=pk).values(*TRACKED_FIELDS).first()
+
+
+def equipment_dimensions(equipment_ids):
+    """{equipment id: its department, location and machine type ids}"""
+    return {
+        item['id']: item for item in Equipment.objects.filter(id__in=equipment_ids).values(
+            'id', 'machine_type_id', 'location_id', department_id=F('location__department_id')
+        )
+    }
+
+
+def record_changes(before=(), after=()):
+    """
+    Move rollup contributions from the `before` snapshots to the `after` ones.
+
+    Snapshots are dicts holding TRACKED_FIELDS; pass only `after` for new
+    workorders and only `before` for deleted ones. Deltas are merged per key
+    and written in one statement however many rollup rows a batch touches.
+    """
+    rows = [(row, -1) for row in before if row] + [(row, 1) for row in after if row]
+    if not rows:
+        return
+
+    dimensions = equipment_dimensions({row['equipment_id'] for row, _ in rows})
+
+    deltas = defaultdict(lambda: [0, 0.0])
+    for row, sign in rows:
+        equipment = dimensions.get(row['equipment_id'])
+        if equipment is None:
+            continue
+        key = (
+            timezone.localdate(row['initiation_date']),
+            equipment['department_id'],
+            equipment['location_id'],
+            equipment['machine_type_id'],
+            row['work_status_id'],
+        )
+        deltas[key][0] += sign
+        deltas[key][1] += sign * repair_seconds(row)
+
+    apply_deltas({key: delta for key, delta in deltas.items() if delta[0] or delta[1]})
+
+
+def move_equipment(equipment_id, before, after):
+    """
+    Move the contributions of every workorder of an equipment from its `before`
+    dimensions to its `after` ones (equipment_dimensions() entries), one
+    grouped read of its workorders and one upsert.
+    """
+    dimensions = ('department_id', 'location_id', 'machine_type_id')
+    if [before[name] for name in dimensions] == [after[name] for name in dimensions]:
+        return
+    grouped = (
+        workorders.objects.filter(equipment_id=equipment_id)
+        .annotate(day=TruncDate('initiation_date'))
+        .values('day', 'work_status_id')
+        .annotate(total=Count('id'), repair_time=Sum(F('completion_date') - F('initiation_date')))
+        .order_by()
+    )
+    deltas = defaultdict(lambda: [0, 0.0])
+    for row in grouped:
+        seconds = row['repair_time'].total_seconds() if row['repair_time'] else 0.0
+        for equipment, sign in ((before, -1), (after, 1)):
+            key = (row['day'], *(equipment[name] for name in dimensions), row['work_status_id'])
+            deltas[key][0] += sign * row['total']
+            deltas[key][1] += sign * seconds
+    apply_deltas(deltas)
+
+
+def repair_seconds(row):
+    if row['completion_date'] is None or row['initiation_date'] is None:
+        return 0.0
+    return (row['completion_date'] - row['initiation_date']).total_seconds()
+
+
+def apply_deltas(deltas):
+    """
+    Add {(day, department, location, machine type, status): [count, seconds]}
+    to the rollup in one upsert, creating missing rows. The unique key
+    treats a NULL status as a value, so ON CONFLICT covers those rows too.
+    """
+    if not deltas:
+        return
+    table = WorkOrderDailyStat._meta.db_table
+    columns = list(zip(*(key + tuple(delta) for key, delta in deltas.items())))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (day, department_id, location_id, machine_type_id, work_status_id, count, repair_seconds)
+            SELECT * FROM unnest(%s::date[], %s::bigint[], %s::bigint[], %s::bigint[], %s::bigint[], %s::int[], %s::float8[])
+            ON CONFLICT (day, department_id, location_id, machine_type_id, work_status_id) DO UPDATE SET
+                count = {table}.count + EXCLUDED.count,
+                repair_seconds = {table}.repair_seconds + EXCLUDED.repair_seconds
+            """,
+            [list(column) for column in columns],
+        )
+
+
+@transaction.atomic
+def rebuild_daily_stats(batch_size=1000):
+    """Recompute the whole rollup from the workorders table, returns the row count"""
+    WorkOrderDailyStat.objects.all().delete()
+
+    grouped = (
+        workorders.objects
+        .annotate(day=TruncDate('initiation_date'))
+        .values(
+            'day', 'work_status_id',
+            'equipment__location__department_id',
+            'equipment__location_id',
+            'equipment__machine_type_id',
+        )
+        .annotate(
+            total=Count('id'),
+            repair_time=Sum(F('completion_date') - F('initiation_date')),
+        )
+        .order_by()
+    )
+
+    stats = [
+        WorkOrderDailyStat(
+            day=row['day'],
+            department_id=row['equipment__location__department_id'],
+            location_id=row['equipment__location_id'],
+            machine_type_id=row['equipment__machine_type_id'],
+            work_status_id=row['work_status_id'],
+            count=row['total'],
+            repair_seconds=row['repair_time'].total_seconds() if row['repair_time'] else 0.0,
+        )
+        for row in grouped.iterator(chunk_size=batch_size)
+    ]
+    WorkOrderDailyStat.objects.bulk_create(stats, batch_size=batch_size)
+    return len(stats)
@@ -5,6 +5,8 @@ from .models import (
 )
 from django.contrib.auth.models import User
 from django.utils import timezone
+from . import history
+from .reference import reference_data
 
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -84,7 +86,7 @@ class WorkOrderSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = workorders
-        fields = '__all__'
+        exclude = ['search_vector', 'equipment_name']
         read_only_fields = ['initiation_date', 'timestamp']
         extra_kwargs = {
             'target_date': {'required': False},
@@ -93,6 +95,12 @@ class WorkOrderSerializer(serializers.ModelSerializer):
         }
 
 
+class WorkOrderSearchSerializer(WorkOrderSerializer):
+    """Search hit: the work order plus its rank and a snippet with <mark> around matched terms"""
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+
 class WorkOrderCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = workorders
@@ -113,13 +121,57 @@ class WorkOrderCreateSerializer(serializers.ModelSerializer):
         validated_data.update({
             'initiation_date': timezone.now(),
             'initiated_by': user,
-            'work_status': Work_Status.objects.get(work_status='Pending')
+            'work_status': reference_data.lookup(Work_Status, 'Pending')
         })
         
         workorder = super().create(validated_data)
         
         return workorder
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves ids from context['preloaded'][model] (an in_bulk dict) instead of one query per value"""
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(self.get_queryset().model)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in preloaded:
+            self.fail('does_not_exist', pk_value=data)
+        return preloaded[pk]
+
+
+class WorkOrderBulkRowSerializer(WorkOrderCreateSerializer):
+    """One row of a bulk create; the view builds and inserts the instances itself"""
+    equipment = PreloadedPrimaryKeyRelatedField(queryset=Equipment.objects.all())
+    type_of_work = PreloadedPrimaryKeyRelatedField(queryset=Type_of_Work.objects.all())
+    part = PreloadedPrimaryKeyRelatedField(queryset=Part.objects.all(), required=False, allow_null=True)
+
+
+class BulkTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
+
+class BulkAcceptSerializer(BulkTransitionSerializer):
+    assigned_to = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    target_date = serializers.DateTimeField(required=False, allow_null=True)
+    remarks = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class BulkCloseSerializer(BulkTransitionSerializer):
+    closed = serializers.BooleanField()
+    closing_remarks = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class HistoryAsOfSerializer(serializers.Serializer):
+    t = serializers.DateTimeField()
+
+
 class WorkOrderUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = workorders
@@ -132,9 +184,9 @@ class WorkOrderUpdateSerializer(serializers.ModelSerializer):
         if user.profile.is_utilities:
             if 'accepted' in data:
                 if data['accepted'] is False:
-                    data['work_status'] = Work_Status.objects.get(work_status='Rejected')
+                    data['work_status'] = reference_data.lookup(Work_Status, 'Rejected')
                 else:
-                    data['work_status'] = Work_Status.objects.get(work_status='In_Process')
+                    data['work_status'] = reference_data.lookup(Work_Status, 'In_Process')
         
         elif user.profile.is_production and 'closed' in data:
             if instance.work_status.work_status != 'Completed':
@@ -145,17 +197,16 @@ class WorkOrderUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         user = self.context['request'].user
         old_status = instance.work_status
+        before = history.state(instance)
         
         # Perform the update
         instance = super().update(instance, validated_data)
         
         # Create history record if status changed or closed field updated
         if (old_status != instance.work_status) or ('closed' in validated_data):
-            WorkOrderHistory.objects.create(
-                workorder=instance,
-                snapshot=WorkOrderSerializer(instance).data,
-                changed_by=user,
-                action='status_changed' if old_status != instance.work_status else 'closed_updated'
+            history.record(
+                instance, before, user,
+                'status_changed' if old_status != instance.work_status else 'closed_updated'
             )
         
         return instance
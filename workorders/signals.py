@@ -0,0 +1,90 @@
+# workorders/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import rollups, versioning
+from .models import EmbeddedWorkOrder, Equipment, Location, Part, workorders
+from .reference import REFERENCE_MODELS
+
+
+@receiver(pre_save, sender=workorders, dispatch_uid='workorder_equipment_name')
+def copy_equipment_name(sender, instance, raw=False, **kwargs):
+    # search_vector covers the machine name, which lives on another table
+    if not raw and instance.equipment_id is not None:
+        instance.equipment_name = instance.equipment.machine
+
+
+@receiver(post_save, sender=Equipment, dispatch_uid='equipment_name_to_workorders')
+def propagate_equipment_name(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    workorders.objects.filter(equipment=instance).exclude(equipment_name=instance.machine).update(
+        equipment_name=instance.machine
+    )
+
+
+@receiver(pre_save, sender=workorders, dispatch_uid='workorder_rollup_pre_save')
+def remember_rollup_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or instance.pk is None or hasattr(instance, '_rollup_before'):
+        # A caller that still holds the unchanged row sets _rollup_before itself
+        return
+    if update_fields is not None:
+        tracked = {field.removesuffix('_id') for field in rollups.TRACKED_FIELDS}
+        if not tracked.intersection(update_fields):
+            return
+    instance._rollup_before = rollups.load_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=workorders, dispatch_uid='workorder_rollup_post_save')
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = instance.__dict__.pop('_rollup_before', None)
+    after = rollups.snapshot(instance)
+    if created:
+        rollups.record_changes(after=[after])
+    elif before is not None and before != after:
+        rollups.record_changes(before=[before], after=[after])
+
+
+@receiver(pre_save, sender=Equipment, dispatch_uid='equipment_rollup_pre_save')
+def remember_equipment_dimensions(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._rollup_before = rollups.equipment_dimensions([instance.pk]).get(instance.pk)
+
+
+@receiver(post_save, sender=Equipment, dispatch_uid='equipment_rollup_post_save')
+def move_equipment_rollup(sender, instance, created, raw=False, **kwargs):
+    before = instance.__dict__.pop('_rollup_before', None)
+    if raw or created or before is None:
+        return
+    if (before['location_id'], before['machine_type_id']) == (instance.location_id, instance.machine_type_id):
+        return
+    after = rollups.equipment_dimensions([instance.pk]).get(instance.pk)
+    if after is not None:
+        rollups.move_equipment(instance.pk, before, after)
+
+
+@receiver(post_delete, sender=workorders, dispatch_uid='workorder_rollup_post_delete')
+def update_rollup_on_delete(sender, instance, **kwargs):
+    rollups.record_changes(before=[rollups.snapshot(instance)])
+
+
+@receiver(post_delete, sender=workorders, dispatch_uid='workorder_embedding_post_delete')
+def mark_embedding_deleted(sender, instance, **kwargs):
+    # Tells sync_vector_store the vector can go; an archived order is missing too but keeps it
+    EmbeddedWorkOrder.objects.filter(workorder_id=instance.pk, deleted_at__isnull=True).update(deleted_at=timezone.now())
+
+
+def bump_table_version(sender, using=None, **kwargs):
+    versioning.bump_on_commit(sender, using=using)
+
+
+# Tables whose change version drives reference caching, catalog ETags and AI answer caching
+VERSIONED_MODELS = [*REFERENCE_MODELS, Location, Equipment, Part, workorders]
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_table_version, sender=model, dispatch_uid=f'version_save_{model._meta.label_lower}')
+    post_delete.connect(bump_table_version, sender=model, dispatch_uid=f'version_delete_{model._meta.label_lower}')
@@ -0,0 +1,133 @@
+# workorders/slow_queries.py
+"""
+Slow query capture, off unless SLOW_QUERY_THRESHOLD_MS is set.
+
+ProfilingMiddleware's execute wrapper notes each query of a request that
+runs over the threshold and hands them to submit(). A single background
+thread saves them as SlowQuery rows (browsable in the admin) with the
+normalized SQL and the URL name of the view that ran them, so repeats of one
+query group under one fingerprint. The response never waits for it; when
+SLOW_QUERY_MAX_PENDING requests are already queued, new captures are dropped.
+
+A sample of them (SLOW_QUERY_EXPLAIN_SAMPLE_RATE) also gets a plan, on the
+thread's own connection. EXPLAIN ANALYZE runs the statement again, so only
+SELECTs get (ANALYZE, BUFFERS); writes get a plain EXPLAIN and anything else
+no plan.
+"""
+import atexit
+import hashlib
+import logging
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = {'SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'}
+
+
+def threshold():
+    """Capture threshold in seconds, None when capture is off"""
+    threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 0)
+    return threshold_ms / 1000 if threshold_ms else None
+
+
+def normalize(sql):
+    """SQL with literals and parameters replaced by ?, so runs with different values compare equal"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'(?<![\w."])-?\d+(?:\.\d+)?\b', '?', sql)
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(...)', sql)
+    return ' '.join(sql.split())
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode('utf-8')).hexdigest()
+
+
+def explain(alias, sql, params):
+    """Plan of a captured statement, '' when it cannot be explained"""
+    statement = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if statement not in EXPLAINABLE:
+        return ''
+    options = '(ANALYZE, BUFFERS) ' if statement == 'SELECT' else ''
+    try:
+        # In a savepoint, so a failing EXPLAIN cannot break an enclosing transaction
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute(f'EXPLAIN {options}{sql}', params)
+            return '\n'.join(line for line, in cursor.fetchall())
+    except DatabaseError as e:
+        logger.warning("EXPLAIN of a slow query failed: %s", e)
+        return ''
+
+
+def record(queries, view):
+    """
+    Save `queries`, (alias, sql, params, many, seconds) tuples noted by a
+    RequestProfile, as SlowQuery rows.
+    """
+    sample_rate = getattr(settings, 'SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1)
+    rows = []
+    for alias, sql, params, many, seconds in queries:
+        normalized = normalize(sql)
+        plan = ''
+        if not many and sample_rate and random.random() < sample_rate:
+            plan = explain(alias, sql, params)
+        rows.append(SlowQuery(
+            view=view[:200],
+            fingerprint=fingerprint(normalized),
+            sql=normalized,
+            duration_ms=seconds * 1000,
+            plan=plan,
+            seq_scan='Seq Scan' in plan,
+        ))
+    SlowQuery.objects.bulk_create(rows)
+    return rows
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(getattr(settings, 'SLOW_QUERY_MAX_PENDING', 100))
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-queries')
+                atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+def submit(queries, view):
+    """Queue `queries` for record() in the background, False when the queue is full"""
+    executor = get_executor()
+    if not _slots.acquire(blocking=False):
+        logger.warning("Slow query queue full, dropped %d queries of %s", len(queries), view)
+        return False
+    executor.submit(_record_in_background, queries, view)
+    return True
+
+
+def _record_in_background(queries, view):
+    try:
+        record(queries, view)
+    except Exception:
+        logger.exception("Saving slow queries failed")
+    finally:
+        # Connections are per thread: don't keep this one open between requests
+        connections.close_all()
+        _slots.release()
+
+
+def flush():
+    """Wait until every queued capture is saved"""
+    get_executor().submit(lambda: None).result()
@@ -1,3 +1,1597 @@
-from django.test import TestCase
+import asyncio
+import csv
+import inspect
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from contextlib import suppress
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from langchain_core.documents import Document
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.contrib.auth.models import User
+from django.db import connection, reset_queries, transaction
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from accounts.models import Department, Profile
+from .models import (
+    Closed, EmbeddedWorkOrder, Equipment, Location, Machine_Type, Part, Part_Type, Pending, SlowQuery, Type_of_Work, UserPrompt,
+    WorkOrderDailyStat, WorkOrderHistory, Work_Status, workorders,
+)
+from . import history, metrics, partitions, profiling, slow_queries, versioning
+from .reference import ReferenceRegistry, reference_data
+from .rollups import rebuild_daily_stats
+from .utils.ai_utils import document_id, generate_workorder_documents, sync_vector_store
+from .utils.embeddings import EmbeddingPipeline, HashingEmbeddings
+from .utils.llm import StubBackend, get_executor, get_llm, reset_llm
+from .views import AIAgentView, EquipmentFaultAnalysisView
+
+
+class CatalogConditionalGetTests(APITestCase):
+    url = '/backend/api/equipment/'
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.user = User.objects.create_user('catalog', password='x')
+        self.client.force_authenticate(self.user)
+        department = Department.objects.create(department='Electrical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Motor')
+        self.equipment = Equipment.objects.create(machine='M1', machine_type=machine_type, location=location)
+
+    def test_unchanged_catalog_returns_304_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_to_nested_table_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location = self.equipment.location
+            location.area = 'Hall B'
+            location.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['location']['area'], 'Hall B')
+
+    def test_write_through_the_api_returns_fresh_data(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/backend/api/machine-types/{self.equipment.machine_type_id}/', {'machine_type': 'Pump'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['machine_type']['machine_type'], 'Pump')
+
+    def test_write_in_another_process_invalidates_etag(self):
+        bump = (
+            "import django; django.setup(); "
+            "from workorders import versioning; from workorders.models import Machine_Type; "
+            "versioning.bump(Machine_Type)"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+            with override_settings(CACHES=shared):
+                etag = self.client.get(self.url)['ETag']
+                subprocess.run(
+                    [sys.executable, '-c', bump], cwd=settings.BASE_DIR, check=True,
+                    env={
+                        **{name: value for name, value in os.environ.items() if name != 'REDIS_URL'},
+                        'DJANGO_SETTINGS_MODULE': 'proj.settings', 'CACHE_LOCATION': directory,
+                    },
+                )
+                response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_varies_with_query_string(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, {'search': 'M1'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ReferenceDataTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.status = Work_Status.objects.get_or_create(work_status='Pending')[0]
+
+    def test_resolves_rows_by_id_and_name(self):
+        self.assertEqual(reference_data.lookup(Work_Status, 'Pending'), self.status)
+        self.assertEqual(reference_data.get_by_name(Work_Status, 'Pending'), self.status)
+        self.assertEqual(reference_data.get(Work_Status, str(self.status.pk)), self.status)
+        self.assertIsNone(reference_data.get_by_name(Work_Status, 'Missing'))
+        self.assertIsNone(reference_data.get(Work_Status, 'not-an-id'))
+        with self.assertRaises(Work_Status.DoesNotExist):
+            reference_data.lookup(Work_Status, 'Missing')
+        with self.assertRaises(KeyError):
+            reference_data.get(Equipment, 1)
+
+    def test_loads_each_table_once(self):
+        reference_data.lookup(Work_Status, 'Pending')
+        with self.assertNumQueries(0):
+            reference_data.lookup(Work_Status, 'Pending')
+            reference_data.get(Work_Status, self.status.pk)
+
+    def test_save_in_another_worker_reloads_on_next_lookup(self):
+        # Another process's registry, reading the same shared change versions
+        other_worker = ReferenceRegistry()
+        self.assertEqual(other_worker.lookup(Work_Status, 'Pending'), self.status)
+        version = versioning.get_version(Work_Status)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status.work_status = 'Waiting'
+            self.status.save()
+            Work_Status.objects.create(work_status='On_Hold', pk=200)
+
+        self.assertNotEqual(versioning.get_version(Work_Status), version)
+        with self.assertNumQueries(1):
+            self.assertEqual(other_worker.lookup(Work_Status, 'Waiting').pk, self.status.pk)
+        self.assertIsNone(other_worker.get_by_name(Work_Status, 'Pending'))
+        self.assertEqual(other_worker.get(Work_Status, 200).work_status, 'On_Hold')
+
+    def test_equipment_save_bumps_its_version(self):
+        department = Department.objects.create(department='Electrical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Motor')
+        version = versioning.get_version(Equipment)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(machine='M1', machine_type=machine_type, location=location)
+
+        self.assertGreater(versioning.get_version(Equipment), version)
+
+
+class WorkOrderSearchTests(APITestCase):
+    url = '/backend/api/workorders/search/'
+
+    def setUp(self):
+        department = Department.objects.create(department='Mechanical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Pump')
+        equipment = Equipment.objects.create(machine='Boiler feed pump', machine_type=machine_type, location=location)
+        type_of_work = Type_of_Work.objects.create(type_of_work='Repair')
+
+        self.manager = User.objects.create_user('manager', password='x')
+        self.operator = User.objects.create_user('operator', password='x')
+        # bulk_create skips Profile.save, which resizes the profile image
+        Profile.objects.bulk_create([
+            Profile(user=self.manager, department=department, is_manager=True),
+            Profile(user=self.operator, department=department, is_production=True),
+        ])
+        for i in range(7):
+            workorders.objects.create(
+                problem=f'Seal leaking on unit {i}', remarks='replaced gasket' if i % 2 else None,
+                initiated_by=self.operator if i < 2 else self.manager,
+                equipment=equipment, type_of_work=type_of_work, department='Mechanical',
+            )
+        workorders.objects.create(
+            problem='Motor overheating', initiated_by=self.manager,
+            equipment=equipment, type_of_work=type_of_work, department='Mechanical',
+        )
+
+    def test_ranked_cursor_pages_cover_every_match_once(self):
+        self.client.force_authenticate(self.manager)
+        seen, url, params = [], self.url, {'q': 'leaking', 'page_size': 3}
+        while url:
+            data = self.client.get(url, params).json()
+            seen += [hit['id'] for hit in data['results']]
+            url, params = data['next'], None
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        # Web search syntax ANDs the terms; gasket only appears in remarks
+        hits = self.client.get(self.url, {'q': 'leaking gasket'}).json()['results']
+        self.assertEqual(len(hits), 3)
+        self.assertIn('<mark>gasket</mark>', hits[0]['snippet'])
+
+    def test_equipment_name_is_searchable_and_scoped_by_role(self):
+        self.client.force_authenticate(self.operator)
+        data = self.client.get(self.url, {'q': 'boiler'}).json()
+        self.assertEqual(len(data['results']), 2)
+
+    def test_query_is_required(self):
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class WorkOrderCursorPaginationTests(APITestCase):
+    url = '/backend/api/workorders/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _ = seed_plant(orders=12)
+        # Five orders opened at the same moment: only the id orders them
+        cls.tied = sorted(workorders.objects.order_by('id').values_list('id', flat=True)[3:8])
+        workorders.objects.filter(id__in=cls.tied).update(initiation_date=timezone.now() - timedelta(days=2))
+        cls.expected = list(workorders.objects.order_by('-initiation_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client.force_authenticate(self.users['manager'])
+
+    def pages(self, **params):
+        pages, url, params = [], self.url, {'pagination': 'cursor', 'page_size': 4, **params}
+        while url:
+            data = self.client.get(url, params).json()
+            pages.append(data)
+            url, params = data['next'], None
+        return pages
+
+    def test_pages_cover_every_order_once_newest_first(self):
+        pages = self.pages()
+
+        seen = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([row for row in seen if row in self.tied], sorted(self.tied, reverse=True))
+        self.assertEqual(len(pages), 3)
+
+    def test_previous_link_returns_the_page_before(self):
+        first, second, third = self.pages()
+
+        self.assertIsNone(first['previous'])
+        back = self.client.get(third['previous']).json()
+        self.assertEqual([row['id'] for row in back['results']], [row['id'] for row in second['results']])
+        back = self.client.get(back['previous']).json()
+        self.assertEqual([row['id'] for row in back['results']], [row['id'] for row in first['results']])
+        self.assertIsNone(back['previous'])
+        self.assertIsNotNone(back['next'])
+
+    def test_counts_only_on_request(self):
+        self.assertNotIn('count', self.pages()[0])
+        self.assertEqual(self.pages(include_count='true')[1]['count'], 12)
+
+    def test_tampered_cursor_is_not_found(self):
+        next_link = self.pages()[0]['next']
+        cursor = next_link.split('cursor=')[1].split('&')[0]
+
+        for tampered in ('not-a-cursor', cursor[:-3], 'eyJkIjoieCIsImkiOjF9'):  # the last one is {"d":"x","i":1}
+            response = self.client.get(self.url, {'pagination': 'cursor', 'cursor': tampered})
+            self.assertEqual(response.status_code, 404, tampered)
+
+
+class WorkOrderExportTests(APITestCase):
+    url = '/backend/api/workorders/export/'
+
+    def setUp(self):
+        department = Department.objects.create(department='Mechanical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Pump')
+        equipment = Equipment.objects.create(machine='Boiler feed pump', machine_type=machine_type, location=location)
+        type_of_work = Type_of_Work.objects.create(type_of_work='Repair')
+
+        self.operator = User.objects.create_user('operator', password='x')
+        other = User.objects.create_user('other', password='x')
+        Profile.objects.bulk_create([Profile(user=self.operator, department=department, is_production=True)])
+        for i in range(5):
+            workorders.objects.create(
+                problem=f'Seal, "leaking"\non unit {i}', initiated_by=self.operator if i < 3 else other,
+                equipment=equipment, type_of_work=type_of_work, department='Mechanical',
+            )
+        self.client.force_authenticate(self.operator)
+
+    def test_csv_export_is_scoped_and_round_trips(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment;', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['problem'], 'Seal, "leaking"\non unit 2')
+        self.assertEqual({row['equipment'] for row in rows}, {'Boiler feed pump'})
+        self.assertEqual({row['initiated_by'] for row in rows}, {'operator'})
+
+    def test_ndjson_export(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['location'] for line in lines], ['Hall A'] * 3)
+
+
+class WorkOrderHistoryTests(APITestCase):
+    def setUp(self):
+        department = Department.objects.create(department='Mechanical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Pump')
+        equipment = Equipment.objects.create(machine='P1', machine_type=machine_type, location=location)
+        type_of_work = Type_of_Work.objects.create(type_of_work='Repair')
+
+        self.manager = User.objects.create_user('manager', password='x')
+        Profile.objects.bulk_create([Profile(user=self.manager, department=department, is_manager=True)])
+        self.client.force_authenticate(self.manager)
+        self.workorder = workorders.objects.create(
+            problem='Pump vibrating', initiated_by=self.manager, equipment=equipment,
+            type_of_work=type_of_work, department='Mechanical',
+        )
+        history.record(self.workorder, None, self.manager, 'created')
+
+    @mock.patch.object(history, 'CHECKPOINT_INTERVAL', 3)
+    def test_deltas_between_checkpoints_rebuild_every_version(self):
+        url = f'/backend/api/workorders/{self.workorder.id}/'
+        moments = [timezone.now()]
+        for step in range(5):
+            self.assertEqual(self.client.patch(url, {'remarks': f'step {step}'}, format='json').status_code, 200)
+            moments.append(timezone.now())
+
+        rows = list(self.workorder.history.order_by('version'))
+        self.assertEqual([row.version for row in rows], [0, 1, 2, 3, 4, 5])
+        self.assertEqual([row.is_checkpoint for row in rows], [True, False, False, True, False, False])
+        self.assertEqual(rows[1].snapshot, {'remarks': 'step 0'})
+        self.assertEqual(rows[3].snapshot['problem'], 'Pump vibrating')
+
+        for version, moment in enumerate(moments):
+            data = self.client.get(f'{url}history/as-of/', {'t': moment.isoformat()}).json()
+            self.assertEqual(data['version'], version)
+            self.assertEqual(data['workorder']['remarks'], f'step {version - 1}' if version else None)
+            self.assertEqual(data['workorder']['equipment']['machine'], 'P1')
+
+    def test_history_is_scoped_like_the_work_order(self):
+        outsider = User.objects.create_user('outsider', password='x')
+        Profile.objects.bulk_create([Profile(user=outsider, department=self.manager.profile.department, is_production=True)])
+        self.client.force_authenticate(outsider)
+        url = f'/backend/api/workorders/{self.workorder.id}/history/'
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(f'{url}as-of/', {'t': timezone.now().isoformat()}).status_code, 404)
+
+    def test_patch_runs_a_fixed_number_of_queries(self):
+        part_type = Part_Type.objects.create(part_type='Bearing')
+        self.workorder.part = Part.objects.create(name='6204', part_type=part_type, equipment=self.workorder.equipment)
+        self.workorder.save()
+        url = f'/backend/api/workorders/{self.workorder.id}/'
+
+        # The row with every relation the response needs, rollup pre-save
+        # state, UPDATE, history version, history INSERT
+        with self.assertNumQueries(5):
+            response = self.client.patch(url, {'remarks': 'bearing replaced'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['part']['part_type']['part_type'], 'Bearing')
+        self.assertEqual(self.workorder.history.get(version=1).snapshot, {'remarks': 'bearing replaced'})
+
+    def test_as_of_before_creation_is_404(self):
+        response = self.client.get(
+            f'/backend/api/workorders/{self.workorder.id}/history/as-of/', {'t': '2000-01-01T00:00:00Z'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class WorkOrderBulkCreateTests(APITestCase):
+    url = '/backend/api/workorders/bulk/'
+
+    def setUp(self):
+        # Version bumps wait for a commit that never comes inside a test case
+        from django.core.cache import cache
+        cache.clear()
+        reference_data.clear()
+
+        department = Department.objects.create(department='Electrical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Motor')
+        self.equipment = Equipment.objects.create(machine='M1', machine_type=machine_type, location=location)
+        self.type_of_work = Type_of_Work.objects.create(type_of_work='Repair')
+        Work_Status.objects.get_or_create(work_status='Pending')
+
+        self.user = User.objects.create_user('shift-lead', password='x')
+        Profile.objects.bulk_create([Profile(user=self.user, department=department, is_production=True)])
+        self.client.force_authenticate(self.user)
+
+    def row(self, **overrides):
+        return {
+            'problem': 'Motor tripping', 'equipment': self.equipment.id,
+            'type_of_work': self.type_of_work.id, 'department': 'Electrical', **overrides,
+        }
+
+    def test_valid_rows_are_created_and_invalid_rows_reported(self):
+        rows = [self.row(), self.row(equipment=999999), self.row(problem='Fan noise')]
+        response = self.client.post(self.url, rows, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['index'] for item in response.data['created']], [0, 2])
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertIn('equipment', response.data['errors'][0]['errors'])
+
+        created = workorders.objects.filter(id__in=[item['id'] for item in response.data['created']])
+        self.assertEqual({wo.equipment_name for wo in created}, {'M1'})
+        self.assertEqual(WorkOrderHistory.objects.filter(workorder__in=created, action='created').count(), 2)
+        self.assertEqual(sum(WorkOrderDailyStat.objects.values_list('count', flat=True)), 2)
+
+    def test_csv_batch(self):
+        body = (
+            'problem,equipment,type_of_work,part,department\n'
+            f'Cable damaged,{self.equipment.id},{self.type_of_work.id},,Electrical\n'
+        )
+        response = self.client.post(self.url, body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['created']), 1)
+
+
+class WorkOrderBulkTransitionTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        reference_data.clear()
+
+        department = Department.objects.create(department='Electrical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Motor')
+        equipment = Equipment.objects.create(machine='M1', machine_type=machine_type, location=location)
+        type_of_work = Type_of_Work.objects.create(type_of_work='Repair')
+        statuses = {name: Work_Status.objects.get_or_create(work_status=name)[0] for name in ('Pending', 'In_Process')}
+
+        self.lead = User.objects.create_user('lead', password='x')
+        Profile.objects.bulk_create([Profile(user=self.lead, department=department, is_utilities=True)])
+        self.client.force_authenticate(self.lead)
+        self.orders = [
+            workorders.objects.create(
+                problem=f'Breaker {i}', initiated_by=self.lead, equipment=equipment, type_of_work=type_of_work,
+                department='Electrical', work_status=statuses['In_Process' if i == 2 else 'Pending'],
+            )
+            for i in range(3)
+        ]
+
+    def test_bulk_accept_updates_pending_orders_and_skips_the_rest(self):
+        ids = [wo.id for wo in self.orders] + [999999]
+        response = self.client.post('/backend/api/workorders/bulk-accept/', {'ids': ids, 'remarks': 'shift A'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], ids[:2])
+        self.assertEqual(
+            [item['id'] for item in response.data['skipped']], [self.orders[2].id, 999999]
+        )
+        accepted = workorders.objects.filter(id__in=ids[:2])
+        self.assertEqual(set(accepted.values_list('work_status__work_status', 'remarks')), {('In_Process', 'shift A')})
+        self.assertEqual(WorkOrderHistory.objects.filter(action='accepted').count(), 2)
+        self.assertEqual(
+            WorkOrderDailyStat.objects.get(work_status__work_status='In_Process').count, 3
+        )
+
+
+def seed_plant(orders=150):
+    """
+    A small but realistic plant: two maintenance departments, equipment with
+    parts, one user per role and `orders` work orders spread over every
+    status, with history and rollups. Returns the users by role and a few ids
+    the endpoint table refers to.
+    """
+    electrical, mechanical, production = Department.objects.bulk_create(
+        [Department(department=name) for name in ('Electrical', 'Mechanical', 'Production')]
+    )
+    # 0004 inserts Pending as id 2 without advancing the sequence, so the
+    # other statuses get ids clear of it
+    statuses = {
+        name: Work_Status.objects.get_or_create(work_status=name, defaults={'pk': pk})[0]
+        for pk, name in enumerate(('Pending', 'In_Process', 'Completed', 'Rejected'), start=100)
+    }
+    closed_yes = Closed.objects.get_or_create(closed='Yes')[0]
+    Closed.objects.get_or_create(closed='No')
+    Pending.objects.get_or_create(pending='Spare part')
+    repair = Type_of_Work.objects.get_or_create(type_of_work='Repair')[0]
+    machine_types = Machine_Type.objects.bulk_create([Machine_Type(machine_type=name) for name in ('Motor', 'Pump', 'Conveyor')])
+    locations = Location.objects.bulk_create([
+        Location(department=department, area=f'{department.department} hall {i}')
+        for department in (electrical, mechanical) for i in range(2)
+    ])
+    equipment = Equipment.objects.bulk_create([
+        Equipment(machine=f'EQ{i}', machine_type=machine_types[i % 3], location=locations[i % 4]) for i in range(12)
+    ])
+    part_types = Part_Type.objects.bulk_create([Part_Type(part_type='Bearing'), Part_Type(part_type='Seal')])
+    parts = Part.objects.bulk_create([
+        Part(name=f'P{i}', part_type=part_types[i % 2], equipment=equipment[i % 12]) for i in range(24)
+    ])
+
+    users = {role: User.objects.create_user(role, password='pw', first_name=role.title()) for role in ('manager', 'utilities', 'production')}
+    Profile.objects.bulk_create([
+        Profile(user=users['manager'], department=production, is_manager=True),
+        Profile(user=users['utilities'], department=electrical, is_utilities=True),
+        Profile(user=users['production'], department=production, is_production=True),
+    ])
+
+    now = timezone.now()
+    cycle = ['Pending', 'In_Process', 'Completed', 'Completed', 'Rejected']
+    rows = workorders.objects.bulk_create([
+        workorders(
+            problem=f'{("Motor tripping", "Seal leaking", "Belt slipping")[i % 3]} on line {i % 7}',
+            department=('Electrical', 'Mechanical')[i % 2],
+            initiated_by=users['production'],
+            equipment=equipment[i % 12],
+            equipment_name=equipment[i % 12].machine,
+            part=parts[i % 24] if i % 2 else None,
+            type_of_work=repair,
+            work_status=statuses[cycle[i % 5]],
+            closed=closed_yes if i % 10 == 3 else None,
+            initiation_date=now - timedelta(days=i, hours=i % 24),
+            completion_date=now - timedelta(days=i // 2),
+            remarks='checked' if i % 3 == 0 else None,
+        )
+        for i in range(orders)
+    ])
+    history.record_many([(wo.pk, None, history.state(wo)) for wo in rows], users['production'], 'created')
+    UserPrompt.objects.bulk_create([UserPrompt(user=users['production'], prompt=f'prompt {i}') for i in range(5)])
+    rebuild_daily_stats()
+
+    def electrical_ids(status):
+        return [wo.pk for wo in rows if wo.work_status == statuses[status] and wo.department == 'Electrical']
+
+    ids = {
+        'workorder': electrical_ids('Pending')[0],
+        'pending': electrical_ids('Pending'),
+        'in_process': electrical_ids('In_Process'),
+        'completed': [wo.pk for wo in rows if wo.work_status == statuses['Completed'] and wo.closed is None],
+        'equipment': equipment[0].pk,
+        'part': parts[1].pk,
+        'type_of_work': repair.pk,
+        'user': users['production'].pk,
+    }
+    return users, ids
+
+
+async def drain(stream):
+    return [chunk async for chunk in stream]
+
+
+# (name, method, url, body, query budget). Budgets hold for every role and do
+# not depend on how many rows are seeded, see EndpointBudgetTests.
+ENDPOINTS = [
+    # Catalogs
+    ('locations', 'get', '/backend/api/locations/', None, 2),
+    ('machine-types', 'get', '/backend/api/machine-types/', None, 2),
+    ('part-types', 'get', '/backend/api/part-types/', None, 2),
+    ('work-types', 'get', '/backend/api/work-types/', None, 2),
+    ('work-statuses', 'get', '/backend/api/work-statuses/', None, 2),
+    ('pending-statuses', 'get', '/backend/api/pending-statuses/', None, 2),
+    ('closed-statuses', 'get', '/backend/api/closed-statuses/', None, 2),
+    ('equipment', 'get', '/backend/api/equipment/', None, 2),
+    ('equipment-detail', 'get', '/backend/api/equipment/{equipment}/', None, 1),
+    ('parts', 'get', '/backend/api/parts/', None, 2),
+    ('parts-detail', 'get', '/backend/api/parts/{part}/', None, 1),
+    ('user-prompts', 'get', '/backend/api/user-prompts/', None, 2),
+    # Work orders
+    ('workorders', 'get', '/backend/api/workorders/', None, 17),
+    ('workorders-cursor', 'get', '/backend/api/workorders/?pagination=cursor&work_status=Pending', None, 16),
+    ('workorders-detail', 'get', '/backend/api/workorders/{workorder}/', None, 1),
+    ('workorders-search', 'get', '/backend/api/workorders/search/?q=leaking', None, 16),
+    ('workorders-export', 'get', '/backend/api/workorders/export/?format=ndjson', None, 1),
+    ('workorders-history', 'get', '/backend/api/workorders/{workorder}/history/', None, 4),
+    ('workorders-history-as-of', 'get', '/backend/api/workorders/{workorder}/history/as-of/?t=2100-01-01T00:00:00Z', None, 9),
+    ('workorders-check-access', 'get', '/backend/api/workorders/{workorder}/check-access/', None, 2),
+    ('workorders-create', 'post', '/backend/api/workorders/', {'department': 'Electrical', 'problem': 'Fan noisy', 'equipment': '{equipment}', 'type_of_work': '{type_of_work}'}, 10),
+    ('workorders-patch', 'patch', '/backend/api/workorders/{workorder}/', {'remarks': 'rechecked'}, 5),
+    ('workorders-accept', 'post', '/backend/api/workorders/{workorder}/accept/', {'assigned_to': 'Shift A'}, 7),
+    ('workorders-reject', 'post', '/backend/api/workorders/{workorder}/reject/', {}, 5),
+    ('workorders-complete', 'post', '/backend/api/workorders/{in_process[0]}/complete/', {}, 7),
+    ('workorders-close', 'post', '/backend/api/workorders/{completed[0]}/close/', {'closed': True}, 5),
+    ('workorders-bulk', 'post', '/backend/api/workorders/bulk/', [{'department': 'Electrical', 'problem': f'Lamp {i} out', 'equipment': '{equipment}', 'type_of_work': '{type_of_work}'} for i in range(10)], 8),
+    ('workorders-bulk-accept', 'post', '/backend/api/workorders/bulk-accept/', {'ids': '{pending}'}, 8),
+    ('workorders-bulk-complete', 'post', '/backend/api/workorders/bulk-complete/', {'ids': '{in_process}'}, 8),
+    ('workorders-bulk-close', 'post', '/backend/api/workorders/bulk-close/', {'ids': '{completed}', 'closed': True}, 6),
+    # Analytics
+    ('analytics', 'get', '/backend/api/analytics/', None, 17),
+    ('analytics-equipment-faults', 'get', '/backend/api/analytics/equipment-faults/', None, 2),
+    ('analytics-status-trend', 'get', '/backend/api/analytics/status-trend/', None, 1),
+    ('analytics-equipment-types', 'get', '/backend/api/analytics/equipment-types/', None, 1),
+    ('analytics-locations', 'get', '/backend/api/analytics/locations/', None, 1),
+    ('ai-agent', 'post', '/backend/ai-agent/', {'prompt': 'Why do motors trip?', 'filters': {}}, 4),
+    ('ai-agent-stream', 'post', '/backend/ai-agent/stream/', {'prompt': 'Why do seals leak?', 'filters': {}}, 4),
+    # Accounts
+    ('departments', 'get', '/backend/api/departments/', None, 2),
+    ('users', 'get', '/backend/api/users/', None, 2),
+    ('users-detail', 'get', '/backend/api/users/{user}/', None, 1),
+    ('profiles', 'get', '/backend/api/profiles/', None, 2),
+    # Only the validation path: a new user needs a Profile with a department, which register cannot create yet
+    ('register', 'post', '/backend/api/register/', {'username': 'manager', 'password': 'S3cure-pass!'}, 1),
+    ('csrf-token', 'get', '/backend/get-csrf-token/', None, 0),
+]
+
+
+@override_settings(AI_ANSWER_CACHE_TTL=0)
+class EndpointBudgetTests(APITestCase):
+    """
+    Every API route as every role against seed_plant(). Each call has to stay
+    within its query budget, measured warm (reference caches filled). The
+    budgets do not grow with the row count, so an N+1 in a serializer or an
+    analytics view fails here. Writes are rolled back after each call.
+
+    p50/p95 latency over ENDPOINT_REPEAT calls (default 3) is recorded too.
+    ENDPOINT_REPORT=report.json writes everything out for diffing between
+    commits:
+
+        ENDPOINT_REPORT=before.json ENDPOINT_REPEAT=25 python manage.py test workorders.tests.EndpointBudgetTests
+    """
+    roles = ('manager', 'utilities', 'production')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.ids = seed_plant()
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        reference_data.clear()
+        self.repeat = max(int(os.environ.get('ENDPOINT_REPEAT', '3')), 1)
+
+    def render(self, value):
+        # '{pending}' alone is replaced by the seeded value itself (an id list here), otherwise formatted in
+        if isinstance(value, str):
+            key = value[1:-1]
+            return self.ids[key] if value == f'{{{key}}}' and key in self.ids else value.format(**self.ids)
+        if isinstance(value, list):
+            return [self.render(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.render(item) for key, item in value.items()}
+        return value
+
+    def call(self, method, url, body):
+        # The query log is a bounded deque, a full one would count 0
+        reset_queries()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, body, format='json')
+                if response.streaming and response.is_async:
+                    async_to_sync(drain)(response.streaming_content)
+                elif response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+            transaction.set_rollback(True)
+        return response.status_code, len(queries), elapsed
+
+    @mock.patch('workorders.utils.llm._llm', StubBackend(latency=0))
+    def test_every_endpoint_stays_within_its_query_budget(self):
+        report = {}
+        for role in self.roles:
+            self.client.force_authenticate(self.users[role])
+            for name, method, url, body, budget in ENDPOINTS:
+                url, body = self.render(url), self.render(body)
+                calls = [self.call(method, url, body) for _ in range(self.repeat + 1)]
+                status, queries, _ = calls[-1]
+                timings = sorted(elapsed for _, _, elapsed in calls[1:])
+                report.setdefault(name, {})[role] = {
+                    'status': status,
+                    'queries': queries,
+                    'budget': budget,
+                    'p50_ms': round(timings[len(timings) // 2], 2),
+                    'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+                }
+                with self.subTest(endpoint=name, role=role):
+                    self.assertLess(status, 500)
+                    self.assertLessEqual(queries, budget)
+
+        path = os.environ.get('ENDPOINT_REPORT')
+        if path:
+            with open(path, 'w') as report_file:
+                json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+@override_settings(AI_ANSWER_CACHE_TTL=0)
+class ProfilingMiddlewareTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.ids = seed_plant(orders=20)
+
+    def setUp(self):
+        self.client.force_authenticate(self.users['manager'])
+
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_breaks_down_a_list_request(self):
+        self.client.get('/backend/api/workorders/')  # reference caches
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/backend/api/workorders/')
+
+        metrics = self.server_timing(response)
+        self.assertEqual(metrics['db']['desc'], f'"{len(queries)} queries"')
+        self.assertEqual(set(metrics), {'db', 'view', 'render', 'total'})
+        self.assertLessEqual(float(metrics['view']['dur']), float(metrics['total']['dur']))
+
+    def test_leaves_drf_serializers_alone_by_default(self):
+        from rest_framework import serializers
+        original = serializers.Serializer.__dict__['data']
+
+        self.client.get('/backend/api/workorders/')
+
+        self.assertIs(serializers.Serializer.__dict__['data'], original)
+
+    @override_settings(PROFILING_SERIALIZER_TIMING=True)
+    def test_times_serialization_when_enabled(self):
+        self.addCleanup(profiling.uninstrument_serializers)
+
+        response = self.client.get('/backend/api/workorders/')
+
+        self.assertGreater(float(self.server_timing(response)['serialize']['dur']), 0)
+
+    @mock.patch('workorders.utils.llm._llm', StubBackend(latency=0.05))
+    def test_times_the_llm_call(self):
+        response = self.client.post('/backend/ai-agent/', {'prompt': 'Why do motors trip?', 'filters': {}}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(float(self.server_timing(response)['llm']['dur']), 50)
+
+    @override_settings(PROFILING_LOG_SAMPLE_RATE=1)
+    def test_logs_sampled_requests(self):
+        with self.assertLogs('workorders.profiling', 'INFO') as logs:
+            self.client.get(f"/backend/api/workorders/{self.ids['workorder']}/")
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['method'], line['status']), ('GET', 200))
+        self.assertGreater(line['queries'], 0)
+        self.assertIn('serialize_ms', line)
+
+
+@override_settings(AI_ANSWER_CACHE_TTL=0)
+class MetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.ids = seed_plant(orders=20)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client.force_authenticate(self.users['manager'])
+
+    def sample(self, name, **labels):
+        return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_scrape_reports_request_latency_per_view(self):
+        before = self.sample('workorders_request_duration_seconds_count', view='workorder-list', method='GET')
+        self.client.get('/backend/api/workorders/')
+
+        response = self.client.get('/backend/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('workorders_request_stage_seconds_bucket{le="0.005",stage="render",view="workorder-list"}', body)
+        self.assertEqual(
+            self.sample('workorders_request_duration_seconds_count', view='workorder-list', method='GET'), before + 1,
+        )
+
+    def test_refuses_anonymous_scrapes_from_elsewhere(self):
+        self.client.force_authenticate(None)
+        remote = {'REMOTE_ADDR': '203.0.113.7'}
+
+        self.assertEqual(self.client.get('/backend/metrics', **remote).status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            refused = self.client.get('/backend/metrics', **remote)
+            wrong = self.client.get('/backend/metrics', HTTP_AUTHORIZATION='Bearer nope', **remote)
+            allowed = self.client.get('/backend/metrics', HTTP_AUTHORIZATION='Bearer s3cret', **remote)
+        with override_settings(METRICS_ALLOWED_IPS=['203.0.113.0/24']):
+            from_network = self.client.get('/backend/metrics', **remote)
+
+        self.assertEqual((refused.status_code, wrong.status_code), (401, 401))
+        self.assertEqual((allowed.status_code, from_network.status_code), (200, 200))
+
+    def test_staff_can_scrape(self):
+        staff = User.objects.create_user('metrics-staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+
+        self.assertEqual(self.client.get('/backend/metrics', REMOTE_ADDR='203.0.113.7').status_code, 200)
+
+    @override_settings(AI_ANSWER_CACHE_TTL=60)
+    @mock.patch('workorders.utils.llm._llm', StubBackend(latency=0))
+    def test_ai_agent_phases_and_answer_cache(self):
+        before = {
+            'sql': self.sample('workorders_ai_phase_seconds_count', phase='sql', mode='complete'),
+            'llm': self.sample('workorders_ai_phase_seconds_count', phase='llm', mode='complete'),
+            'hit': self.sample('workorders_cache_requests_total', cache='ai_answer', result='hit'),
+            'miss': self.sample('workorders_cache_requests_total', cache='ai_answer', result='miss'),
+        }
+        for _ in range(2):
+            self.client.post('/backend/ai-agent/', {'prompt': 'Why do motors trip?', 'filters': {}}, format='json')
+
+        # The second answer comes from the cache without running either phase
+        self.assertEqual(self.sample('workorders_ai_phase_seconds_count', phase='sql', mode='complete'), before['sql'] + 1)
+        self.assertEqual(self.sample('workorders_ai_phase_seconds_count', phase='llm', mode='complete'), before['llm'] + 1)
+        self.assertEqual(self.sample('workorders_cache_requests_total', cache='ai_answer', result='hit'), before['hit'] + 1)
+        self.assertEqual(self.sample('workorders_cache_requests_total', cache='ai_answer', result='miss'), before['miss'] + 1)
+
+    @override_settings(AI_ANSWER_CACHE_TTL=60)
+    @mock.patch('workorders.utils.llm._llm', StubBackend(latency=0))
+    def test_answer_cache_tells_questions_with_the_same_keywords_apart(self):
+        prompts = [
+            'How many problems with motor trips?',
+            'Why are there problems with motor trips?',
+            'why are there  problems with Motor trips',
+        ]
+        view = AIAgentView()
+        self.assertEqual(len({view.extract_keywords(prompt) for prompt in prompts}), 1)
+
+        for prompt in prompts:
+            self.client.post('/backend/ai-agent/', {'prompt': prompt, 'filters': {}}, format='json')
+
+        hits = list(UserPrompt.objects.filter(prompt__in=prompts).order_by('id').values_list('metadata__cache_hit', flat=True))
+        # Only the repeat, differing in case, spacing and punctuation, is served from the cache
+        self.assertEqual(hits, [False, False, True])
+
+    @override_settings(AI_ANSWER_CACHE_TTL=60)
+    def test_answer_cache_key_moves_with_workorder_and_equipment_writes(self):
+        view, prompt = AIAgentView(), 'Why do motors trip?'
+        keys = [view._answer_cache_key(prompt, view.extract_keywords(prompt), {})]
+
+        workorder = workorders.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            workorder.remarks = 'rechecked'
+            workorder.save()
+        keys.append(view._answer_cache_key(prompt, view.extract_keywords(prompt), {}))
+        with self.captureOnCommitCallbacks(execute=True):
+            workorder.equipment.save()
+        keys.append(view._answer_cache_key(prompt, view.extract_keywords(prompt), {}))
+
+        self.assertEqual(len(set(keys)), 3)
+        self.assertEqual(view._answer_cache_key(prompt, view.extract_keywords(prompt), {}), keys[-1])
+
+    def test_aggregates_worker_processes(self):
+        record = (
+            "from workorders import metrics; "
+            "metrics.REQUEST_SECONDS.labels('workorder-list', 'GET').observe(0.2); "
+            "metrics.RESPONSES.labels('workorder-list', 'GET', '200').inc()"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, '-c', record], cwd=settings.BASE_DIR, check=True,
+                    env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory},
+                )
+            merged = metrics.registry(path=directory)
+            count = merged.get_sample_value(
+                'workorders_request_duration_seconds_count', {'view': 'workorder-list', 'method': 'GET'},
+            )
+            responses = merged.get_sample_value(
+                'workorders_responses_total', {'view': 'workorder-list', 'method': 'GET', 'status': '200'},
+            )
+
+        self.assertEqual((count, responses), (2, 2))
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.001, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1)
+class SlowQueryCaptureTests(APITransactionTestCase):
+    # Transactional: captures are saved on a background thread with its own connection
+
+    def setUp(self):
+        self.users, self.ids = seed_plant(orders=20)
+        self.client.force_authenticate(self.users['manager'])
+
+    def test_records_queries_over_the_threshold_with_plans(self):
+        self.client.get('/backend/api/workorders/')
+        slow_queries.flush()
+
+        captured = SlowQuery.objects.filter(view='workorder-list')
+        self.assertTrue(captured.exists())
+        select = captured.filter(sql__startswith='SELECT').first()
+        self.assertIn('Buffers', select.plan)
+        self.assertEqual(select.fingerprint, slow_queries.fingerprint(select.sql))
+
+    def test_response_does_not_wait_for_explain(self):
+        release = threading.Event()
+
+        def slow_explain(alias, sql, params):
+            release.wait(10)
+            return 'Seq Scan on workorders_workorders_y2026'
+
+        with mock.patch('workorders.slow_queries.explain', side_effect=slow_explain):
+            started = time.perf_counter()
+            response = self.client.get('/backend/api/workorders/')
+            elapsed = time.perf_counter() - started
+            release.set()
+            slow_queries.flush()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 5)
+        self.assertTrue(SlowQuery.objects.filter(view='workorder-list', seq_scan=True).exists())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_off_by_default(self):
+        self.client.get('/backend/api/workorders/')
+        slow_queries.flush()
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_normalizes_literals_and_parameters(self):
+        normalized = slow_queries.normalize(
+            "SELECT * FROM workorders_workorders_y2026 WHERE id IN (%s, %s, %s)\n  AND problem = 'it''s hot' LIMIT 21"
+        )
+
+        self.assertEqual(normalized, 'SELECT * FROM workorders_workorders_y2026 WHERE id IN (...) AND problem = ? LIMIT ?')
+
+    def test_browsable_in_admin(self):
+        self.client.get('/backend/api/workorders/')
+        slow_queries.flush()
+        admin = User.objects.create_superuser('slow-admin', password='x')
+        self.client.force_login(admin)
+
+        changelist = self.client.get('/backend/admin/workorders/slowquery/?seq_scan__exact=1')
+        detail = self.client.get(f'/backend/admin/workorders/slowquery/{SlowQuery.objects.first().pk}/change/')
+
+        self.assertEqual((changelist.status_code, detail.status_code), (200, 200))
+
+
+class PartitionArchiveTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.ids = seed_plant(orders=10)
+        with connection.cursor() as cursor:
+            for table, key in partitions.PARTITIONED_TABLES.items():
+                for year in (2023, 2024):
+                    if year not in partitions.partitions(cursor, table):
+                        partitions.create_year_partition(cursor, table, key, year)
+
+        template = workorders.objects.get(pk=cls.ids['workorder'])
+        cls.old, cls.live = [
+            workorders.objects.create(
+                problem='Pump seized', department='Mechanical', initiated_by=template.initiated_by,
+                equipment=template.equipment, type_of_work=template.type_of_work,
+                closed=Closed.objects.get(closed='Yes'), initiation_date=initiated,
+            )
+            for initiated in (timezone.now().replace(year=2023), timezone.now())
+        ]
+        # The 2023 order was edited in 2024; the live order carries a backdated 2023 entry
+        for workorder, written in ((cls.old, 2023), (cls.old, 2024), (cls.live, 2023)):
+            entry = WorkOrderHistory.objects.create(workorder=workorder, snapshot={}, version=written, action='edited')
+            WorkOrderHistory.objects.filter(pk=entry.pk).update(timestamp=timezone.now().replace(year=written))
+
+    def test_archives_history_with_the_order_year(self):
+        call_command('manage_partitions', archive_before=2025, archive_schema='archive_test', stdout=io.StringIO())
+
+        self.assertFalse(workorders.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(WorkOrderHistory.objects.filter(workorder_id=self.old.pk).exists())
+        self.assertEqual(WorkOrderHistory.objects.filter(workorder=self.live, version=2023).count(), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT extract(year FROM timestamp)::int FROM archive_test.{partitions.archived_history_name(2023)} '
+                'WHERE workorder_id = %s ORDER BY 1', [self.old.pk],
+            )
+            self.assertEqual([year for year, in cursor.fetchall()], [2023, 2024])
+            # History partitions stay attached, whatever they still hold
+            self.assertIn(2023, partitions.partitions(cursor, 'workorders_workorderhistory'))
+
+    def test_reports_duplicate_ids(self):
+        # An explicit id is only unique within its year partition
+        copy = workorders.objects.get(pk=self.live.pk)
+        copy.initiation_date = timezone.now().replace(year=2024)
+        workorders.objects.bulk_create([copy])
+        out = io.StringIO()
+
+        call_command('manage_partitions', stdout=out)
+
+        self.assertIn(f'ids on more than one row, inserted without the sequence: [{self.live.pk}]', out.getvalue())
+
+
+class MemoryVectorStore:
+    """The slice of PGVector that sync_vector_store uses, held in a dict"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.vectors = {}
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        self.vectors.update(zip(ids, embeddings))
+
+    def delete(self, ids=None, collection_only=False):
+        for id in ids:
+            self.vectors.pop(id, None)
+
+
+class VectorStoreSyncTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.ids = seed_plant(orders=10)
+
+    def setUp(self):
+        self.store = MemoryVectorStore(HashingEmbeddings(dimensions=64))
+
+    def sync(self, **options):
+        result = sync_vector_store(vector_store=self.store, batch_size=4, concurrency=2, **options)
+        return {key: result[key] for key in ('embedded', 'skipped', 'deleted')}
+
+    def test_counts_embedded_skipped_and_deleted(self):
+        self.assertEqual(self.sync(), {'embedded': 10, 'skipped': 0, 'deleted': 0})
+        self.assertEqual(self.sync(), {'embedded': 0, 'skipped': 10, 'deleted': 0})
+
+        changed = workorders.objects.get(pk=self.ids['workorder'])
+        changed.problem = 'Motor tripping on start'
+        changed.save()
+        deleted = workorders.objects.exclude(pk=changed.pk).first()
+        deleted.delete()
+
+        self.assertEqual(self.sync(), {'embedded': 1, 'skipped': 8, 'deleted': 1})
+        self.assertNotIn(document_id(deleted.pk), self.store.vectors)
+        self.assertEqual(EmbeddedWorkOrder.objects.count(), 9)
+
+    def test_keeps_vectors_of_archived_orders(self):
+        self.sync()
+        archived = workorders.objects.first()
+        # What detaching a year partition looks like from here: the row is gone, no delete signal
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM workorders_workorders WHERE id = %s', [archived.pk])
+
+        self.assertEqual(self.sync(), {'embedded': 0, 'skipped': 9, 'deleted': 0})
+        self.assertIn(document_id(archived.pk), self.store.vectors)
+
+    def test_full_sync_re_embeds_live_orders_and_keeps_archived_ones(self):
+        self.sync()
+        archived = workorders.objects.first()
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM workorders_workorders WHERE id = %s', [archived.pk])
+
+        self.assertEqual(self.sync(full=True), {'embedded': 9, 'skipped': 0, 'deleted': 0})
+        self.assertIn(document_id(archived.pk), self.store.vectors)
+        self.assertEqual(len(self.store.vectors), 10)
+        self.assertEqual(EmbeddedWorkOrder.objects.count(), 10)
+
+    def test_full_sync_cannot_be_limited_by_date(self):
+        with self.assertRaises(ValueError):
+            self.sync(full=True, since=timezone.now())
+        with self.assertRaisesMessage(CommandError, '--since'):
+            call_command('load_ai_data', full=True, since='2025-01-01', stdout=io.StringIO())
+        self.assertEqual(self.store.vectors, {})
+
+    def test_documents_are_streamed_in_chunks(self):
+        with self.assertNumQueries(0):
+            documents = generate_workorder_documents(workorders.objects.order_by('id'), chunk_size=4)
+        self.assertTrue(inspect.isgenerator(documents))
+
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator:
+            with CaptureQueriesContext(connection) as queries:
+                first = next(documents)
+                rest = list(documents)
+        iterator.assert_called_once_with(mock.ANY, chunk_size=4)
+        # One server-side cursor read in chunks, the problem text cut short in SQL
+        self.assertEqual(len(queries), 1)
+        self.assertIn('SUBSTRING("workorders_workorders"."problem", 1, 200)', queries[0]['sql'])
+        self.assertEqual(queries[0]['sql'].count('"workorders_workorders"."problem"'), 1)
+
+        self.assertEqual(len(rest) + 1, 10)
+        problem = workorders.objects.get(pk=first.metadata['id']).problem
+        self.assertTrue(first.page_content.endswith('|' + problem[:200]))
+        self.assertEqual(set(first.metadata), {'id', 'equipment', 'date', 'department'})
+
+    def test_load_ai_data_since_is_an_aware_day_start(self):
+        out = io.StringIO()
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            call_command('load_ai_data', since=str(timezone.localdate()), dry_run=True, stdout=out)
+
+        today = workorders.objects.filter(initiation_date__date=timezone.localdate()).count()
+        self.assertIn(f'would have embedded {today},', out.getvalue())
+
+
+class HistoryVersionLockTests(TransactionTestCase):
+    def setUp(self):
+        department = Department.objects.create(department='Mechanical')
+        location = Location.objects.create(department=department, area='Hall A')
+        equipment = Equipment.objects.create(
+            machine='P1', machine_type=Machine_Type.objects.create(machine_type='Pump'), location=location,
+        )
+        self.user = User.objects.create_user('manager', password='x')
+        self.workorder = workorders.objects.create(
+            problem='Pump vibrating', initiated_by=self.user, equipment=equipment,
+            type_of_work=Type_of_Work.objects.create(type_of_work='Repair'), department='Mechanical',
+        )
+        history.record(self.workorder, None, self.user, 'created')
+
+    def test_concurrent_changes_get_distinct_versions(self):
+        pk, before = self.workorder.pk, history.state(self.workorder)
+        locked, release = threading.Event(), threading.Event()
+
+        def first():
+            try:
+                with transaction.atomic():
+                    version = history.next_versions([pk])[pk]
+                    locked.set()
+                    release.wait(10)
+                    history.entry(pk, version, before, before, action='first').save()
+            finally:
+                connection.close()
+
+        def second():
+            try:
+                history.record(self.workorder, before, None, 'second')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=first), threading.Thread(target=second)]
+        threads[0].start()
+        locked.wait(10)
+        threads[1].start()
+        time.sleep(0.2)
+        self.assertTrue(threads[1].is_alive())  # Waiting for the first change's lock
+        release.set()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(
+            list(self.workorder.history.order_by('version').values_list('version', 'action')),
+            [(0, 'created'), (1, 'first'), (2, 'second')],
+        )
+
+
+class StatusTrendTests(APITestCase):
+    url = '/backend/api/analytics/status-trend/'
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(department='Mechanical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Pump')
+        equipment = Equipment.objects.create(machine='Feed pump', machine_type=machine_type, location=location)
+        repair = Type_of_Work.objects.create(type_of_work='Repair')
+        statuses = {
+            name: Work_Status.objects.get_or_create(work_status=name, defaults={'pk': pk})[0]
+            for pk, name in enumerate(('Pending', 'Completed'), start=100)
+        }
+        cls.user = User.objects.create_user('trend', password='x')
+        now = timezone.localtime()
+        for days_ago, status in ((0, 'Pending'), (0, 'Pending'), (3, 'Completed'), (62, 'Completed')):
+            workorders.objects.create(
+                problem='Pump cavitating', initiated_by=cls.user, equipment=equipment, type_of_work=repair, department='Mechanical',
+                work_status=statuses[status], initiation_date=now - timedelta(days=days_ago),
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def trend(self, **params):
+        live = self.client.get(self.url, {**params, 'source': 'live'}).json()
+        rollup = self.client.get(self.url, params).json()
+        self.assertEqual(live, rollup)
+        return {row['status']: row['data'] for row in rollup['results']}, rollup['dates']
+
+    def test_days_without_orders_are_zero(self):
+        counts, dates = self.trend(timeframe=6, group_by='day')
+
+        self.assertEqual(len(dates), 7)
+        self.assertEqual(dates[-1], timezone.localdate().strftime('%Y-%m-%d'))
+        self.assertEqual(counts['Pending'], [0, 0, 0, 0, 0, 0, 2])
+        self.assertEqual(counts['Completed'], [0, 0, 0, 1, 0, 0, 0])
+        self.assertEqual(counts['In_Process'], [0] * 7)
+        self.assertEqual(counts['Closed'], [0] * 7)
+
+    def test_months_without_orders_are_zero(self):
+        counts, dates = self.trend(timeframe=120, group_by='month')
+
+        today = timezone.localdate()
+        months = {(today - timedelta(days=days)).strftime('%Y-%m') for days in range(121)}
+        self.assertEqual(dates, sorted(months))
+        now = timezone.localtime()
+        expected = [sum((now - timedelta(days=days)).strftime('%Y-%m') == month for days in (3, 62)) for month in dates]
+        self.assertEqual(counts['Completed'], expected)
+        self.assertIn(0, expected)
+        self.assertEqual(counts['Pending'], [0] * (len(dates) - 1) + [2])
+
+
+def rollup_rows():
+    """WorkOrderDailyStat as {key: (count, repair seconds)}, rows netted to zero left out"""
+    return {
+        (row.day, row.department_id, row.location_id, row.machine_type_id, row.work_status_id):
+            (row.count, round(row.repair_seconds, 2))
+        for row in WorkOrderDailyStat.objects.exclude(count=0)
+    }
+
+
+class DailyStatRollupTests(APITestCase):
+    """The incrementally maintained rollup must always equal a full rebuild"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.ids = seed_plant(orders=30)
+
+    def assertMatchesRebuild(self):
+        incremental = rollup_rows()
+        rebuild_daily_stats()
+        self.assertEqual(incremental, rollup_rows())
+
+    def call(self, role, method, url, body=None, expected=200):
+        self.client.force_authenticate(self.users[role])
+        response = getattr(self.client, method)(url, body, format='json')
+        self.assertEqual(response.status_code, expected, response.content)
+        self.assertMatchesRebuild()
+        return response
+
+    def test_single_changes(self):
+        created = self.call('production', 'post', '/backend/api/workorders/', {
+            'department': 'Electrical', 'problem': 'Fan noisy',
+            'equipment': self.ids['equipment'], 'type_of_work': self.ids['type_of_work'],
+        }, expected=201).json()['id']
+        self.call('utilities', 'post', f"/backend/api/workorders/{self.ids['workorder']}/accept/", {'assigned_to': 'Shift A'})
+        self.call('utilities', 'patch', f"/backend/api/workorders/{self.ids['pending'][1]}/", {'accepted': False})
+        self.call('utilities', 'post', f"/backend/api/workorders/{self.ids['in_process'][0]}/complete/")
+
+        # The API cannot move an order to other equipment; save() can
+        workorder = workorders.objects.get(pk=created)
+        workorder.equipment = Equipment.objects.exclude(location__department__department='Electrical').first()
+        workorder.save()
+        self.assertMatchesRebuild()
+
+        self.call('manager', 'delete', f'/backend/api/workorders/{created}/', expected=204)
+
+    def test_bulk_changes(self):
+        self.call('production', 'post', '/backend/api/workorders/bulk/', [
+            {'department': 'Electrical', 'problem': f'Lamp {i} out', 'equipment': self.ids['equipment'], 'type_of_work': self.ids['type_of_work']}
+            for i in range(3)
+        ], expected=201)
+        self.call('utilities', 'post', '/backend/api/workorders/bulk-accept/', {'ids': self.ids['pending']})
+        self.call('utilities', 'post', '/backend/api/workorders/bulk-complete/', {'ids': self.ids['in_process']})
+        self.call('production', 'post', '/backend/api/workorders/bulk-close/', {'ids': self.ids['completed'], 'closed': True})
+
+    def test_equipment_moves(self):
+        equipment = Equipment.objects.get(pk=self.ids['equipment'])
+        location = Location.objects.exclude(department=equipment.location.department).first()
+        machine_type = Machine_Type.objects.exclude(pk=equipment.machine_type_id).first()
+
+        def counted_at_target():
+            return sum(WorkOrderDailyStat.objects.filter(location=location, machine_type=machine_type).values_list('count', flat=True))
+
+        already_there = counted_at_target()
+        equipment.location = location
+        equipment.save()
+        self.assertMatchesRebuild()
+        equipment.machine_type = machine_type
+        equipment.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(counted_at_target(), already_there + workorders.objects.filter(equipment=equipment).count())
+
+
+class PredictiveCandidateTests(APITestCase):
+    url = '/backend/api/analytics/equipment-faults/'
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(department='Mechanical')
+        location = Location.objects.create(department=department, area='Hall A')
+        machine_type = Machine_Type.objects.create(machine_type='Pump')
+        repair = Type_of_Work.objects.create(type_of_work='Repair')
+        cls.user = User.objects.create_user('faults', password='x')
+        now = timezone.now()
+        # Failures per machine, in days ago
+        failures = {
+            'Every 30 days, 10 overdue': (100, 70, 40),
+            'Every 10 days, due now': (20, 10),
+            'Next one in 56 days': (60, 2),
+            'Failed once': (15,),
+            'Once in the last year': (400, 30),
+        }
+        cls.equipment = {}
+        for machine, days_ago in failures.items():
+            equipment = cls.equipment[machine] = Equipment.objects.create(
+                machine=machine, machine_type=machine_type, location=location,
+            )
+            workorders.objects.bulk_create([
+                workorders(
+                    problem='Impeller worn', initiated_by=cls.user, equipment=equipment, equipment_name=machine,
+                    type_of_work=repair, department='Mechanical', initiation_date=now - timedelta(days=days),
+                )
+                for days in days_ago
+            ])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def candidates(self):
+        return [
+            (row['equipment_name'], row['avg_interval_days'], row['days_overdue'])
+            for row in self.client.get(self.url).json()['predictive_candidates']
+        ]
+
+    def test_ranks_equipment_overdue_by_its_own_failure_interval(self):
+        self.assertEqual(self.candidates(), [
+            ('Every 30 days, 10 overdue', 30, 10),
+            ('Every 10 days, due now', 10, 0),
+        ])
+
+    def test_returns_at_most_candidate_limit(self):
+        with mock.patch.object(EquipmentFaultAnalysisView, 'candidate_limit', 1):
+            self.assertEqual([name for name, _, _ in self.candidates()], ['Every 30 days, 10 overdue'])
+
+
+class FailingBackend(StubBackend):
+    def stream(self, prompt):
+        yield 'Partial '
+        raise RuntimeError('model went away')
+
+
+class StallingBackend(StubBackend):
+    """Sends two chunks, then hangs until released, like a slow model"""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.release = threading.Event()
+
+    def stream(self, prompt):
+        yield 'Partial '
+        yield 'answer '
+        self.release.wait(5)
+        yield 'never sent'
+
+
+async def disconnect_after(stream, count):
+    """Read `count` chunks, then cancel the reader as the ASGI handler does when the client leaves"""
+    received, enough = [], asyncio.Event()
+
+    async def read():
+        async for chunk in stream:
+            received.append(chunk)
+            if len(received) == count:
+                enough.set()
+
+    reader = asyncio.ensure_future(read())
+    await enough.wait()
+    reader.cancel()
+    with suppress(asyncio.CancelledError):
+        await reader
+    return received
+
+
+@override_settings(AI_ANSWER_CACHE_TTL=0)
+class AIAgentStreamTests(APITestCase):
+    url = '/backend/ai-agent/stream/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _ = seed_plant(orders=20)
+
+    def setUp(self):
+        self.client.force_authenticate(self.users['manager'])
+
+    def events(self, prompt):
+        response = self.client.post(self.url, {'prompt': prompt, 'filters': {}}, format='json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(async_to_sync(drain)(response.streaming_content)).decode()
+        events = []
+        for frame in body.split('\n\n'):
+            if frame:
+                event, data = frame.split('\n')
+                events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    @mock.patch('workorders.utils.llm._llm', StubBackend(latency=0))
+    def test_sends_meta_then_tokens_then_done(self):
+        events = self.events('Why do motors trip?')
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'meta')
+        self.assertEqual(names[-1], 'done')
+        self.assertEqual(set(names[1:-1]), {'token'})
+        self.assertGreater(len(names), 3)
+
+        meta, done = events[0][1], events[-1][1]
+        self.assertFalse(meta['cached'])
+        self.assertTrue(meta['sources'])
+        self.assertEqual(done['prompt_id'], meta['prompt_id'])
+        answer = ''.join(data['text'] for name, data in events if name == 'token')
+        self.assertTrue(answer.startswith('Stub analysis'))
+        self.assertEqual(UserPrompt.objects.get(pk=meta['prompt_id']).response, answer)
+
+    @mock.patch('workorders.utils.llm._llm', FailingBackend(latency=0))
+    def test_backend_failure_ends_the_stream_with_an_error_event(self):
+        with self.assertLogs('workorders.views.ai_views', 'ERROR'):
+            events = self.events('Why do seals leak?')
+
+        self.assertEqual([name for name, _ in events], ['meta', 'token', 'error'])
+        self.assertEqual(events[-1][1], {'error': 'Processing error', 'detail': 'model went away'})
+        self.assertIsNone(UserPrompt.objects.get(pk=events[0][1]['prompt_id']).response)
+
+    @override_settings(AI_ANSWER_CACHE_TTL=60)
+    def test_client_disconnect_keeps_the_partial_answer(self):
+        backend = StallingBackend()
+        with mock.patch('workorders.utils.llm._llm', backend):
+            response = self.client.post(self.url, {'prompt': 'Why do pumps cavitate?', 'filters': {}}, format='json')
+            try:
+                received = async_to_sync(disconnect_after)(response.streaming_content, 3)
+            finally:
+                backend.release.set()
+
+        self.assertEqual(len(received), 3)  # meta and both tokens
+        prompt = UserPrompt.objects.latest('id')
+        self.assertEqual(prompt.response, 'Partial answer ')
+        self.assertTrue(prompt.metadata['aborted'])
+
+        # A cut-off answer is never served from the cache
+        with mock.patch('workorders.utils.llm._llm', StubBackend(latency=0)):
+            events = self.events('Why do pumps cavitate?')
+        self.assertFalse(events[0][1]['cached'])
+        self.assertNotIn('aborted', UserPrompt.objects.get(pk=events[0][1]['prompt_id']).metadata)
+
+
+class FlakyEmbeddings(HashingEmbeddings):
+    """Fails its first `failures` calls; slower for earlier batches so they finish out of order"""
+
+    def __init__(self, failures=0, delay=0.0):
+        super().__init__(dimensions=8)
+        self.failures, self.delay = failures, delay
+        self.calls = self.active = self.max_active = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise ConnectionError('rate limited')
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            # Text i sleeps less the later it comes, so later batches finish first
+            if self.delay:
+                time.sleep(self.delay / (1 + int(texts[0].split()[1])))
+            return super().embed_documents(texts)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class RecordingVectorStore:
+    def __init__(self):
+        self.ids = []
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        self.ids += ids or []
+
+
+class EmbeddingPipelineTests(SimpleTestCase):
+    def documents(self, count, consumed=None):
+        for i in range(count):
+            if consumed is not None:
+                consumed.append(i)
+            yield Document(page_content=f'doc {i}', metadata={'id': i})
+
+    def run_pipeline(self, embeddings, count=12, **options):
+        store = RecordingVectorStore()
+        pipeline = EmbeddingPipeline(embeddings, store, **{'batch_size': 2, 'max_concurrency': 3, 'backoff': 0.01, **options})
+        stats = pipeline.run(self.documents(count), ids=lambda document: document.metadata['id'])
+        return store, stats
+
+    def test_retries_a_failing_batch_with_backoff(self):
+        retries = metrics.REGISTRY.get_sample_value('workorders_embedding_retries_total') or 0
+        with mock.patch('workorders.utils.embeddings.time.sleep') as sleep, \
+                self.assertLogs('workorders.utils.embeddings', 'WARNING'):
+            store, stats = self.run_pipeline(FlakyEmbeddings(failures=2), count=2, max_retries=3)
+
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        self.assertTrue(0.01 <= delays[0] <= 0.011 and 0.02 <= delays[1] <= 0.022, delays)
+        self.assertEqual((store.ids, stats['documents']), ([0, 1], 2))
+        self.assertEqual(metrics.REGISTRY.get_sample_value('workorders_embedding_retries_total'), retries + 2)
+
+    def test_gives_up_after_max_retries(self):
+        embeddings = FlakyEmbeddings(failures=100)
+        with mock.patch('workorders.utils.embeddings.time.sleep'), self.assertRaises(ConnectionError), \
+                self.assertLogs('workorders.utils.embeddings', 'WARNING'):
+            self.run_pipeline(embeddings, count=2, max_retries=2)
+        self.assertEqual(embeddings.calls, 3)
+
+    def test_writes_in_input_order_with_concurrent_requests(self):
+        embeddings = FlakyEmbeddings(delay=0.05)
+        store, stats = self.run_pipeline(embeddings)
+
+        self.assertEqual(store.ids, list(range(12)))
+        self.assertEqual((stats['documents'], stats['batches']), (12, 6))
+        self.assertGreater(embeddings.max_active, 1)
+
+    def test_bounds_requests_in_flight(self):
+        embeddings, consumed, written = FlakyEmbeddings(delay=0.02), [], []
+        pipeline = EmbeddingPipeline(embeddings, RecordingVectorStore(), batch_size=2, max_concurrency=2)
+        pipeline.run(self.documents(20, consumed), before_write=lambda batch: written.append(len(consumed)))
+
+        self.assertLessEqual(embeddings.max_active, 2)
+        # The input is read lazily, at most max_concurrency batches ahead of the writes
+        self.assertTrue(all(read <= 2 * (2 + batch) for batch, read in enumerate(written)), written)
+
+
+class LLMBackendTests(SimpleTestCase):
+    def setUp(self):
+        reset_llm()
+        self.addCleanup(reset_llm)
+
+    @override_settings(AI_LLM_BACKEND='stub')
+    def test_stub_setting_selects_the_stub_backend(self):
+        self.assertIsInstance(get_llm(), StubBackend)
+
+    @override_settings(AI_LLM_BACKEND='stub')
+    def test_backend_is_built_once_and_shared_by_requests(self):
+        with mock.patch.object(StubBackend, '__init__', autospec=True, side_effect=StubBackend.__init__) as build:
+            threads = [threading.Thread(target=get_llm) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # DRF builds a view per request; they all get the process-wide backend
+            self.assertIs(AIAgentView().llm, AIAgentView().llm)
+        self.assertEqual(build.call_count, 1)
+
+    def test_reset_llm_swaps_the_backend(self):
+        with override_settings(AI_LLM_BACKEND='stub'):
+            stub = get_llm()
+        with override_settings(AI_LLM_BACKEND='workorders.tests.FailingBackend'):
+            self.assertIs(get_llm(), stub)
+            reset_llm()
+            self.assertIsInstance(get_llm(), FailingBackend)
+
+    def test_executor_is_built_once(self):
+        executor = get_executor()
+        self.assertIs(get_executor(), executor)
+        self.assertEqual(executor._max_workers, settings.AI_EXECUTOR_WORKERS)
+
+
+class SeedWorkordersTests(APITestCase):
+    options = [
+        '--orders=30', '--chunk-size=12', '--years=1', '--end=2026-06-01', '--seed=3', '--equipment=16',
+        '--production-users=3', '--utilities-users=2', '--managers=1',
+    ]
+
+    def seed(self, *extra):
+        call_command('seed_workorders', *self.options, *extra, stdout=io.StringIO())
+        return list(
+            workorders.objects.filter(initiated_by__username__startswith='seed-')
+            .order_by('initiation_date', 'id')
+            .values_list('id', 'initiation_date', 'problem', 'equipment__machine', 'work_status__work_status')
+        )
+
+    def test_seeds_a_reproducible_plant(self):
+        seeded = self.seed()
+
+        self.assertEqual(len(seeded), 30)
+        self.assertEqual(Equipment.objects.filter(machine__contains='-0').count(), 16)
+        self.assertEqual(User.objects.filter(username__startswith='seed-').count(), 6)
+        ids = [row[0] for row in seeded]
+        self.assertEqual(WorkOrderHistory.objects.filter(workorder_id__in=ids, action='created').count(), 30)
+        self.assertGreater(WorkOrderHistory.objects.filter(workorder_id__in=ids).count(), 30)
+        with connection.cursor() as cursor:
+            self.assertEqual(partitions.duplicate_ids(cursor, 'workorders_workorders'), [])
+
+        # Rows inserted after the COPY take the next ids of the same sequence
+        later = workorders.objects.create(
+            problem='Fan noisy', initiated_by=User.objects.get(username='seed-prod-001'),
+            equipment=Equipment.objects.first(), type_of_work=Type_of_Work.objects.first(), department='Electrical',
+        )
+        self.assertGreater(later.pk, max(ids))
+
+        seeded_stats = rollup_rows()
+        self.assertEqual(sum(count for count, _ in seeded_stats.values()), 31)
+        rebuild_daily_stats()
+        self.assertEqual(seeded_stats, rollup_rows())
+
+    def test_flush_and_reseed_gives_the_same_orders(self):
+        first = self.seed()
+        EmbeddedWorkOrder.objects.bulk_create([EmbeddedWorkOrder(workorder_id=first[0][0], content_hash='x')])
+
+        second = self.seed('--flush')
+
+        self.assertEqual([row[1:] for row in second], [row[1:] for row in first])
+        self.assertFalse(workorders.objects.filter(id__in=[row[0] for row in first]).exists())
+        self.assertFalse(WorkOrderHistory.objects.filter(workorder_id__in=[row[0] for row in first]).exists())
+        self.assertIsNotNone(EmbeddedWorkOrder.objects.get(workorder_id=first[0][0]).deleted_at)
+        seeded_stats = rollup_rows()
+        rebuild_daily_stats()
+        self.assertEqual(seeded_stats, rollup_rows())
@@ -4,9 +4,23 @@ from .ai_utils import (
     generate_workorder_documents,
     initialize_vector_store
 )
+from .embeddings import (
+    EmbeddingPipeline,
+    get_embeddings
+)
+from .llm import (
+    LLMBackend,
+    get_llm,
+    get_executor
+)
 
 __all__ = [
     'get_vector_store',
     'generate_workorder_documents', 
-    'initialize_vector_store'
+    'initialize_vector_store',
+    'EmbeddingPipeline',
+    'get_embeddings',
+    'LLMBackend',
+    'get_llm',
+    'get_executor'
 ]
\ No newline at end of file
@@ -1,48 +1,174 @@
 # workorders/utils/ai_utils.py
 from langchain.docstore.document import Document
 from langchain.vectorstores import PGVector
-from langchain.embeddings import OpenAIEmbeddings
 from django.conf import settings
-from workorders.models import workorders, Equipment
+from django.db.models.functions import Substr
+from django.utils import timezone
+from workorders import metrics
+from workorders.models import workorders, Equipment, EmbeddedWorkOrder
+from .embeddings import EmbeddingPipeline, get_embeddings
+import hashlib
+import itertools
+import json
 import re
 
-def generate_workorder_documents():
-    """More compact document format with better metadata"""
-    documents = []
-    for wo in workorders.objects.all().select_related('equipment'):
+def generate_workorder_documents(queryset=None, chunk_size=2000):
+    """
+    Yield one compact Document per workorder.
+
+    Rows are streamed from a server-side cursor `chunk_size` at a time and
+    only the columns the document needs are loaded, the problem text cut to
+    its first 200 characters in the database, so memory stays flat however
+    large the table is. The metadata holds no copy of the text.
+    """
+    if queryset is None:
+        queryset = workorders.objects.all()
+    queryset = queryset.select_related('equipment').only(
+        'id', 'initiation_date', 'department', 'equipment__machine'
+    ).annotate(problem_head=Substr('problem', 1, 200))
+    for wo in queryset.iterator(chunk_size=chunk_size):
+        machine = wo.equipment.machine if wo.equipment else None
         doc_text = (
             f"WO#{wo.id}|{wo.initiation_date.date()}|"
-            f"{wo.equipment.machine if wo.equipment else 'None'}|"
-            f"{wo.problem[:200]}"  # Truncate problem description
+            f"{machine or 'None'}|"
+            f"{wo.problem_head}"
         )
         metadata = {
             "id": wo.id,
-            "problem": wo.problem.lower(),  # Full problem in lowercase for case-insensitive search
-            "equipment": wo.equipment.machine if wo.equipment else None,
+            "equipment": machine,
             "date": str(wo.initiation_date.date()),
             "department": wo.department
         }
-        documents.append(Document(page_content=doc_text, metadata=metadata))
-    return documents
+        yield Document(page_content=doc_text, metadata=metadata)
 
-def get_vector_store():
+def get_vector_store(embeddings=None):
     """Vector store with optimized configuration"""
     return PGVector(
         connection_string=f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}",
-        embedding_function=OpenAIEmbeddings(),
+        embedding_function=embeddings or get_embeddings(),
         collection_name="workorder_embeddings",
         distance_strategy="cosine"
     )
 
 def initialize_vector_store():
-    """Initialize with progress tracking"""
-    from tqdm import tqdm
+    """Re-embed every workorder (see sync_vector_store for incremental loads)"""
     vector_store = get_vector_store()
-    documents = generate_workorder_documents()
-    
-    # Batch insert for large datasets
-    batch_size = 100
-    for i in tqdm(range(0, len(documents), batch_size)):
-        vector_store.add_documents(documents[i:i+batch_size])
-    
-    return vector_store
\ No newline at end of file
+    sync_vector_store(full=True, vector_store=vector_store)
+    return vector_store
+
+def document_id(workorder_id):
+    """Vector store id of a workorder's document"""
+    return f"workorder:{workorder_id}"
+
+def document_hash(document):
+    """Content hash of a document's text and metadata"""
+    payload = json.dumps(
+        {'text': document.page_content, 'metadata': document.metadata},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def changed_documents(documents, full, counts, pending, chunk_size=2000):
+    """
+    Filter a document stream down to the ones that need (re-)embedding, all
+    of them when `full`.
+
+    Stored hashes are looked up one chunk at a time rather than loaded for
+    the whole table. Each yielded document's (content_hash, replaces) pair is
+    parked in `pending` until it has been written; `counts` collects
+    'embedded' and 'skipped'.
+    """
+    iterator = iter(documents)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        tracked = dict(
+            EmbeddedWorkOrder.objects
+            .filter(workorder_id__in=[document.metadata['id'] for document in chunk])
+            .values_list('workorder_id', 'content_hash')
+        )
+        for document in chunk:
+            workorder_id = document.metadata['id']
+            content_hash = document_hash(document)
+            if not full and tracked.get(workorder_id) == content_hash:
+                counts['skipped'] += 1
+                continue
+            counts['embedded'] += 1
+            pending[workorder_id] = (content_hash, workorder_id in tracked)
+            yield document
+
+def sync_vector_store(full=False, since=None, dry_run=False, batch_size=None, concurrency=None,
+                      vector_store=None):
+    """
+    Bring the vector store in line with the workorders table.
+
+    Only workorders whose document text or metadata hash changed since they
+    were last embedded are (re-)embedded; vectors of workorders deleted
+    through the ORM (EmbeddedWorkOrder.deleted_at) are removed, those of
+    archived years are kept. `full` re-embeds every workorder in the table,
+    changed or not (archived vectors keep their old embedding), `since`
+    limits the scan to workorders initiated on or after that date; the two
+    cannot be combined. `dry_run` only counts. Documents are generated, filtered and embedded as
+    one stream, `batch_size` documents per request with up to `concurrency`
+    requests in flight. Returns {'embedded', 'skipped', 'deleted',
+    'seconds', 'docs_per_second'}.
+    """
+    if full and since:
+        raise ValueError("A full sync re-embeds every workorder, it cannot be limited with since")
+    queryset = workorders.objects.all()
+    if since:
+        queryset = queryset.filter(initiation_date__gte=since)
+
+    removed = list(
+        EmbeddedWorkOrder.objects.filter(deleted_at__isnull=False).values_list('workorder_id', flat=True)
+    )
+
+    counts = {'embedded': 0, 'skipped': 0}
+    pending = {}
+    documents = changed_documents(generate_workorder_documents(queryset), full, counts, pending)
+
+    if dry_run:
+        for _ in documents:
+            pending.clear()
+        return {**counts, 'deleted': len(removed), 'seconds': 0.0, 'docs_per_second': 0.0}
+
+    vector_store = vector_store or get_vector_store()
+
+    if removed:
+        vector_store.delete(ids=[document_id(i) for i in removed], collection_only=True)
+        EmbeddedWorkOrder.objects.filter(workorder_id__in=removed).delete()
+
+    def replace_changed(batch):
+        # Replace changed documents: drop the old vectors before adding the new ones
+        replaced = [document_id(document.metadata['id']) for document in batch if pending[document.metadata['id']][1]]
+        if replaced:
+            vector_store.delete(ids=replaced, collection_only=True)
+
+    def track(batch):
+        now = timezone.now()
+        EmbeddedWorkOrder.objects.bulk_create(
+            [
+                EmbeddedWorkOrder(
+                    workorder_id=document.metadata['id'],
+                    content_hash=pending.pop(document.metadata['id'])[0],
+                    embedded_at=now,
+                )
+                for document in batch
+            ],
+            update_conflicts=True,
+            unique_fields=['workorder_id'],
+            update_fields=['content_hash', 'embedded_at'],
+        )
+
+    pipeline = EmbeddingPipeline(
+        vector_store.embeddings, vector_store,
+        batch_size=batch_size, max_concurrency=concurrency,
+    )
+    stats = pipeline.run(
+        documents,
+        ids=lambda document: document_id(document.metadata['id']),
+        before_write=replace_changed,
+        after_write=track,
+    )
+    for result in ('embedded', 'skipped'):
+        metrics.INGEST_DOCUMENTS.labels(result).inc(counts[result])
+    metrics.INGEST_DOCUMENTS.labels('deleted').inc(len(removed))
+    return {**counts, 'deleted': len(removed), 'seconds': stats['seconds'], 'docs_per_second': stats['docs_per_second']}
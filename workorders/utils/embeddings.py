@@ -0,0 +1,153 @@
+# workorders/utils/embeddings.py
+"""
+Embedding backends and the batched ingestion pipeline for the vector store.
+
+AI_EMBEDDING_BACKEND picks the embedder: 'openai', 'hashing' (local feature
+hashing, no network, for throughput benchmarks and offline development) or a
+dotted path to a langchain Embeddings class.
+"""
+import hashlib
+import logging
+import math
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from langchain_core.embeddings import Embeddings
+
+from workorders import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words feature hashing (unigrams + bigrams), L2 normalized"""
+
+    def __init__(self, dimensions=None):
+        self.dimensions = dimensions or getattr(settings, 'AI_EMBEDDING_DIMENSIONS', 1536)
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        tokens = re.findall(r'\w+', text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+
+def openai_embeddings():
+    from langchain.embeddings import OpenAIEmbeddings
+    return OpenAIEmbeddings()
+
+
+EMBEDDING_BACKENDS = {
+    'openai': openai_embeddings,
+    'hashing': HashingEmbeddings,
+}
+
+
+def get_embeddings(backend=None):
+    backend = backend or getattr(settings, 'AI_EMBEDDING_BACKEND', 'openai')
+    factory = EMBEDDING_BACKENDS.get(backend) or import_string(backend)
+    return factory()
+
+
+class EmbeddingPipeline:
+    """
+    Embed documents in batches with a bounded number of concurrent embedding
+    requests, retrying failed batches with exponential backoff. Batches are
+    written to the vector store strictly in input order, so a failed run
+    leaves a clean prefix behind.
+    """
+
+    def __init__(self, embeddings, vector_store, batch_size=None, max_concurrency=None,
+                 max_retries=None, backoff=1.0):
+        self.embeddings = embeddings
+        self.vector_store = vector_store
+        self.batch_size = batch_size or getattr(settings, 'AI_EMBEDDING_BATCH_SIZE', 100)
+        self.max_concurrency = max_concurrency or getattr(settings, 'AI_EMBEDDING_CONCURRENCY', 4)
+        self.max_retries = getattr(settings, 'AI_EMBEDDING_MAX_RETRIES', 3) if max_retries is None else max_retries
+        self.backoff = backoff
+
+    def run(self, documents, ids=None, before_write=None, after_write=None):
+        """
+        Embed and store `documents` (any iterable, consumed lazily).
+
+        `ids(document)` gives the vector store id; `before_write(batch)` and
+        `after_write(batch)` run around each ordered insert. Returns
+        {'documents', 'batches', 'seconds', 'docs_per_second'}.
+        """
+        started = time.perf_counter()
+        stats = {'documents': 0, 'batches': 0}
+        in_flight = deque()
+
+        def write(batch, vectors):
+            with metrics.INGEST_SECONDS.labels('write').time():
+                if before_write:
+                    before_write(batch)
+                self.vector_store.add_embeddings(
+                    texts=[document.page_content for document in batch],
+                    embeddings=vectors,
+                    metadatas=[document.metadata for document in batch],
+                    ids=[ids(document) for document in batch] if ids else None,
+                )
+                if after_write:
+                    after_write(batch)
+            stats['documents'] += len(batch)
+            stats['batches'] += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='embedding') as executor:
+            try:
+                for batch in self.batches(documents):
+                    in_flight.append((batch, executor.submit(self.embed_batch, batch)))
+                    # Keep at most max_concurrency requests outstanding, write the oldest first
+                    if len(in_flight) >= self.max_concurrency:
+                        batch, future = in_flight.popleft()
+                        write(batch, future.result())
+                while in_flight:
+                    batch, future = in_flight.popleft()
+                    write(batch, future.result())
+            except BaseException:
+                for _, future in in_flight:
+                    future.cancel()
+                raise
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['docs_per_second'] = stats['documents'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
+    def batches(self, documents):
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def embed_batch(self, batch):
+        texts = [document.page_content for document in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.INGEST_SECONDS.labels('embed').time():
+                    return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                metrics.EMBEDDING_RETRIES.inc()
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() / 10)
+                logger.warning(f"Embedding batch failed ({e}), retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
@@ -0,0 +1,51 @@
+# workorders/versioning.py
+"""
+Per-table change versions kept in the shared Django cache.
+
+A version is the time (in ns) of the table's last committed change. Every
+worker reads the same key, so bumping it after a write invalidates
+process-local copies everywhere. Tables are registered in workorders.signals;
+queryset.update() and bulk_create() bypass the signals and must call bump().
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'change-version:'
+
+
+def version_key(model):
+    return KEY_PREFIX + model._meta.label_lower
+
+
+def bump(model):
+    """Record a change to `model`'s table, returns the new version"""
+    version = time.time_ns()
+    cache.set(version_key(model), version, None)
+    return version
+
+
+def bump_on_commit(model, using=None):
+    # Readers reload rows as soon as they see a new version, so it must not be
+    # published before the write is visible to them
+    transaction.on_commit(lambda: bump(model), using=using)
+
+
+def get_version(model):
+    version = cache.get(version_key(model))
+    if version is None:
+        # Evicted or never written: start a fresh version so every worker reloads
+        cache.add(version_key(model), time.time_ns(), None)
+        version = cache.get(version_key(model))
+    return version
+
+
+def get_versions(models):
+    """Versions for several tables with a single cache round trip"""
+    keys = {version_key(model): model for model in models}
+    found = cache.get_many(keys.keys())
+    return {
+        model: found[key] if key in found else get_version(model)
+        for key, model in keys.items()
+    }
@@ -2,19 +2,28 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from langchain.chains import RetrievalQA
-from langchain.llms import OpenAI
 from ..utils.ai_utils import get_vector_store
+from ..utils.llm import get_executor, get_llm
 from rest_framework.permissions import IsAuthenticated
 from ..models import workorders, Equipment, Part, Type_of_Work, Work_Status, UserPrompt
 from accounts.models import Department
 from ..serializers import UserPromptSerializer 
+from ..reference import reference_data
+from .. import metrics, profiling, versioning
 from django.db.models import Q, Count, F
 from django.db import connection
+from django.http import StreamingHttpResponse
+from asgiref.sync import sync_to_async
+import asyncio
 import re
+import json
+import hashlib
 import logging
 from django.core.cache import cache
-from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -29,41 +38,66 @@ def is_pure_total_count_query(prompt):
     ]
     return any(re.search(pattern, prompt.lower()) for pattern in pure_total_patterns)
 
+@dataclass
+class AnswerJob:
+    """State handed from the SQL phase to the LLM phase"""
+    prompt_record: UserPrompt
+    cache_key: Optional[str]
+    cached: Optional[dict] = None
+    enhanced_prompt: str = ''
+    statistics: dict = field(default_factory=dict)
+    sources: list = field(default_factory=list)
+
+
 class AIAgentView(APIView):
     permission_classes = [IsAuthenticated]
-    
-    def __init__(self):
-        self.executor = ThreadPoolExecutor(max_workers=4)
-        self.llm = OpenAI(
-            temperature=0.2,
-            max_tokens=1000,
-            model="gpt-3.5-turbo-instruct"
-        )
-        self.query_templates = {
-            'count': "SELECT COUNT(*) FROM workorders_workorders wo JOIN workorders_equipment e ON wo.equipment_id = e.id JOIN workorders_location l ON e.location_id = l.id WHERE {conditions}",
-            'summary': """
-                SELECT 
-                    wo.id, 
-                    wo.problem, 
-                    wo.initiation_date,
-                    e.machine AS equipment, 
-                    p.name AS part,
-                    tow.type_of_work,
-                    ws.work_status,
-                    l.department_id AS department_id,
-                    d.department AS department_name
-                FROM workorders_workorders wo
-                LEFT JOIN workorders_equipment e ON wo.equipment_id = e.id
-                LEFT JOIN workorders_location l ON e.location_id = l.id
-                LEFT JOIN accounts_department d ON l.department_id = d.id
-                LEFT JOIN workorders_part p ON wo.part_id = p.id
-                LEFT JOIN workorders_type_of_work tow ON wo.type_of_work_id = tow.id
-                LEFT JOIN workorders_work_status ws ON wo.work_status_id = ws.id
-                WHERE {conditions}
-                ORDER BY wo.initiation_date DESC
-                LIMIT {limit}
-            """
-        }
+    answer_mode = 'complete'  # `mode` label of the AI phase metrics
+
+    # The LLM client and executor are process-wide (see utils.llm); nothing
+    # expensive is built per request.
+    query_templates = {
+        'count': "SELECT COUNT(*) FROM workorders_workorders wo JOIN workorders_equipment e ON wo.equipment_id = e.id JOIN workorders_location l ON e.location_id = l.id WHERE {conditions}",
+        'summary': """
+            SELECT 
+                wo.id, 
+                wo.problem, 
+                wo.initiation_date,
+                e.machine AS equipment, 
+                p.name AS part,
+                tow.type_of_work,
+                ws.work_status,
+                l.department_id AS department_id,
+                d.department AS department_name
+            FROM workorders_workorders wo
+            LEFT JOIN workorders_equipment e ON wo.equipment_id = e.id
+            LEFT JOIN workorders_location l ON e.location_id = l.id
+            LEFT JOIN accounts_department d ON l.department_id = d.id
+            LEFT JOIN workorders_part p ON wo.part_id = p.id
+            LEFT JOIN workorders_type_of_work tow ON wo.type_of_work_id = tow.id
+            LEFT JOIN workorders_work_status ws ON wo.work_status_id = ws.id
+            WHERE {conditions}
+            ORDER BY {ordering}
+            LIMIT {limit}
+        """
+    }
+
+    # How keywords are matched and ranked for the LLM context: 'ilike' (the
+    # default) is the unranked substring match ordered by date, 'fulltext'
+    # ranks the stored search_vector with ts_rank_cd, 'trigram' ranks by
+    # pg_trgm word similarity (needs the extension). Both ranked modes score
+    # every match before the LIMIT. None reads AI_RETRIEVAL_MODE.
+    retrieval_mode = None
+
+    @property
+    def llm(self):
+        return get_llm()
+
+    def get_retrieval_mode(self):
+        return self.retrieval_mode or getattr(settings, 'AI_RETRIEVAL_MODE', 'ilike')
+
+    def _keyword_tsquery(self, words):
+        # Any of the words may match; plainto_tsquery stems them and drops stopwords
+        return '(' + ' || '.join(["plainto_tsquery('english', %s)"] * len(words)) + ')'
 
     def _generate_sql_conditions(self, keyword, filters=None):
         """Generate SQL conditions with proper table references"""
@@ -73,11 +107,20 @@ class AIAgentView(APIView):
         # Keyword search
         if keyword:
             words = keyword.split()
-            word_conditions = []
-            for word in words:
-                word_conditions.append("wo.problem ILIKE %s")
-                params.append(f"%{word}%")
-            conditions.append(f"({' OR '.join(word_conditions)})")
+            mode = self.get_retrieval_mode()
+            if mode == 'fulltext':
+                conditions.append(f"wo.search_vector @@ {self._keyword_tsquery(words)}")
+                params.extend(words)
+            else:
+                word_conditions = []
+                for word in words:
+                    word_conditions.append("wo.problem ILIKE %s")
+                    params.append(f"%{word}%")
+                if mode == 'trigram':
+                    # Also catch misspellings and word variants close to the whole keyword
+                    word_conditions.append("%s <%% wo.problem")
+                    params.append(keyword)
+                conditions.append(f"({' OR '.join(word_conditions)})")
 
         # Date filters (exact match to frontend keys)
         filters = filters or {}
@@ -121,12 +164,26 @@ class AIAgentView(APIView):
 
         return " AND ".join(conditions) if conditions else "1=1", params
 
+    def _generate_sql_ordering(self, keyword):
+        """ORDER BY clause putting the most relevant work orders first"""
+        mode = self.get_retrieval_mode()
+        if keyword and mode == 'fulltext':
+            words = keyword.split()
+            return f"ts_rank_cd(wo.search_vector, {self._keyword_tsquery(words)}) DESC, wo.initiation_date DESC", words
+        if keyword and mode == 'trigram':
+            return "word_similarity(%s, wo.problem) DESC, wo.initiation_date DESC", [keyword]
+        return "wo.initiation_date DESC", []
+
     def execute_sql_query(self, query_type, keyword=None, filters=None, limit=75):
         """Execute optimized SQL queries directly"""
         conditions, params = self._generate_sql_conditions(keyword, filters)
+        ordering, ordering_params = self._generate_sql_ordering(keyword)
+        if query_type != 'count':
+            params = params + ordering_params
         
         query = self.query_templates[query_type].format(
             conditions=conditions,
+            ordering=ordering,
             limit=limit
         )
         
@@ -182,7 +239,30 @@ class AIAgentView(APIView):
         return keyword, time_frame
 
     def post(self, request):
-        print("Request data:", request.data)
+        error = self.validate_input(request)
+        if error is not None:
+            return error
+
+        try:
+            job = self.prepare_answer(request)
+            if job.cached is not None:
+                return Response(job.cached)
+
+            # Get LLM response on the shared pool so a hung completion cannot hold the worker forever
+            with profiling.timed('llm'), metrics.AI_PHASE_SECONDS.labels('llm', self.answer_mode).time():
+                result = get_executor().submit(self.llm.complete, job.enhanced_prompt).result(
+                    timeout=getattr(settings, 'AI_LLM_TIMEOUT', 60)
+                )
+            return Response(self.finish_answer(job, result))
+            
+        except Exception as e:
+            logger.error(f"AI Agent Error: {str(e)}", exc_info=True)
+            return Response({
+                "error": "Processing error",
+                "detail": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def validate_input(self, request):
         prompt = request.data.get('prompt', '')  # Default to empty string
         filters = request.data.get('filters', {})
 
@@ -192,130 +272,181 @@ class AIAgentView(APIView):
                 {"error": "Either a prompt or at least one filter is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return None
 
-        try:
-            # Debug logging
-            logger.info(
-                "Processing request with filters:\n"
-                f"dateFrom: {filters.get('dateFrom')}\n"
-                f"dateTo: {filters.get('dateTo')}\n"
-                f"department: {filters.get('department')}\n"
-                f"equipment: {filters.get('equipment')}\n"
-                f"typeOfWork: {filters.get('typeOfWork')}\n"
-                f"workStatus: {filters.get('workStatus')}"
-            )
+    def prepare_answer(self, request):
+        """Everything before the LLM call: prompt record, answer cache lookup and the SQL phase"""
+        prompt = request.data.get('prompt', '')  # Default to empty string
+        filters = request.data.get('filters', {})
 
-            # Save prompt with filters (even if prompt is empty)
-            prompt_record = UserPrompt.objects.create(
-                user=request.user,
-                prompt=prompt,
-                metadata={
-                    'filters': filters,
-                    'filter_details': {
-                        'date_range': f"{filters.get('dateFrom')} to {filters.get('dateTo')}",
-                        'department': filters.get('department'),
-                        'equipment': filters.get('equipment'),
-                        'work_type': filters.get('typeOfWork'),
-                        'work_status': filters.get('workStatus')
-                    }
-                }
-            )
+        # Debug logging
+        logger.info(
+            "Processing request with filters:\n"
+            f"dateFrom: {filters.get('dateFrom')}\n"
+            f"dateTo: {filters.get('dateTo')}\n"
+            f"department: {filters.get('department')}\n"
+            f"equipment: {filters.get('equipment')}\n"
+            f"typeOfWork: {filters.get('typeOfWork')}\n"
+            f"workStatus: {filters.get('workStatus')}"
+        )
 
-            # Process filters
-            keyword = self.extract_keywords(prompt) if prompt else None
-            conditions, params = self._generate_sql_conditions(keyword, filters)
-            
+        # Answers are cached per normalized question + filters + data generation
+        keyword = self.extract_keywords(prompt) if prompt else None
+        cache_key = self._answer_cache_key(prompt, keyword, filters)
+        cached = cache.get(cache_key) if cache_key else None
+        if cache_key:
+            metrics.cache_lookup('ai_answer', cached is not None)
+
+        # Save prompt with filters (even if prompt is empty)
+        prompt_record = UserPrompt.objects.create(
+            user=request.user,
+            prompt=prompt,
+            response=cached['answer'] if cached else None,
+            metadata={
+                'filters': filters,
+                'filter_details': {
+                    'date_range': f"{filters.get('dateFrom')} to {filters.get('dateTo')}",
+                    'department': filters.get('department'),
+                    'equipment': filters.get('equipment'),
+                    'work_type': filters.get('typeOfWork'),
+                    'work_status': filters.get('workStatus')
+                },
+                'cache_hit': cached is not None
+            }
+        )
+        if cached is not None:
+            return AnswerJob(prompt_record, cache_key, cached)
+
+        # Process filters
+        conditions, params = self._generate_sql_conditions(keyword, filters)
+        
+        with metrics.AI_PHASE_SECONDS.labels('sql', self.answer_mode).time():
             exact_count = self.execute_sql_query('count', keyword=keyword, filters=filters)
             sql_results = self.execute_sql_query('summary', keyword=keyword, filters=filters)
-            
-            # Prepare context
-            context = "\n".join(
-                f"WO#{res['id']} | {res['initiation_date'].strftime('%Y-%m-%d')} | "
-                f"Department: {res.get('department_name', 'N/A')} | "
-                f"Equipment: {res['equipment']} | "
-                f"Problem: {res['problem'][:200]}"
-                for res in sql_results
-            ) if sql_results else "No matching work orders found"
-
-            # Build filter description
-            filter_description = self._build_filter_description(filters)
-            
-            # Enhanced prompt - different behavior when no prompt is provided
-            if prompt:
-                enhanced_prompt = f"""
-                Analyze work orders regarding '{self.extract_keywords(prompt) or 'the query'}'{filter_description}:
-
-                Statistics:
-                - Total matching orders: {exact_count or len(sql_results)}
-                - Date range: {self._get_date_range_description(filters)}
-
-                Work Order Samples:
-                {context}
-                """ + ("""
-                Provide analysis focusing on:
-                1. Most common problem patterns
-                2. Equipment/parts involved
-                3. Frequency trends
-                4. Recommended maintenance actions
-                """ if sql_results else """
-                Since no matching work orders were found, please:
-                1. Suggest why there might be no records
-                2. Recommend alternative search terms
-                3. Provide general maintenance advice
-                """) + f"\nOriginal question: {prompt}"
-            else:
-                # When no prompt is provided, generate a general analysis of the filtered data
-                enhanced_prompt = f"""
-                Analyze these filtered work orders{filter_description}:
-
-                Statistics:
-                - Total matching orders: {exact_count or len(sql_results)}
-                - Date range: {self._get_date_range_description(filters)}
-
-                Work Order Samples:
-                {context}
-
-                Provide a comprehensive analysis including:
-                1. Breakdown of work order statuses
-                2. Most common problems
-                3. Frequency and patterns of issues
-                4. Equipment maintenance insights
-                5. Any notable trends or patterns
-                """ + ("""
-                """ if sql_results else """
-                Since no matching work orders were found, please:
-                1. Suggest why there might be no records
-                2. Recommend alternative filters
-                3. Provide general maintenance advice for this equipment/department
-                """)
-            
-            # Get LLM response
-            result = self.llm(enhanced_prompt)
-            prompt_record.response = result
-            prompt_record.save()
+        
+        # Prepare context
+        context = "\n".join(
+            f"WO#{res['id']} | {res['initiation_date'].strftime('%Y-%m-%d')} | "
+            f"Department: {res.get('department_name', 'N/A')} | "
+            f"Equipment: {res['equipment']} | "
+            f"Problem: {res['problem'][:200]}"
+            for res in sql_results
+        ) if sql_results else "No matching work orders found"
 
-            return Response({
-                "answer": result,
-                "statistics": {
-                    "exact_count": exact_count or len(sql_results),
-                    "analyzed_samples": len(sql_results)
-                },
-                "sources": [
-                    {
-                        "work_order_id": res['id'],
-                        "department": res.get('department_name', 'N/A'),
-                        "equipment": res['equipment'],
-                        "problem": res['problem'][:100]
-                    } for res in sql_results
-                ] if sql_results else []
-            })
-            
-        except Exception as e:
-            logger.error(f"AI Agent Error: {str(e)}", exc_info=True)
-            return Response({
-                "error": "Processing error",
-                "detail": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Build filter description
+        filter_description = self._build_filter_description(filters)
+        
+        # Enhanced prompt - different behavior when no prompt is provided
+        if prompt:
+            enhanced_prompt = f"""
+            Analyze work orders regarding '{self.extract_keywords(prompt) or 'the query'}'{filter_description}:
+
+            Statistics:
+            - Total matching orders: {exact_count or len(sql_results)}
+            - Date range: {self._get_date_range_description(filters)}
+
+            Work Order Samples:
+            {context}
+            """ + ("""
+            Provide analysis focusing on:
+            1. Most common problem patterns
+            2. Equipment/parts involved
+            3. Frequency trends
+            4. Recommended maintenance actions
+            """ if sql_results else """
+            Since no matching work orders were found, please:
+            1. Suggest why there might be no records
+            2. Recommend alternative search terms
+            3. Provide general maintenance advice
+            """) + f"\nOriginal question: {prompt}"
+        else:
+            # When no prompt is provided, generate a general analysis of the filtered data
+            enhanced_prompt = f"""
+            Analyze these filtered work orders{filter_description}:
+
+            Statistics:
+            - Total matching orders: {exact_count or len(sql_results)}
+            - Date range: {self._get_date_range_description(filters)}
+
+            Work Order Samples:
+            {context}
+
+            Provide a comprehensive analysis including:
+            1. Breakdown of work order statuses
+            2. Most common problems
+            3. Frequency and patterns of issues
+            4. Equipment maintenance insights
+            5. Any notable trends or patterns
+            """ + ("""
+            """ if sql_results else """
+            Since no matching work orders were found, please:
+            1. Suggest why there might be no records
+            2. Recommend alternative filters
+            3. Provide general maintenance advice for this equipment/department
+            """)
+
+        return AnswerJob(
+            prompt_record,
+            cache_key,
+            enhanced_prompt=enhanced_prompt,
+            statistics={
+                "exact_count": exact_count or len(sql_results),
+                "analyzed_samples": len(sql_results)
+            },
+            sources=[
+                {
+                    "work_order_id": res['id'],
+                    "department": res.get('department_name', 'N/A'),
+                    "equipment": res['equipment'],
+                    "problem": res['problem'][:100]
+                } for res in sql_results
+            ] if sql_results else []
+        )
+
+    def finish_answer(self, job, answer):
+        """Persist the answer and cache the response payload"""
+        job.prompt_record.response = answer
+        job.prompt_record.save()
+
+        payload = {
+            "answer": answer,
+            "statistics": job.statistics,
+            "sources": job.sources
+        }
+        if job.cache_key:
+            cache.set(job.cache_key, payload, settings.AI_ANSWER_CACHE_TTL)
+        return payload
+
+    def save_aborted_answer(self, job, answer):
+        """Persist the part of an answer streamed before the client left, marked aborted and not cached"""
+        job.prompt_record.response = answer
+        job.prompt_record.metadata = {**job.prompt_record.metadata, 'aborted': True}
+        job.prompt_record.save(update_fields=['response', 'metadata'])
+
+    def _answer_cache_key(self, prompt, keyword, filters):
+        """Cache key for an answer, None when answer caching is disabled"""
+        if not getattr(settings, 'AI_ANSWER_CACHE_TTL', 0):
+            return None
+
+        # The LLM sees the whole question, not only its keywords: questions
+        # differing beyond case, spacing and punctuation get their own answers
+        normalized_prompt = ' '.join(re.sub(r'[^\w\s]', '', (prompt or '').lower()).split())
+
+        canonical_filters = {
+            key: str(value).strip() for key, value in sorted(filters.items())
+            if value not in (None, '')
+        }
+        # Any committed workorder/equipment change moves the generation and retires old answers
+        generation = versioning.get_versions([workorders, Equipment])
+        raw = json.dumps({
+            'keyword': ' '.join((keyword or '').split()),
+            'prompt': hashlib.sha256(normalized_prompt.encode('utf-8')).hexdigest(),
+            'filters': canonical_filters,
+            'generation': sorted(generation.values()),
+            'llm': [getattr(settings, 'AI_LLM_BACKEND', ''), getattr(settings, 'AI_LLM_MODEL', '')],
+            'retrieval': self.get_retrieval_mode(),
+        }, sort_keys=True)
+        return 'ai-answer:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
 
     def _build_filter_description(self, filters):
         """Helper to build human-readable filter description"""
@@ -324,7 +455,7 @@ class AIAgentView(APIView):
         
         parts = []
         if filters.get('department'):
-            dept = Department.objects.filter(id=filters['department']).first()
+            dept = reference_data.get(Department, filters['department'])
             parts.append(f"department: {dept.department if dept else filters['department']}")
         
         if filters.get('equipment'):
@@ -332,11 +463,11 @@ class AIAgentView(APIView):
             parts.append(f"equipment: {eq.machine if eq else filters['equipment']}")
         
         if filters.get('typeOfWork'):
-            tow = Type_of_Work.objects.filter(id=filters['typeOfWork']).first()
+            tow = reference_data.get(Type_of_Work, filters['typeOfWork'])
             parts.append(f"type of work: {tow.type_of_work if tow else filters['typeOfWork']}")
         
         if filters.get('workStatus'):
-            ws = Work_Status.objects.filter(id=filters['workStatus']).first()
+            ws = reference_data.get(Work_Status, filters['workStatus'])
             parts.append(f"status: {ws.work_status if ws else filters['workStatus']}")
         
         return f"\n\nApplied Filters: {', '.join(parts)}" if parts else ""
@@ -351,4 +482,82 @@ class AIAgentView(APIView):
             dates.append(f"from {filters['dateFrom']}")
         if filters.get('dateTo'):
             dates.append(f"until {filters['dateTo']}")
-        return ' '.join(dates)
\ No newline at end of file
+        return ' '.join(dates)
+
+
+def sse_event(event, data):
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class AIAgentStreamView(AIAgentView):
+    """
+    Same pipeline as AIAgentView, answered as Server-Sent Events: a `meta`
+    event with statistics and sources right after the SQL phase, one `token`
+    event per LLM chunk, then `done` once the answer is saved. Tokens are only
+    flushed as they arrive when served through proj/asgi.py; under WSGI Django
+    buffers the whole stream.
+    """
+    answer_mode = 'stream'
+
+    def post(self, request):
+        error = self.validate_input(request)
+        if error is not None:
+            return error
+
+        try:
+            job = self.prepare_answer(request)
+        except Exception as e:
+            logger.error(f"AI Agent Error: {str(e)}", exc_info=True)
+            return Response({
+                "error": "Processing error",
+                "detail": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        response = StreamingHttpResponse(self.event_stream(job), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+    async def event_stream(self, job):
+        yield sse_event('meta', {
+            "prompt_id": job.prompt_record.id,
+            "statistics": job.cached["statistics"] if job.cached else job.statistics,
+            "sources": job.cached["sources"] if job.cached else job.sources,
+            "cached": job.cached is not None
+        })
+
+        if job.cached is not None:
+            yield sse_event('token', {"text": job.cached["answer"]})
+            yield sse_event('done', {"prompt_id": job.prompt_record.id})
+            return
+
+        # The backend stream is synchronous: pull each chunk on the shared pool
+        loop = asyncio.get_running_loop()
+        chunks = iter(self.llm.stream(job.enhanced_prompt))
+        finished = object()
+        parts = []
+        saved = False
+        try:
+            try:
+                with metrics.AI_PHASE_SECONDS.labels('llm', self.answer_mode).time():
+                    while True:
+                        chunk = await loop.run_in_executor(get_executor(), next, chunks, finished)
+                        if chunk is finished:
+                            break
+                        parts.append(chunk)
+                        yield sse_event('token', {"text": chunk})
+            except Exception as e:
+                saved = True  # The backend failed, there is no answer to keep
+                logger.error(f"AI Agent stream error: {str(e)}", exc_info=True)
+                yield sse_event('error', {"error": "Processing error", "detail": str(e)})
+                return
+
+            await sync_to_async(self.finish_answer)(job, ''.join(parts))
+            saved = True
+            yield sse_event('done', {"prompt_id": job.prompt_record.id})
+        finally:
+            if not saved:
+                # The client went away mid-answer (CancelledError / GeneratorExit):
+                # keep the tokens already paid for, even if cancelled again
+                await asyncio.shield(sync_to_async(self.save_aborted_answer)(job, ''.join(parts)))
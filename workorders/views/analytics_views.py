@@ -1,17 +1,64 @@
 # views.py
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from ..models import workorders
-from django.db.models import Q, Count, F, Avg
-from collections import defaultdict
+from rest_framework.exceptions import ValidationError
+from ..models import workorders, WorkOrderDailyStat
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Count, F, Avg, Sum
+from django.db.models.functions import Trunc
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
-from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 
-class LocationAnalyticsView(APIView):
+class RollupSourceMixin:
+    """
+    Analytics read the WorkOrderDailyStat rollup unless ?source=live is passed
+    (or ANALYTICS_USE_ROLLUP is False), which aggregates the raw workorders.
+    The rollup has day granularity, so date filters match whole days.
+    """
+
+    def use_rollup(self, request):
+        if request.query_params.get('source') == 'live':
+            return False
+        return getattr(settings, 'ANALYTICS_USE_ROLLUP', True)
+
+    def filter_rollup(self, request):
+        queryset = WorkOrderDailyStat.objects.filter(count__gt=0)
+
+        date_from = self.parse_day(request.query_params.get('date_from'), 'date_from')
+        date_to = self.parse_day(request.query_params.get('date_to'), 'date_to')
+        department = request.query_params.get('department')
+
+        if date_from:
+            queryset = queryset.filter(day__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(day__lte=date_to)
+        if department:
+            queryset = queryset.filter(department__department=department)
+        return queryset
+
+    @staticmethod
+    def parse_day(value, name):
+        if not value:
+            return None
+        moment = parse_datetime(value)
+        if moment is not None:
+            return timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: 'Expected a date (YYYY-MM-DD) or ISO datetime'})
+        return day
+
+
+class LocationAnalyticsView(RollupSourceMixin, APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        if self.use_rollup(request):
+            return self.get_from_rollup(request)
+
         # Get filters from query params
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
@@ -50,11 +97,36 @@ class LocationAnalyticsView(APIView):
             'total': queryset.count()
         })
 
+    def get_from_rollup(self, request):
+        location_data = self.filter_rollup(request).values(
+            'department__department',
+            'location__area'
+        ).annotate(
+            total=Sum('count')
+        ).order_by('-total')
+
+        results = [
+            {
+                'department': item['department__department'] or 'Unknown',
+                'area': item['location__area'] or 'Unknown',
+                'count': item['total']
+            }
+            for item in location_data
+        ]
 
-class EquipmentTypeAnalyticsView(APIView):
+        return Response({
+            'results': results,
+            'total': sum(item['count'] for item in results)
+        })
+
+
+class EquipmentTypeAnalyticsView(RollupSourceMixin, APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        if self.use_rollup(request):
+            return self.get_from_rollup(request)
+
         queryset = workorders.objects.all()
         
         # Apply filters (same pattern as LocationAnalytics)
@@ -88,79 +160,160 @@ class EquipmentTypeAnalyticsView(APIView):
         
         return Response({'results': results})
 
+    def get_from_rollup(self, request):
+        equipment_data = self.filter_rollup(request).values(
+            'machine_type__machine_type'
+        ).annotate(
+            total=Sum('count'),
+            seconds=Sum('repair_seconds')
+        ).order_by('-total')
+
+        results = [
+            {
+                'equipment_type': item['machine_type__machine_type'] or 'Unknown',
+                'count': item['total'],
+                'avg_completion_hours': item['seconds'] / item['total'] / 3600
+                    if item['total'] and item['seconds'] is not None else None
+            }
+            for item in equipment_data
+        ]
+
+        return Response({'results': results})
 
-class StatusTrendView(APIView):
+
+class StatusTrendView(RollupSourceMixin, APIView):
     permission_classes = [IsAuthenticated]
-    
+
+    statuses = ['Pending', 'In_Process', 'Completed', 'Rejected', 'Closed']
+    date_formats = {
+        'day': '%Y-%m-%d',
+        'week': '%Y-%W',
+        'month': '%Y-%m',
+    }
+
     def get(self, request):
         # Get timeframe (default: 30 days)
         timeframe = int(request.query_params.get('timeframe', 30))
         group_by = request.query_params.get('group_by', 'week')  # day/week/month
-        
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=timeframe)
-        
-        # Generate date bins
-        if group_by == 'day':
-            date_format = '%Y-%m-%d'
-            delta = timedelta(days=1)
-        elif group_by == 'month':
-            date_format = '%Y-%m'
-            delta = timedelta(days=30)
-        else:  # week
-            date_format = '%Y-%W'
-            delta = timedelta(weeks=1)
-        
-        # Initialize result structure
-        statuses = ['Pending', 'In_Process', 'Completed', 'Rejected', 'Closed']
-        dates = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            dates.append(current_date.strftime(date_format))
-            current_date += delta
-        
-        # Query data
-        results = []
-        for status in statuses:
-            status_data = []
-            for date_str in dates:
-                if group_by == 'day':
-                    date_filter = Q(initiation_date__date=datetime.strptime(date_str, date_format).date())
-                elif group_by == 'week':
-                    year, week = map(int, date_str.split('-'))
-                    date_filter = Q(initiation_date__year=year, initiation_date__week=week)
-                else:  # month
-                    year, month = map(int, date_str.split('-'))
-                    date_filter = Q(initiation_date__year=year, initiation_date__month=month)
-                
-                count = workorders.objects.filter(
-                    date_filter &
-                    Q(work_status__work_status=status)
-                ).count()
-                
-                status_data.append(count)
-            
-            results.append({
-                'status': status,
-                'data': status_data
-            })
-        
+        if group_by not in self.date_formats:
+            group_by = 'week'
+
+        end_date = timezone.localtime()
+        buckets = self.bucket_starts(end_date - timedelta(days=timeframe), end_date, group_by)
+        range_start = timezone.make_aware(datetime.combine(buckets[0], time.min))
+
+        # One grouped query: date_trunc(bucket) x status -> count
+        if self.use_rollup(request):
+            rows = (
+                WorkOrderDailyStat.objects
+                .filter(
+                    day__gte=buckets[0],
+                    day__lte=end_date.date(),
+                    work_status__work_status__in=self.statuses,
+                )
+                .annotate(bucket=Trunc('day', group_by))
+                .values('bucket', 'work_status__work_status')
+                .annotate(count=Sum('count'))
+                .order_by()
+            )
+        else:
+            rows = (
+                workorders.objects
+                .filter(
+                    initiation_date__gte=range_start,
+                    initiation_date__lte=end_date,
+                    work_status__work_status__in=self.statuses,
+                )
+                .annotate(bucket=Trunc('initiation_date', group_by))
+                .values('bucket', 'work_status__work_status')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+
+        # Zero-filled status x bucket grid, filled in a single pass
+        index = {bucket: i for i, bucket in enumerate(buckets)}
+        counts = {status: [0] * len(buckets) for status in self.statuses}
+        for row in rows:
+            bucket = row['bucket']
+            if isinstance(bucket, datetime):
+                bucket = timezone.localtime(bucket).date()
+            position = index.get(bucket)
+            if position is not None:
+                counts[row['work_status__work_status']][position] += row['count']
+
+        date_format = self.date_formats[group_by]
         return Response({
             'timeframe': timeframe,
             'group_by': group_by,
-            'dates': dates,
-            'results': results
+            'dates': [bucket.strftime(date_format) for bucket in buckets],
+            'results': [{'status': status, 'data': counts[status]} for status in self.statuses]
         })
 
+    @staticmethod
+    def bucket_starts(start, end, group_by):
+        """First day of every day/week/month bucket between start and end (inclusive)"""
+        current, last = start.date(), end.date()
+        if group_by == 'week':
+            current -= timedelta(days=current.weekday())
+        elif group_by == 'month':
+            current = current.replace(day=1)
+
+        buckets = []
+        while current <= last:
+            buckets.append(current)
+            if group_by == 'month':
+                current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+            else:
+                current += timedelta(days=7 if group_by == 'week' else 1)
+        return buckets
+
 
 class EquipmentFaultAnalysisView(APIView):
     permission_classes = [IsAuthenticated]
+
+    candidate_limit = 5
+
+    # Failure intervals per equipment via LAG(), aggregated and ranked in SQL so
+    # only the top candidates (with machine names joined) leave the database.
+    predictive_query = """
+        WITH failures AS (
+            SELECT
+                wo.equipment_id,
+                wo.initiation_date,
+                FLOOR(EXTRACT(EPOCH FROM wo.initiation_date - LAG(wo.initiation_date) OVER (
+                    PARTITION BY wo.equipment_id ORDER BY wo.initiation_date
+                )) / 86400) AS interval_days
+            FROM workorders_workorders wo
+            WHERE wo.initiation_date >= %(since)s
+        ),
+        predictions AS (
+            SELECT
+                equipment_id,
+                MAX(initiation_date) AS last_failure,
+                AVG(interval_days) AS avg_interval_days,
+                MAX(initiation_date) + AVG(interval_days) * INTERVAL '1 day' AS next_predicted
+            FROM failures
+            GROUP BY equipment_id
+            HAVING COUNT(interval_days) > 0
+        )
+        SELECT
+            p.equipment_id,
+            e.machine AS equipment_name,
+            p.last_failure,
+            p.avg_interval_days,
+            FLOOR(EXTRACT(EPOCH FROM %(now)s - p.next_predicted) / 86400) AS days_overdue
+        FROM predictions p
+        JOIN workorders_equipment e ON e.id = p.equipment_id
+        WHERE p.next_predicted - INTERVAL '7 days' < %(now)s
+        ORDER BY days_overdue DESC, p.equipment_id
+        LIMIT %(limit)s
+    """
     
     def get(self, request):
         # Use Django's timezone-aware now()
-        recent_threshold = timezone.now() - timedelta(days=90)
-        predictive_threshold = timezone.now() - timedelta(days=365)
+        now = timezone.now()
+        recent_threshold = now - timedelta(days=90)
+        predictive_threshold = now - timedelta(days=365)
         
         # Current fault analysis (unchanged)
         fault_analysis = (
@@ -173,52 +326,28 @@ class EquipmentFaultAnalysisView(APIView):
                 )
             .order_by('-fault_count')[:10]
         )
-        
-        # Predictive analysis with timezone fixes
-        equipment_intervals = defaultdict(list)
-        predictive_candidates = []
-        
-        historical_data = (
-            workorders.objects
-            .filter(initiation_date__gte=predictive_threshold)
-            .values('equipment_id', 'equipment__machine', 'initiation_date')
-            .order_by('equipment_id', 'initiation_date')
-        )
-        
-        for wo in historical_data:
-            # Ensure we're working with timezone-aware datetimes
-            aware_date = timezone.make_aware(
-                wo['initiation_date'],
-                timezone.get_current_timezone()
-            ) if timezone.is_naive(wo['initiation_date']) else wo['initiation_date']
-            equipment_intervals[wo['equipment_id']].append(aware_date)
-        
-        for equip_id, dates in equipment_intervals.items():
-            if len(dates) > 1:
-                intervals = [(dates[i+1] - dates[i]).days for i in range(len(dates)-1)]
-                avg_interval = sum(intervals) / len(intervals)
-                last_failure = dates[-1]
-                next_predicted = last_failure + timedelta(days=avg_interval)
-                
-                # Compare timezone-aware datetimes
-                if timezone.now() > next_predicted - timedelta(days=7):
-                    days_overdue = (timezone.now() - next_predicted).days
-                    predictive_candidates.append({
-                        'equipment_id': equip_id,
-                        'equipment_name': historical_data.filter(equipment_id=equip_id)[0]['equipment__machine'],
-                        'last_failure': last_failure,
-                        'avg_interval_days': round(avg_interval),
-                        'days_overdue': days_overdue
-                    })
-        
-        # Convert datetimes to strings for JSON serialization
-        serialized_candidates = []
-        for candidate in predictive_candidates:
-            serialized = candidate.copy()
-            serialized['last_failure'] = candidate['last_failure'].isoformat()
-            serialized_candidates.append(serialized)
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.predictive_query, {
+                'since': predictive_threshold,
+                'now': now,
+                'limit': self.candidate_limit,
+            })
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        predictive_candidates = [
+            {
+                'equipment_id': row['equipment_id'],
+                'equipment_name': row['equipment_name'],
+                'last_failure': row['last_failure'].isoformat(),
+                'avg_interval_days': round(row['avg_interval_days']),
+                'days_overdue': int(row['days_overdue'])
+            }
+            for row in rows
+        ]
         
         return Response({
             'fault_analysis': fault_analysis,
-            'predictive_candidates': sorted(serialized_candidates, key=lambda x: x['days_overdue'], reverse=True)[:5]
-        })
\ No newline at end of file
+            'predictive_candidates': predictive_candidates
+        })
@@ -1,5 +1,6 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from rest_framework import status
@@ -13,57 +14,120 @@ from ..serializers import (
     LocationSerializer, MachineTypeSerializer, PartTypeSerializer,
     TypeOfWorkSerializer, WorkStatusSerializer, PendingSerializer,
     ClosedSerializer, EquipmentSerializer, PartSerializer, WorkOrderSerializer, 
-    WorkOrderHistorySerializer, WorkOrderCreateSerializer, WorkOrderSerializer, UserPromptSerializer
+    WorkOrderHistorySerializer, WorkOrderCreateSerializer, WorkOrderSerializer, UserPromptSerializer,
+    WorkOrderSearchSerializer, WorkOrderBulkRowSerializer, BulkTransitionSerializer,
+    BulkAcceptSerializer, BulkCloseSerializer, HistoryAsOfSerializer
 )
-from django.db.models import Q
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import F, FloatField, Model, Q, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Concat
 from django.utils import timezone
 from rest_framework.pagination import LimitOffsetPagination
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from accounts.models import Department
+from .. import history, metrics, rollups, versioning
+import hashlib
+from ..parsers import CSVParser
+from ..renderers import CSVRenderer, NDJSONRenderer, buffered
+from ..pagination import WorkOrderCursorPagination, WorkOrderSearchPagination
+from ..reference import reference_data
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for list and retrieve, derived from the change versions
+    of every table the serializer reads. A matching If-None-Match (or
+    If-Modified-Since) is answered with 304 before the queryset is touched.
+    """
+    version_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        versions = versioning.get_versions(self.version_models)
+        fingerprint = '|'.join(
+            [self.__class__.__name__, request.get_full_path()] +
+            [f"{model._meta.label_lower}={version}" for model, version in versions.items()]
+        )
+        etag = quote_etag(hashlib.md5(fingerprint.encode('utf-8')).hexdigest())
+        last_modified = max(versions.values()) // 10**9 if versions else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        metrics.cache_lookup('conditional_get', response is not None)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Let browsers keep the copy but revalidate it on every use
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
-class LocationViewSet(viewsets.ModelViewSet):
-    queryset = Location.objects.all()
+class LocationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Location.objects.all().select_related('department')
     serializer_class = LocationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Location, Department)
 
-class MachineTypeViewSet(viewsets.ModelViewSet):
+class MachineTypeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Machine_Type.objects.all()
     serializer_class = MachineTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Machine_Type,)
 
-class PartTypeViewSet(viewsets.ModelViewSet):
+class PartTypeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Part_Type.objects.all()
     serializer_class = PartTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Part_Type,)
 
-class TypeOfWorkViewSet(viewsets.ModelViewSet):
+class TypeOfWorkViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Type_of_Work.objects.all()
     serializer_class = TypeOfWorkSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Type_of_Work,)
 
-class WorkStatusViewSet(viewsets.ModelViewSet):
+class WorkStatusViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Work_Status.objects.all()
     serializer_class = WorkStatusSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Work_Status,)
 
-class PendingViewSet(viewsets.ModelViewSet):
+class PendingViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Pending.objects.all()
     serializer_class = PendingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Pending,)
 
-class ClosedViewSet(viewsets.ModelViewSet):
+class ClosedViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Closed.objects.all()
     serializer_class = ClosedSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Closed,)
 
 class EquipmentPagination(LimitOffsetPagination):
     default_limit = 1000  # Set a higher default limit
     max_limit = 1000     # Set a safe maximum limit
 
-class EquipmentViewSet(viewsets.ModelViewSet):
-    queryset = Equipment.objects.all().select_related('machine_type', 'location')
+class EquipmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Equipment.objects.all().select_related('machine_type', 'location__department')
     serializer_class = EquipmentSerializer
     pagination_class = EquipmentPagination
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Equipment, Machine_Type, Location, Department)
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -82,10 +146,17 @@ class AnalyticsViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = EquipmentPagination
 
-class PartViewSet(viewsets.ModelViewSet):
-    queryset = Part.objects.all()
+    def get_queryset(self):
+        # Same related rows as the WorkOrderViewSet list, prefetched per page
+        return super().get_queryset().prefetch_related(*WorkOrderViewSet.serializer_prefetch)
+
+class PartViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Part.objects.all().select_related(
+        'part_type', 'equipment__machine_type', 'equipment__location__department'
+    )
     serializer_class = PartSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (Part, Part_Type, Equipment, Machine_Type, Location, Department)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -123,22 +194,71 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = WorkOrderFilter
+
+    # Everything WorkOrderSerializer walks through. Lists prefetch it: Postgres
+    # spends longer planning the 13-table join than running it for a page.
+    # Single-object routes join it, one row is still cheaper than 10 lookups.
+    serializer_prefetch = [
+        'initiated_by', 'type_of_work', 'closed', 'work_status', 'pending',
+        'equipment__machine_type', 'equipment__location__department',
+        'part__part_type', 'part__equipment__machine_type', 'part__equipment__location__department',
+    ]
+
+    bulk_max_rows = 1000
+
+    # Export column -> values() lookup. Flat, so no serializer or model instances per row
+    export_columns = {
+        'id': 'id',
+        'initiation_date': 'initiation_date',
+        'department': 'department',
+        'problem': 'problem',
+        'initiated_by': 'initiated_by__username',
+        'equipment': 'equipment_name',
+        'location': 'equipment__location__area',
+        'part': 'part__name',
+        'type_of_work': 'type_of_work__type_of_work',
+        'work_status': 'work_status__work_status',
+        'pending': 'pending__pending',
+        'accepted': 'accepted',
+        'assigned_to': 'assigned_to',
+        'target_date': 'target_date',
+        'remarks': 'remarks',
+        'replaced_part': 'replaced_part',
+        'completion_date': 'completion_date',
+        'closed': 'closed__closed',
+        'closing_remarks': 'closing_remarks',
+        'pr_number': 'pr_number',
+        'pr_date': 'pr_date',
+    }
+    export_chunk_size = 2000
+
+    @property
+    def paginator(self):
+        # ?cursor=... / ?pagination=cursor switches to keyset paging, otherwise page numbers
+        if not hasattr(self, '_paginator'):
+            if self.action == 'search':
+                # Search always pages by keyset: by relevance, or newest first with ?order=recent
+                recent = self.request.query_params.get('order') == 'recent'
+                self._paginator = WorkOrderCursorPagination() if recent else WorkOrderSearchPagination()
+            elif self.request is not None and WorkOrderCursorPagination.is_requested(self.request):
+                self._paginator = WorkOrderCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
     
     def get_serializer_class(self):
         if self.action == 'create':
             return WorkOrderCreateSerializer
         return WorkOrderSerializer
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        user = self.request.user
-        
+    @staticmethod
+    def scope_to_user(queryset, user):
+        """The work orders `user`'s role may see, also used for their history"""
         if not hasattr(user, 'profile'):
             return queryset.none()
         
-        # Apply permission-based filtering first
         if user.profile.is_manager:
-            queryset = queryset
+            return queryset
         elif user.profile.is_utilities:
             user_dept = user.profile.department.department
             dept_mapping = {
@@ -147,16 +267,24 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
             }
             
             if user_dept in dept_mapping:
-                queryset = queryset.filter(
+                return queryset.filter(
                     department=dept_mapping[user_dept],
                     work_status__work_status__in=['Pending', 'In_Process', 'Completed']
                 )
-            else:
-                return queryset.none()
-        elif user.profile.is_production:
-            queryset = queryset.filter(Q(initiated_by=user))
-        else:
             return queryset.none()
+        elif user.profile.is_production:
+            return queryset.filter(Q(initiated_by=user))
+        return queryset.none()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.detail:
+            queryset = queryset.select_related(*self.serializer_prefetch)
+        elif self.action == 'list':
+            queryset = queryset.prefetch_related(*self.serializer_prefetch)
+        
+        # Apply permission-based filtering first
+        queryset = self.scope_to_user(queryset, self.request.user)
 
         # Now apply the requested filters
         work_status = self.request.query_params.get('work_status')
@@ -175,6 +303,240 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Ranked full-text search over problem, equipment, remarks, closing
+        remarks and assignee, scoped like the list. ?q= takes web search
+        syntax ("quoted phrase", or, -excluded).
+        """
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            return Response({"error": "q is required"}, status=400)
+
+        query = SearchQuery(terms, search_type='websearch', config='english')
+        space, empty = Value(' ', output_field=TextField()), Value('', output_field=TextField())
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .filter(search_vector=query)
+            .prefetch_related(*self.serializer_prefetch)
+            .annotate(
+                # double precision so the cursor value round-trips exactly
+                rank=Cast(SearchRank(F('search_vector'), query, cover_density=True), FloatField()),
+                snippet=SearchHeadline(
+                    Concat(
+                        'equipment_name', Value(': ', output_field=TextField()),
+                        'problem', space, Coalesce('remarks', empty),
+                        space, Coalesce('closing_remarks', empty),
+                    ),
+                    query,
+                    config='english',
+                    start_sel='<mark>',
+                    stop_sel='</mark>',
+                ),
+            )
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = WorkOrderSearchSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Every work order the list would return, streamed as ?format=csv
+        (default) or ?format=ndjson. Rows come through a server-side cursor
+        so memory stays flat and the download starts with the first chunk.
+        """
+        renderer = request.accepted_renderer
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .order_by('-initiation_date', '-id')
+            .values(*self.export_columns.values())
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        response = StreamingHttpResponse(
+            buffered(renderer.stream(self.export_columns, rows)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        filename = f"workorders-{timezone.localdate():%Y%m%d}.{renderer.format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, CSVParser])
+    def bulk(self, request):
+        """
+        Create many work orders from a JSON list (or {"workorders": [...]}) or a
+        text/csv body with a header row. Valid rows are inserted with one
+        bulk_create and their 'created' history with another; invalid rows are
+        reported as {"index", "errors"} and do not hold back the rest.
+        """
+        user = request.user
+        if not hasattr(user, 'profile') or not user.profile.is_production:
+            return Response({"error": "Only production users can create workorders"}, status=403)
+
+        rows = request.data.get('workorders') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({"error": "Expected a non-empty list of workorders"}, status=400)
+        if len(rows) > self.bulk_max_rows:
+            return Response({"error": f"At most {self.bulk_max_rows} workorders per request"}, status=400)
+
+        context = self.get_serializer_context()
+        context['preloaded'] = self.preload_bulk_relations(rows)
+        pending_status = reference_data.lookup(Work_Status, 'Pending')
+        now = timezone.now()
+
+        new_workorders, errors = [], []
+        for index, row in enumerate(rows):
+            serializer = WorkOrderBulkRowSerializer(data=row, context=context)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            new_workorders.append((index, workorders(
+                **data,
+                initiation_date=now,
+                initiated_by=user,
+                work_status=pending_status,
+                equipment_name=data['equipment'].machine,
+            )))
+
+        if new_workorders:
+            with transaction.atomic():
+                # bulk_create bypasses save() and its signals, so the equipment
+                # name copy, rollups and change version are handled here
+                instances = workorders.objects.bulk_create([wo for _, wo in new_workorders], batch_size=500)
+                history.record_many(
+                    [(wo.pk, None, history.state(wo)) for wo in instances], user, 'created', locked=True,
+                )
+                rollups.record_changes(after=[rollups.snapshot(wo) for wo in instances])
+                versioning.bump_on_commit(workorders)
+
+        created = [{'index': index, 'id': wo.id} for index, wo in new_workorders]
+        return Response({'created': created, 'errors': errors}, status=201 if created else 400)
+
+    def preload_bulk_relations(self, rows):
+        """Every equipment, part and work type a bulk batch refers to, fetched once"""
+        def ids(field):
+            values = set()
+            for row in rows:
+                try:
+                    values.add(int(row[field]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            return values
+
+        return {
+            Equipment: Equipment.objects.select_related('machine_type').in_bulk(ids('equipment')),
+            Part: Part.objects.in_bulk(ids('part')),
+            Type_of_Work: {row.pk: row for row in reference_data.all(Type_of_Work)},
+        }
+
+    @action(detail=False, methods=['post'], url_path='bulk-accept')
+    def bulk_accept(self, request):
+        user = request.user
+        if not hasattr(user, 'profile') or not user.profile.is_utilities:
+            return Response({"error": "Only utilities users can accept workorders"}, status=403)
+
+        payload = BulkAcceptSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        data = payload.validated_data
+        in_process_status = reference_data.get_object_or_404(Work_Status, 'In_Process')
+        changes = {
+            'accepted': True,
+            'work_status': in_process_status,
+            'assigned_to': data.get('assigned_to', f"{user.first_name} {user.last_name}"),
+            'target_date': data.get('target_date'),
+            'remarks': data.get('remarks'),
+        }
+        return self.bulk_transition(data['ids'], 'Pending', 'accepted', changes)
+
+    @action(detail=False, methods=['post'], url_path='bulk-complete')
+    def bulk_complete(self, request):
+        user = request.user
+        if not hasattr(user, 'profile') or not user.profile.is_utilities:
+            return Response({"error": "Only utilities users can complete workorders"}, status=403)
+
+        payload = BulkTransitionSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        completed_status = reference_data.get_object_or_404(Work_Status, 'Completed')
+        completion_date = timezone.now()
+        changes = {'work_status': completed_status, 'completion_date': completion_date}
+        return self.bulk_transition(payload.validated_data['ids'], 'In_Process', 'completed', changes)
+
+    @action(detail=False, methods=['post'], url_path='bulk-close')
+    def bulk_close(self, request):
+        user = request.user
+        if not hasattr(user, 'profile') or not user.profile.is_production:
+            return Response({"error": "Only production users can close workorders"}, status=403)
+
+        payload = BulkCloseSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        data = payload.validated_data
+        closed_instance = reference_data.get_object_or_404(Closed, 'Yes' if data['closed'] else 'No')
+        changes = {'closed': closed_instance, 'closing_remarks': data['closing_remarks']}
+        action = 'closed' if closed_instance.closed == 'Yes' else 'reopened'
+        return self.bulk_transition(data['ids'], 'Completed', action, changes)
+
+    def bulk_transition(self, ids, expected_status, action, changes):
+        """
+        Apply `changes` to every id the user can see whose status is
+        `expected_status`: one locking SELECT for the preconditions, one
+        conditional UPDATE and one history bulk_create. Other ids are
+        reported under 'skipped' with a reason.
+        """
+        expected = reference_data.get_object_or_404(Work_Status, expected_status)
+        updated, skipped = [], []
+
+        with transaction.atomic():
+            current = {
+                row['id']: row
+                for row in self.get_queryset()
+                .filter(id__in=ids)
+                .select_for_update(of=('self',))
+                .order_by()
+                .values('id', *history.FIELDS)
+            }
+            for pk in dict.fromkeys(ids):
+                row = current.get(pk)
+                if row is None:
+                    skipped.append({'id': pk, 'reason': 'not found'})
+                elif row['work_status_id'] != expected.id:
+                    found = reference_data.get(Work_Status, row['work_status_id'])
+                    skipped.append({
+                        'id': pk,
+                        'reason': f"status is {found.work_status if found else None}, expected {expected_status}",
+                    })
+                else:
+                    updated.append(pk)
+
+            if updated:
+                # update() and bulk_create() skip the model signals: rollups and
+                # the change version are maintained by hand below
+                workorders.objects.filter(id__in=updated, work_status=expected).update(**changes)
+                columns = {
+                    workorders._meta.get_field(name).attname: value.pk if isinstance(value, Model) else value
+                    for name, value in changes.items()
+                }
+                history.record_many(
+                    [
+                        (pk, history.state_from_values(current[pk]), history.state_from_values({**current[pk], **columns}))
+                        for pk in updated
+                    ],
+                    self.request.user,
+                    action,
+                    locked=True,
+                )
+
+                tracked = {field: columns[field] for field in rollups.TRACKED_FIELDS if field in columns}
+                if tracked:
+                    rollups.record_changes(
+                        before=[current[pk] for pk in updated],
+                        after=[{**current[pk], **tracked} for pk in updated],
+                    )
+                versioning.bump_on_commit(workorders)
+
+        return Response({'updated': updated, 'skipped': skipped})
+
     @action(detail=True, methods=['post'])
     def accept(self, request, pk=None):
         workorder = self.get_object()
@@ -183,10 +545,10 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
         if not hasattr(user, 'profile') or not user.profile.is_utilities:
             return Response({"error": "Only utilities users can accept workorders"}, status=403)
             
-        if workorder.work_status.work_status != 'Pending':
+        if self.current_status(workorder) != 'Pending':
             return Response({"error": "Only pending workorders can be accepted"}, status=400)
         
-        in_process_status = get_object_or_404(Work_Status, work_status='In_Process')
+        in_process_status = reference_data.get_object_or_404(Work_Status, 'In_Process')
         
         # Get data from request
         assigned_to = request.data.get('assigned_to', f"{user.first_name} {user.last_name}")
@@ -194,6 +556,7 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
         remarks = request.data.get('remarks')
         
         # Update fields
+        before = self.remember_state(workorder)
         workorder.accepted = True
         workorder.work_status = in_process_status
         workorder.assigned_to = assigned_to
@@ -202,18 +565,7 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
         workorder.save()
         
         # Create history record
-        self.create_history_record(
-            workorder=workorder,
-            changed_by=user,
-            action='accepted',
-            snapshot_data={
-                'accepted': True,
-                'work_status': {'id': in_process_status.id, 'work_status': 'In_Process'},
-                'assigned_to': workorder.assigned_to,
-                'target_date': workorder.target_date,
-                'remarks': workorder.remarks
-            }
-        )
+        history.record(workorder, before, user, 'accepted')
         
         serializer = self.get_serializer(workorder)
         return Response(serializer.data)
@@ -227,20 +579,13 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
             return Response({"error": "Only utilities users can reject workorders"}, status=403)
         
         # Update fields directly (like in accept action)
+        before = self.remember_state(workorder)
         workorder.accepted = False
         workorder.assigned_to = ""  # Clear assigned_to when rejecting
         workorder.save()
         
         # Create history record
-        self.create_history_record(
-            workorder=workorder,
-            changed_by=user,
-            action='rejected',
-            snapshot_data={
-                'accepted': False,
-                'assigned_to': ""  # Include cleared assigned_to in history
-            }
-        )
+        history.record(workorder, before, user, 'rejected')
         
         # Return the serialized response
         serializer = self.get_serializer(workorder)
@@ -255,29 +600,19 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
         if not hasattr(user, 'profile') or not user.profile.is_utilities:
             return Response({"error": "Only utilities users can complete workorders"}, status=403)
             
-        if workorder.work_status.work_status != 'In_Process':
+        if self.current_status(workorder) != 'In_Process':
             return Response({"error": "Only workorders in process can be completed"}, status=400)
         
-        completed_status = get_object_or_404(Work_Status, work_status='Completed')
+        completed_status = reference_data.get_object_or_404(Work_Status, 'Completed')
         
         # Update fields directly
+        before = self.remember_state(workorder)
         workorder.work_status = completed_status
         workorder.completion_date = timezone.now()
         workorder.save()
         
         # Create history record
-        self.create_history_record(
-            workorder=workorder,
-            changed_by=user,
-            action='completed',
-            snapshot_data={
-                'work_status': {
-                    'id': completed_status.id, 
-                    'work_status': completed_status.work_status
-                },
-                'completion_date': workorder.completion_date.isoformat()
-            }
-        )
+        history.record(workorder, before, user, 'completed')
         
         serializer = self.get_serializer(workorder)
         return Response(serializer.data)
@@ -288,158 +623,61 @@ class WorkOrderViewSet(viewsets.ModelViewSet):
         workorder = self.get_object()
         user = request.user
         
-        # Debug print
-        print(f"Attempting to close workorder {workorder.id} by user {user.username}")
-        
         if not hasattr(user, 'profile') or not user.profile.is_production:
-            print("User is not production user")
             return Response({"error": "Only production users can close workorders"}, status=403)
         
-        if workorder.work_status.work_status != 'Completed':
-            print(f"Work status is {workorder.work_status.work_status}, expected 'Completed'")
+        if self.current_status(workorder) != 'Completed':
             return Response({"error": "Work must be completed before closing"}, status=400)
         
         try:
             closed_value = request.data.get('closed')
-            print(f"Received closed value: {closed_value}")
             
             if closed_value is None:
-                print("No closed value provided")
                 return Response({"error": "closed field is required"}, status=400)
             
             # Get the Closed instance
             closed_status = 'Yes' if str(closed_value).lower() in ['true', 'yes', '1'] else 'No'
-            print(f"Looking for Closed status: {closed_status}")
-            
-            closed_instance = get_object_or_404(Closed, closed=closed_status)
-            print(f"Found Closed instance: {closed_instance}")
+            closed_instance = reference_data.get_object_or_404(Closed, closed_status)
             
             # Update fields directly
+            before = self.remember_state(workorder)
             workorder.closed = closed_instance
             workorder.closing_remarks = request.data.get('closing_remarks', '')
             workorder.save()
             
             # Create history record
-            self.create_history_record(
-                workorder=workorder,
-                changed_by=user,
-                action='closed' if closed_instance.closed == 'Yes' else 'reopened',
-                snapshot_data={
-                    'closed': {
-                        'id': closed_instance.id,
-                        'closed': closed_instance.closed
-                    },
-                    'closing_remarks': workorder.closing_remarks
-                }
-            )
+            history.record(workorder, before, user, 'closed' if closed_instance.closed == 'Yes' else 'reopened')
             
             serializer = self.get_serializer(workorder)
-            print("Workorder closed successfully")
             return Response(serializer.data)
             
         except Exception as e:
-            print(f"Error closing workorder: {str(e)}")
+            logger.warning("Closing workorder %s failed: %s", workorder.id, e)
             return Response({"error": str(e)}, status=400)
 
-    def perform_create(self, serializer):
-        workorder = serializer.save()
-        self.create_history_record(
-            workorder=workorder,
-            changed_by=self.request.user,
-            action='created',
-            full_snapshot=True
-        )
+    def current_status(self, workorder):
+        work_status = reference_data.get(Work_Status, workorder.work_status_id)
+        return work_status.work_status if work_status else None
 
-    def perform_update(self, serializer):
-        print("Incoming data:", self.request.data)  # Log incoming data
-        
-        old_instance = self.get_object()
-        old_snapshot = self.create_complete_snapshot(old_instance)
-        
-        try:
-            workorder = serializer.save()
-            print("Update successful")
-        except Exception as e:
-            print("Serializer error:", str(e))
-            raise
-        
-        new_snapshot = self.create_complete_snapshot(workorder)
-        diff = self.get_changed_fields(old_snapshot, new_snapshot)
-        
-        action = self.determine_action(serializer.validated_data, diff['changed_fields'])
-        self.create_history_record(
-            workorder=workorder,
-            changed_by=self.request.user,
-            action=action,
-            snapshot_data={field: new_snapshot[field] for field in diff['changed_fields']},
-            full_snapshot=False
-        )
-
-    def create_history_record(self, workorder, changed_by, action, snapshot_data=None, full_snapshot=False):
-        snapshot = self.create_complete_snapshot(workorder) if full_snapshot else (snapshot_data or {})
-        snapshot['id'] = workorder.id
-        
-        WorkOrderHistory.objects.create(
-            workorder=workorder,
-            snapshot=snapshot,
-            changed_by=changed_by,
-            action=action,
-            timestamp=timezone.now()
-        )
+    def remember_state(self, workorder):
+        """history.state() of a row about to change, also kept for the rollups pre_save lookup"""
+        workorder._rollup_before = rollups.snapshot(workorder)
+        return history.state(workorder)
 
-    def create_complete_snapshot(self, workorder):
-        return {
-            'id': workorder.id,
-            'initiation_date': str(workorder.initiation_date),
-            'department': workorder.department,
-            'problem': workorder.problem,
-            'initiated_by': {
-                'id': workorder.initiated_by.id,
-                'username': workorder.initiated_by.username
-            },
-            'equipment': {
-                'id': workorder.equipment.id,
-                'machine': workorder.equipment.machine,
-                'machine_type': str(workorder.equipment.machine_type)
-            },
-            'part': workorder.part.id if workorder.part else None,
-            'type_of_work': workorder.type_of_work.id,
-            'closed': workorder.closed.id if workorder.closed else None,
-            'closing_remarks': workorder.closing_remarks,
-            'accepted': workorder.accepted,
-            'assigned_to': workorder.assigned_to,
-            'target_date': str(workorder.target_date) if workorder.target_date else None,
-            'remarks': workorder.remarks,
-            'replaced_part': workorder.replaced_part,
-            'completion_date': str(workorder.completion_date),
-            'work_status': {
-                'id': workorder.work_status.id,
-                'work_status': workorder.work_status.work_status
-            },
-            'pending': workorder.pending.id if workorder.pending else None,
-            'pr_number': workorder.pr_number,
-            'pr_date': str(workorder.pr_date) if workorder.pr_date else None,
-            'timestamp': str(workorder.timestamp) if workorder.timestamp else None
-        }
+    def perform_create(self, serializer):
+        # Uncommitted, the new row is invisible to other requests: no lock needed for its version
+        with transaction.atomic(savepoint=False):
+            workorder = serializer.save()
+            history.record(workorder, None, self.request.user, 'created', locked=True)
 
-    def get_changed_fields(self, previous, current):
-        changed_fields = []
-        action_hint = None
-        
-        for field in previous.keys():
-            if field not in current or previous[field] != current[field]:
-                changed_fields.append(field)
-                if field == 'work_status' and current.get('work_status', {}).get('work_status') == 'Completed':
-                    action_hint = 'completed'
-                elif field == 'accepted' and current.get('accepted'):
-                    action_hint = 'accepted'
-                elif field == 'closed' and current.get('closed'):
-                    action_hint = 'closed'
+    def perform_update(self, serializer):
+        # serializer.instance is the row get_object() fetched, untouched until save()
+        before = self.remember_state(serializer.instance)
+        workorder = serializer.save()
         
-        return {
-            'changed_fields': changed_fields,
-            'action_hint': action_hint
-        }
+        changed_fields = list(history.diff(before, history.state(workorder)))
+        action = self.determine_action(serializer.validated_data, changed_fields)
+        history.record(workorder, before, self.request.user, action)
 
     def determine_action(self, validated_data, changed_fields):
         if 'accepted' in validated_data:
@@ -456,9 +694,36 @@ class WorkOrderHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = WorkOrderHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_workorder(self):
+        """The parent work order, 404 unless the user's role may see it (WorkOrderViewSet.scope_to_user)"""
+        visible = WorkOrderViewSet.scope_to_user(workorders.objects.only('id'), self.request.user)
+        return get_object_or_404(visible, pk=self.kwargs['workorder_pk'])
+
     def get_queryset(self):
-        workorder_id = self.kwargs['workorder_pk']
-        return WorkOrderHistory.objects.filter(workorder_id=workorder_id).order_by('-timestamp')
+        workorder = self.get_workorder()
+        return WorkOrderHistory.objects.filter(workorder_id=workorder.pk).order_by('-timestamp', '-version')
+
+    @action(detail=False, methods=['get'], url_path='as-of')
+    def as_of(self, request, workorder_pk=None):
+        """The work order as it stood at ?t=, rebuilt from its last checkpoint and later deltas"""
+        query = HistoryAsOfSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        moment = query.validated_data['t']
+        self.get_workorder()
+
+        found = history.state_at(workorder_pk, moment)
+        if found is None:
+            return Response({"error": "No history for this work order at that time"}, status=404)
+        state, last = found
+        return Response({
+            'as_of': moment,
+            'version': last.version,
+            'action': last.action,
+            'timestamp': last.timestamp,
+            'workorder': WorkOrderSerializer(
+                history.instance_from_state(int(workorder_pk), state), context=self.get_serializer_context()
+            ).data,
+        })
 
 
 class UserPromptViewSet(viewsets.ReadOnlyModelViewSet):